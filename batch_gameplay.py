@@ -0,0 +1,434 @@
+import math
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from gameplay import Battle
+from models import Pokemon, Move, MoveInfo, DamageClass, Type, PokemonStatus, Ailment
+
+# Picks a move slot for each of the given battles on one side
+BatchPolicy = Callable[['BatchBattle', int, np.ndarray], np.ndarray]
+
+_NO_TYPE = -1
+_NO_MOVE = -1
+
+_AILMENT_CODES = {None: 0, Ailment.BURN: 1, Ailment.PARALYSIS: 2, Ailment.TRAP: 3,
+                  Ailment.POISON: 4, Ailment.CONFUSION: 5, Ailment.UNKNOWN: 6}
+_NON_VOLATILE_AILMENT_CODES = [code for ailment, code in _AILMENT_CODES.items() if ailment and ailment.non_volatile]
+_TOXIC_API_ID = 92
+
+# Same weights as HitInfo.num_hits and the trap duration roll in Battle.apply_ailment
+_MULTI_HIT_CUM_WEIGHTS = np.cumsum([0.375, 0.375, 0.125, 0.125])
+_BOUND_TURNS = np.array([2, 3, 4, 5])
+
+TYPE_CHART = np.array([[Type.dmg_modifier(attacking, defending) for defending in Type] for attacking in Type],
+                      dtype=np.float64)
+
+
+def _bit(status: PokemonStatus) -> int:
+    return 1 << status.value
+
+
+CHARGING = _bit(PokemonStatus.CHARGING)
+RECHARGING = _bit(PokemonStatus.RECHARGING)
+INVULNERABLE = _bit(PokemonStatus.INVULNERABLE)
+BURNED = _bit(PokemonStatus.BURNED)
+PARALYZED = _bit(PokemonStatus.PARALYZED)
+BOUND = _bit(PokemonStatus.BOUND)
+POISONED = _bit(PokemonStatus.POISONED)
+CONFUSED = _bit(PokemonStatus.CONFUSED)
+BADLY_POISONED = _bit(PokemonStatus.BADLY_POISONED)
+NON_VOLATILE = sum(_bit(status) for status in PokemonStatus if status.non_volatile)
+
+
+def status_mask(statuses: set[PokemonStatus]) -> int:
+    return sum(_bit(status) for status in statuses)
+
+
+def uniform_random_policy(batch: 'BatchBattle', side: int, battle_inds: np.ndarray) -> np.ndarray:
+    """Vectorized FullyRandomStrategy: any move in the move set, regardless of PP."""
+    return batch.rng.integers(0, batch.num_moves[battle_inds, side])
+
+
+class MoveTable:
+    """Column-oriented copy of every MoveInfo used in a batch, indexed by move id."""
+    def __init__(self, move_infos: Sequence[MoveInfo]):
+        self.infos = list(move_infos)
+        self.power = np.array([m.power for m in move_infos], dtype=np.float64)
+        self.type = np.array([m.type.index for m in move_infos])
+        self.physical = np.array([m.damage_class is DamageClass.PHYSICAL for m in move_infos])
+        self.priority = np.array([m.priority for m in move_infos])
+        self.drain = np.array([m.drain for m in move_infos], dtype=np.float64)
+        self.high_crit_ratio = np.array([m.high_crit_ratio for m in move_infos])
+        # math.floor(accuracy * 255) clamped to [1, 255] as in Battle.is_hit, or -1 for moves that can't miss
+        self.hit_threshold = np.array([-1 if m.accuracy is None else max(min(math.floor(m.accuracy * 255), 255), 1)
+                                       for m in move_infos])
+        self.min_hits = np.array([m.hit_info.min_hits for m in move_infos])
+        self.max_hits = np.array([m.hit_info.max_hits for m in move_infos])
+        self.invulnerable_phase = np.array([m.hit_info.has_invulnerable_phase for m in move_infos])
+        self.requires_charge = np.array([m.hit_info.requires_charge for m in move_infos])
+        self.has_recharge = np.array([m.hit_info.has_recharge for m in move_infos])
+        self.self_destructing = np.array([m.hit_info.self_destructing for m in move_infos])
+        self.ailment = np.array([_AILMENT_CODES[m.ailment] for m in move_infos])
+        self.ailment_chance = np.array([m.ailment_chance for m in move_infos], dtype=np.float64)
+        self.toxic = np.array([m.api_id == _TOXIC_API_ID for m in move_infos])
+
+
+class BatchBattle:
+    """
+    Simulates many independent 1v1 battles in lockstep, with each battle's state stored as rows of NumPy arrays.
+    Follows the same rules as Battle.use_move/calc_dmg (including its quirks), but the random draws are made in
+    a different order, so results only match Battle statistically, not battle-for-battle.
+    """
+    LENGTH_MODIFIER = Battle.LENGTH_MODIFIER
+
+    def __init__(self, matchups: Sequence[tuple[Pokemon, Pokemon]],
+                 policies: tuple[BatchPolicy, BatchPolicy] = (uniform_random_policy, uniform_random_policy),
+                 rng: Optional[np.random.Generator] = None):
+        self.policies = policies
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        move_ids: dict[MoveInfo, int] = {}
+        for pokemon in (pokemon for matchup in matchups for pokemon in matchup):
+            for move in pokemon.move_set:
+                move_ids.setdefault(move.info, len(move_ids))
+        self.struggle_id = len(move_ids)
+        self.attack_self_id = self.struggle_id + 1
+        self.moves = MoveTable([*move_ids, Move.struggle().info, Move.attack_self().info])
+
+        num_battles = len(matchups)
+        shape = (num_battles, 2)
+        self.hp = np.zeros(shape, dtype=np.int64)
+        self.total_hp = np.zeros(shape, dtype=np.int64)
+        self.attack = np.zeros(shape, dtype=np.float64)
+        self.defense = np.zeros(shape, dtype=np.float64)
+        self.special = np.zeros(shape, dtype=np.float64)
+        self.speed = np.zeros(shape, dtype=np.int64)
+        self.crit_threshold = np.zeros(shape, dtype=np.float64)
+        self.level = np.zeros(shape, dtype=np.int64)
+        self.types = np.full((num_battles, 2, 2), _NO_TYPE)
+        self.move_ids = np.full((num_battles, 2, 4), _NO_MOVE)
+        self.pp = np.zeros((num_battles, 2, 4), dtype=np.int64)
+        self.num_moves = np.zeros(shape, dtype=np.int64)
+        self.statuses = np.zeros(shape, dtype=np.int64)
+        self.dmg_multiplier = np.ones(shape, dtype=np.int64)
+        self.confusion_turns = np.zeros(shape, dtype=np.int64)
+        self.bound_turns = np.zeros(shape, dtype=np.int64)
+        # Move slot held over from a charging turn (Battle.move_queue)
+        self.queued_slot = np.full(shape, _NO_MOVE)
+        self.turn_count = np.zeros(num_battles, dtype=np.int64)
+
+        for battle_ind, matchup in enumerate(matchups):
+            for side, pokemon in enumerate(matchup):
+                self._load_pokemon(battle_ind, side, pokemon, move_ids)
+
+    def _load_pokemon(self, battle_ind: int, side: int, pokemon: Pokemon, move_ids: dict[MoveInfo, int]):
+        ind = battle_ind, side
+        self.hp[ind] = pokemon.hp
+        self.total_hp[ind] = pokemon.stats.total_hp
+        self.attack[ind] = pokemon.stats.attack
+        self.defense[ind] = pokemon.stats.defense
+        self.special[ind] = pokemon.stats.special
+        self.speed[ind] = pokemon.stats.speed
+        # Crits are based on the species' base speed (see Battle.is_crit)
+        self.crit_threshold[ind] = pokemon.species.base_stats.speed / 2
+        self.level[ind] = pokemon.level
+        for type_ind, poke_type in enumerate(pokemon.species.types):
+            self.types[battle_ind, side, type_ind] = poke_type.index
+        for slot, move in enumerate(pokemon.move_set):
+            self.move_ids[battle_ind, side, slot] = move_ids[move.info]
+            self.pp[battle_ind, side, slot] = move.pp
+        self.num_moves[ind] = len(pokemon.move_set)
+        self.statuses[ind] = status_mask(pokemon.statuses)
+        self.dmg_multiplier[ind] = pokemon.dmg_multiplier
+        self.confusion_turns[ind] = pokemon.confusion_turns
+        self.bound_turns[ind] = pokemon.bound_turns
+
+    def __len__(self) -> int:
+        return len(self.turn_count)
+
+    @property
+    def finished(self) -> np.ndarray:
+        return (self.hp == 0).any(axis=1)
+
+    @property
+    def winners(self) -> np.ndarray:
+        """Same convention as Battle.run: 1 if the first Pokemon fainted, otherwise 0."""
+        return (self.hp[:, 0] == 0).astype(np.int64)
+
+    def has_status(self, battle_inds: np.ndarray, sides: np.ndarray, status: int) -> np.ndarray:
+        return (self.statuses[battle_inds, sides] & status) != 0
+
+    def _set_status(self, battle_inds: np.ndarray, sides: np.ndarray, status: int, mask: np.ndarray):
+        self.statuses[battle_inds[mask], sides[mask]] |= status
+
+    def _clear_status(self, battle_inds: np.ndarray, sides: np.ndarray, status: int, mask: np.ndarray):
+        self.statuses[battle_inds[mask], sides[mask]] &= ~status
+
+    def _apply_health_effect(self, battle_inds: np.ndarray, sides: np.ndarray, health_delta: np.ndarray):
+        new_hp = self.hp[battle_inds, sides] + health_delta
+        self.hp[battle_inds, sides] = np.clip(new_hp, 0, self.total_hp[battle_inds, sides])
+
+    def _randint(self, low: int, high: int, size: int) -> np.ndarray:
+        """Inclusive bounds, like random.randint."""
+        return self.rng.integers(low, high + 1, size=size)
+
+    def _get_status_damage(self, battle_inds: np.ndarray, sides: np.ndarray,
+                           opponent_fainted: np.ndarray) -> np.ndarray:
+        """Vectorized Pokemon.get_status_damage (including the fall-through once badly poisoned damage caps)."""
+        statuses = self.statuses[battle_inds, sides]
+        sixteenth = self.total_hp[battle_inds, sides] // 16
+        dmg = np.zeros(len(battle_inds), dtype=np.int64)
+
+        burned = (statuses & BURNED) != 0
+        dmg[burned] = sixteenth[burned]
+        resolved = burned
+
+        poisoned = ~resolved & ((statuses & POISONED) != 0) & ~opponent_fainted
+        dmg[poisoned] = sixteenth[poisoned]
+        resolved = resolved | poisoned
+
+        multiplier = self.dmg_multiplier[battle_inds, sides]
+        badly_poisoned = ~resolved & ((statuses & BADLY_POISONED) != 0)
+        first_tick = badly_poisoned & (multiplier == 1)
+        later_tick = badly_poisoned & (multiplier > 1) & (multiplier < 15)
+        dmg[first_tick] = np.maximum(sixteenth[first_tick], 1)
+        dmg[later_tick] = multiplier[later_tick] * sixteenth[later_tick]
+        ticked = first_tick | later_tick
+        self.dmg_multiplier[battle_inds[ticked], sides[ticked]] += 1
+        resolved = resolved | ticked
+
+        bound = ~resolved & ((statuses & BOUND) != 0)
+        dmg[bound] = sixteenth[bound]
+        return dmg
+
+    def _choose_moves(self, active: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        chosen_slots = np.full((len(self), 2), _NO_MOVE)
+        acting = np.zeros((len(self), 2), dtype=bool)
+        for side in range(2):
+            side_statuses = self.statuses[:, side]
+            charging = active & ((side_statuses & CHARGING) != 0)
+            recharging = active & ~charging & ((side_statuses & RECHARGING) != 0)
+            picking = active & ~charging & ~recharging
+
+            chosen_slots[charging, side] = self.queued_slot[charging, side]
+            self.queued_slot[charging, side] = _NO_MOVE
+            self.statuses[recharging, side] &= ~RECHARGING
+
+            picking_inds = np.nonzero(picking)[0]
+            if len(picking_inds):
+                chosen_slots[picking_inds, side] = self.policies[side](self, side, picking_inds)
+            acting[:, side] = charging | picking
+        return chosen_slots, acting
+
+    def _first_movers(self, chosen_slots: np.ndarray) -> np.ndarray:
+        """Side that moves first in each battle, ordered like Battle._calc_move_order_sort."""
+        battle_inds = np.arange(len(self))
+        move_ids = self.move_ids[battle_inds[:, None], np.arange(2)[None, :], np.maximum(chosen_slots, 0)]
+        priority = self.moves.priority[move_ids]
+        tie_breaker = self._randint(0, 1000, size=(len(self), 2))
+        first_is_b = (priority[:, 1] > priority[:, 0]) | (
+            (priority[:, 1] == priority[:, 0]) & (
+                (self.speed[:, 1] > self.speed[:, 0]) | (
+                    (self.speed[:, 1] == self.speed[:, 0]) & (tie_breaker[:, 1] > tie_breaker[:, 0])
+                )
+            )
+        )
+        return first_is_b.astype(np.int64)
+
+    def play_turn(self):
+        active = ~self.finished
+        self.turn_count[active] += 1
+        chosen_slots, acting = self._choose_moves(active)
+        first_movers = self._first_movers(chosen_slots)
+        for attacker_sides in (first_movers, 1 - first_movers):
+            # If a pokemon faints in the middle of a turn, the match ends
+            battle_inds = np.nonzero(acting[np.arange(len(self)), attacker_sides] & ~self.finished)[0]
+            if len(battle_inds):
+                sides = attacker_sides[battle_inds]
+                self.use_moves(battle_inds, sides, chosen_slots[battle_inds, sides])
+
+    def use_moves(self, battle_inds: np.ndarray, sides: np.ndarray, slots: np.ndarray):
+        """Vectorized Battle.use_move for one attacking side in each of the given battles."""
+        moves = self.moves
+        chosen_moves = self.move_ids[battle_inds, sides, slots]
+        # Decrements pp or end up struggling
+        struggling = self.pp[battle_inds, sides, slots] == 0
+        self.pp[battle_inds[~struggling], sides[~struggling], slots[~struggling]] -= 1
+        used_moves = np.where(struggling, self.struggle_id, chosen_moves)
+
+        # Move rules (Battle.apply_move_rules)
+        invulnerable_phase = moves.invulnerable_phase[used_moves]
+        was_invulnerable = self.has_status(battle_inds, sides, INVULNERABLE)
+        self._set_status(battle_inds, sides, INVULNERABLE, invulnerable_phase & ~was_invulnerable)
+        self._clear_status(battle_inds, sides, INVULNERABLE, invulnerable_phase & was_invulnerable)
+
+        requires_charge = moves.requires_charge[used_moves]
+        was_charging = self.has_status(battle_inds, sides, CHARGING)
+        starts_charging = requires_charge & ~was_charging
+        self._set_status(battle_inds, sides, CHARGING, starts_charging)
+        self._clear_status(battle_inds, sides, CHARGING, requires_charge & was_charging)
+        # Don't decrement pp if skipped due to charging
+        self.queued_slot[battle_inds[starts_charging], sides[starts_charging]] = slots[starts_charging]
+        self.pp[battle_inds[starts_charging], sides[starts_charging], slots[starts_charging]] += 1
+
+        self._set_status(battle_inds, sides, RECHARGING, ~starts_charging & moves.has_recharge[used_moves])
+        self_destructing = ~starts_charging & moves.self_destructing[used_moves]
+        self.hp[battle_inds[self_destructing], sides[self_destructing]] = 0
+
+        keep = ~starts_charging
+        battle_inds, sides, chosen_moves, used_moves = (
+            battle_inds[keep], sides[keep], chosen_moves[keep], used_moves[keep]
+        )
+        defending_sides = 1 - sides
+
+        paralyzed = self.has_status(battle_inds, sides, PARALYZED)
+        skip_move = paralyzed & (self.rng.random(len(battle_inds)) < 0.25)
+
+        bound = self.has_status(battle_inds, sides, BOUND)
+        bound_turns = self.bound_turns[battle_inds, sides]
+        self._clear_status(battle_inds, sides, BOUND, bound & (bound_turns == 0))
+        trapped = bound & (bound_turns > 0)
+        if trapped.any():
+            trapped_inds, trapped_sides = battle_inds[trapped], sides[trapped]
+            status_dmg = self._get_status_damage(trapped_inds, trapped_sides, np.zeros(len(trapped_inds), dtype=bool))
+            self._apply_health_effect(trapped_inds, trapped_sides, -status_dmg // self.LENGTH_MODIFIER)
+            self.bound_turns[trapped_inds, trapped_sides] -= 1
+            skip_move |= trapped
+
+        confused = self.has_status(battle_inds, sides, CONFUSED)
+        self.confusion_turns[battle_inds[confused], sides[confused]] -= 1
+        snapped_out = confused & (self.confusion_turns[battle_inds, sides] == 0)
+        self._clear_status(battle_inds, sides, CONFUSED, snapped_out)
+        attacks_self = confused & ~snapped_out & (self.rng.random(len(battle_inds)) < 0.5)
+        used_moves = np.where(attacks_self, self.attack_self_id, used_moves)
+        defending_sides = np.where(attacks_self, sides, defending_sides)
+
+        # Accuracy checks use the chosen move, even when struggling or attacking itself (as Battle.use_move does)
+        hit_threshold = moves.hit_threshold[chosen_moves]
+        hit = (hit_threshold < 0) | (
+            ~self.has_status(battle_inds, defending_sides, INVULNERABLE)
+            & (self._randint(0, 255, len(battle_inds)) < hit_threshold)
+        )
+        keep = ~skip_move & hit
+        battle_inds, sides, defending_sides, chosen_moves, used_moves, attacks_self = (
+            battle_inds[keep], sides[keep], defending_sides[keep],
+            chosen_moves[keep], used_moves[keep], attacks_self[keep]
+        )
+        if not len(battle_inds):
+            return
+
+        total_dmg_dealt = self._calc_total_dmg(battle_inds, sides, defending_sides,
+                                               chosen_moves, used_moves, attacks_self)
+
+        attacker_health_delta = np.floor(moves.drain[used_moves] * total_dmg_dealt).astype(np.int64)
+        # Apply damage from status ailments
+        attacker_health_delta -= self._get_status_damage(
+            battle_inds, sides, total_dmg_dealt > self.hp[battle_inds, defending_sides]
+        )
+
+        ailment = moves.ailment[used_moves]
+        applies_ailment = (ailment != 0) & (self.rng.random(len(battle_inds)) < moves.ailment_chance[used_moves])
+        if applies_ailment.any():
+            self._apply_ailments(battle_inds[applies_ailment], defending_sides[applies_ailment],
+                                 used_moves[applies_ailment])
+
+        # Adjust health bars after using move
+        self._apply_health_effect(battle_inds, sides, attacker_health_delta // self.LENGTH_MODIFIER)
+        self._apply_health_effect(battle_inds, defending_sides, -total_dmg_dealt // self.LENGTH_MODIFIER)
+
+    def _num_hits(self, chosen_moves: np.ndarray) -> np.ndarray:
+        min_hits, max_hits = self.moves.min_hits[chosen_moves], self.moves.max_hits[chosen_moves]
+        variable = min_hits != max_hits
+        num_hits = min_hits.copy()
+        extra_hits = np.searchsorted(_MULTI_HIT_CUM_WEIGHTS, self.rng.random(int(variable.sum())), side="right")
+        num_hits[variable] += extra_hits
+        return num_hits
+
+    def _calc_total_dmg(self, battle_inds: np.ndarray, sides: np.ndarray, defending_sides: np.ndarray,
+                        chosen_moves: np.ndarray, used_moves: np.ndarray, attacks_self: np.ndarray) -> np.ndarray:
+        """Vectorized Battle.calc_dmg, summed over each move's hits (which all roll crits independently)."""
+        moves = self.moves
+        physical = moves.physical[used_moves]
+        ad_ratio = np.where(
+            physical,
+            self.attack[battle_inds, sides] / self.defense[battle_inds, defending_sides],
+            self.special[battle_inds, sides] / self.special[battle_inds, defending_sides]
+        )
+        move_types = moves.type[used_moves]
+        stab = np.where((self.types[battle_inds, sides] == move_types[:, None]).any(axis=1), 1.5, 1)
+        defending_types = self.types[battle_inds, defending_sides]
+        type_modifier = np.ones(len(battle_inds), dtype=np.float64)
+        for type_slot in range(2):
+            has_type = defending_types[:, type_slot] != _NO_TYPE
+            type_modifier[has_type] *= TYPE_CHART[move_types[has_type], defending_types[has_type, type_slot]]
+
+        crit_threshold = self.crit_threshold[battle_inds, sides] * np.where(moves.high_crit_ratio[used_moves], 8, 1)
+        crit_threshold = np.floor(np.minimum(crit_threshold, 255))
+        level = self.level[battle_inds, sides]
+        power = moves.power[used_moves]
+
+        num_hits = self._num_hits(chosen_moves)
+        total_dmg_dealt = np.zeros(len(battle_inds), dtype=np.int64)
+        for hit_num in range(int(num_hits.max())):
+            hitting = num_hits > hit_num
+            num_hitting = int(hitting.sum())
+            crit = ~attacks_self[hitting] & (self._randint(0, 255, num_hitting) < crit_threshold[hitting])
+            effective_lvl = level[hitting] * np.where(crit, 2, 1)
+            modifier = self.rng.uniform(0.85, 1.0, num_hitting)
+            modifier = np.where(attacks_self[hitting], modifier,
+                                modifier * stab[hitting] * type_modifier[hitting])
+            raw_dmg = np.floor(
+                ((((2 * effective_lvl / 5) + 2) * power[hitting] * ad_ratio[hitting] / 50) + 2) * modifier
+            ).astype(np.int64)
+            total_dmg_dealt[hitting] += np.maximum(1, raw_dmg)
+        return total_dmg_dealt
+
+    def _apply_ailments(self, battle_inds: np.ndarray, sides: np.ndarray, used_moves: np.ndarray):
+        """Vectorized Battle.apply_ailment."""
+        moves = self.moves
+        ailment = moves.ailment[used_moves]
+        # A Pokémon cannot gain a non-volatile status if it's already afflicted by another one.
+        blocked = self.has_status(battle_inds, sides, NON_VOLATILE) & np.isin(ailment, _NON_VOLATILE_AILMENT_CODES)
+
+        # Tri Attack was used. We don't support freeze, so nothing happens if unknown is selected randomly
+        tri_attack = ailment == _AILMENT_CODES[Ailment.UNKNOWN]
+        tri_attack_ailments = np.array([_AILMENT_CODES[Ailment.UNKNOWN], _AILMENT_CODES[Ailment.BURN],
+                                        _AILMENT_CODES[Ailment.PARALYSIS]])
+        ailment[tri_attack] = tri_attack_ailments[self.rng.integers(0, 3, int(tri_attack.sum()))]
+        ailment[blocked] = 0
+
+        defending_types = self.types[battle_inds, sides]
+        move_types = moves.type[used_moves]
+        is_fire = (defending_types == Type.FIRE.index).any(axis=1)
+        is_ground = (defending_types == Type.GROUND.index).any(axis=1)
+        is_poison = (defending_types == Type.POISON.index).any(axis=1)
+
+        burned = (ailment == _AILMENT_CODES[Ailment.BURN]) & (~is_fire | (move_types != Type.FIRE.index))
+        self._set_status(battle_inds, sides, BURNED, burned)
+        paralyzed = (ailment == _AILMENT_CODES[Ailment.PARALYSIS]) & (
+            ~is_ground | (move_types != Type.ELECTRIC.index)
+        )
+        self._set_status(battle_inds, sides, PARALYZED, paralyzed)
+        poisoned = (ailment == _AILMENT_CODES[Ailment.POISON]) & ~is_poison
+        self._set_status(battle_inds, sides, BADLY_POISONED, poisoned & moves.toxic[used_moves])
+        self._set_status(battle_inds, sides, POISONED, poisoned & ~moves.toxic[used_moves])
+
+        confused = ailment == _AILMENT_CODES[Ailment.CONFUSION]
+        self._set_status(battle_inds, sides, CONFUSED, confused)
+        self.confusion_turns[battle_inds[confused], sides[confused]] = self._randint(1, 5, int(confused.sum()))
+
+        # Pokemon can only be bound by one binding move at a time
+        trapped = (ailment == _AILMENT_CODES[Ailment.TRAP]) & ~self.has_status(battle_inds, sides, BOUND)
+        self._set_status(battle_inds, sides, BOUND, trapped)
+        bound_turn_inds = np.searchsorted(_MULTI_HIT_CUM_WEIGHTS, self.rng.random(int(trapped.sum())), side="right")
+        self.bound_turns[battle_inds[trapped], sides[trapped]] = _BOUND_TURNS[bound_turn_inds]
+
+    def run(self, max_turns: Optional[int] = None) -> np.ndarray:
+        """Plays every battle to completion (or max_turns) and returns the winners, as Battle.run does."""
+        while not self.finished.all():
+            if max_turns is not None and self.turn_count.max() >= max_turns:
+                break
+            self.play_turn()
+        return self.winners
+
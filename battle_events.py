@@ -0,0 +1,148 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional, TYPE_CHECKING
+
+from models import Pokemon, Move, Trainer, PokemonStatus
+
+if TYPE_CHECKING:
+    from gameplay import Battle
+
+
+class EventKind(Enum):
+    BATTLE_START = "BATTLE_START"
+    TURN_START = "TURN_START"
+    MOVE_USED = "MOVE_USED"
+    MUST_RECHARGE = "MUST_RECHARGE"
+    INVULNERABLE = "INVULNERABLE"
+    CHARGING = "CHARGING"
+    SELF_DESTRUCT = "SELF_DESTRUCT"
+    FULLY_PARALYZED = "FULLY_PARALYZED"
+    BROKE_FREE = "BROKE_FREE"
+    TRAPPED = "TRAPPED"
+    CONFUSION_ENDED = "CONFUSION_ENDED"
+    HURT_ITSELF = "HURT_ITSELF"
+    MISS = "MISS"
+    CRIT = "CRIT"
+    DAMAGE = "DAMAGE"
+    STATUS_DAMAGE = "STATUS_DAMAGE"
+    HEAL = "HEAL"
+    RECOIL = "RECOIL"
+    AILMENT_APPLIED = "AILMENT_APPLIED"
+    FAINT = "FAINT"
+    BATTLE_END = "BATTLE_END"
+    WINNER = "WINNER"
+
+
+@dataclass(frozen=True, slots=True)
+class BattleEvent:
+    """
+    Something that happened in a battle. The battle, trainer and Pokemon are the live objects,
+    so sinks that need their state (e.g. HP) should read it when the event is emitted.
+    """
+    kind: EventKind
+    battle: 'Battle'
+    pokemon: Optional[Pokemon] = None
+    trainer: Optional[Trainer] = None
+    move: Optional[Move] = None
+    # Damage dealt, health restored, etc. as shown on the health bars
+    amount: int = 0
+    hits: int = 1
+    status: Optional[PokemonStatus] = None
+    # Flavor text for status damage (see Pokemon.get_status_damage)
+    message: str = ""
+
+
+class EventSink(ABC):
+    @abstractmethod
+    def emit(self, event: BattleEvent):
+        raise NotImplementedError()
+
+
+class NullSink(EventSink):
+    """Drops every event. Battle treats it like having no sink, so events aren't even constructed."""
+    def emit(self, event: BattleEvent):
+        pass
+
+
+class CounterSink(EventSink):
+    """Only counts events (by kind, and applied ailments by status)."""
+    def __init__(self):
+        self.counts: Counter[EventKind] = Counter()
+        self.ailments: Counter[PokemonStatus] = Counter()
+
+    def emit(self, event: BattleEvent):
+        self.counts[event.kind] += 1
+        if event.kind is EventKind.AILMENT_APPLIED:
+            self.ailments[event.status] += 1
+
+
+class PrintSink(EventSink):
+    """Prints the battle as human-readable text."""
+    AILMENT_MESSAGES = {
+        PokemonStatus.BURNED: "is burned by the attack!",
+        PokemonStatus.PARALYZED: "is paralyzed by the attack!",
+        PokemonStatus.BADLY_POISONED: "is badly poisoned by the attack!",
+        PokemonStatus.POISONED: "is poisoned by the attack!",
+        PokemonStatus.CONFUSED: "is confused by the attack!",
+        PokemonStatus.BOUND: "is trapped by the attack!",
+    }
+
+    def emit(self, event: BattleEvent):
+        print(*self.format(event))
+
+    def format(self, event: BattleEvent) -> tuple[str, ...]:
+        kind, battle, pokemon = event.kind, event.battle, event.pokemon
+        nickname = pokemon.nickname if pokemon is not None else ""
+        if kind is EventKind.BATTLE_START:
+            trainer_a, trainer_b = battle.trainers
+            return (f"{trainer_a.name} with {trainer_a.pokemon.nickname} ({trainer_a.pokemon.species.display_name})",
+                    "VS",
+                    f"{trainer_b.name} with {trainer_b.pokemon.nickname} ({trainer_b.pokemon.species.display_name})")
+        if kind is EventKind.TURN_START:
+            trainer_a, trainer_b = battle.trainers
+            return (f"----- Turn {battle.turn_count} -----\n"
+                    f"{trainer_a.pokemon.nickname}: {trainer_a.pokemon.hp}/{trainer_a.pokemon.stats.total_hp}\n"
+                    f"{trainer_b.pokemon.nickname}: {trainer_b.pokemon.hp}/{trainer_b.pokemon.stats.total_hp}\n",)
+        if kind is EventKind.MOVE_USED:
+            return f"{event.trainer.name}'s {nickname} tried to use: {event.move.display_name}",
+        if kind is EventKind.MUST_RECHARGE:
+            return f"{event.trainer.name}'s {nickname} must recharge",
+        if kind is EventKind.INVULNERABLE:
+            return f"{nickname} gains invulnerability for the turn",
+        if kind is EventKind.CHARGING:
+            return f"{nickname} charges up {event.move.display_name}",
+        if kind is EventKind.SELF_DESTRUCT:
+            return f"{nickname} self-destructed",
+        if kind is EventKind.FULLY_PARALYZED:
+            return f"{nickname} is fully paralyzed! It can't move!",
+        if kind is EventKind.BROKE_FREE:
+            return f"{nickname} broke free! It is no longer trapped!",
+        if kind is EventKind.TRAPPED:
+            return f"{nickname} is trapped! It can't move!",
+        if kind is EventKind.CONFUSION_ENDED:
+            return f"{nickname} snapped out of its confusion!",
+        if kind is EventKind.HURT_ITSELF:
+            return f"{nickname} is confused! It hurt itself in its confusion!",
+        if kind is EventKind.MISS:
+            return f"{nickname}'s move ({event.move.display_name}) missed!",
+        if kind is EventKind.CRIT:
+            return "A critical hit!",
+        if kind is EventKind.DAMAGE:
+            return f"{nickname} dealt {event.amount} damage{' in total' if event.hits > 1 else ''}.",
+        if kind is EventKind.STATUS_DAMAGE:
+            return f"{nickname} {event.message}",
+        if kind is EventKind.HEAL:
+            return f"{nickname} healed itself for {event.amount}",
+        if kind is EventKind.RECOIL:
+            return f"{nickname} was hit with {event.amount} recoil damage",
+        if kind is EventKind.AILMENT_APPLIED:
+            return f"{nickname} {self.AILMENT_MESSAGES[event.status]}",
+        if kind is EventKind.FAINT:
+            return f"{nickname} fainted!",
+        if kind is EventKind.BATTLE_END:
+            return f"\n----- Battle Finished in {battle.turn_count} turns. -----",
+        if kind is EventKind.WINNER:
+            return f"{event.trainer.name} Wins!",
+        raise ValueError(f"Unknown event kind: {kind}")
@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+from battle_events import BattleEvent, EventSink, PrintSink
+from battle_strategies import ApproxQLearningStrategy, BaseQLearningStrategy, BattleStrategy, State
+from checkpoint import CHECKPOINT_PATH
+from data_store import DataStore
+from gameplay import Battle
+from generator import Matchup, PokemonGenerator
+from models import Move, Pokemon, PokemonSpecies, Trainer
+from rng_streams import new_stream, spawn
+
+logger = logging.getLogger(__name__)
+
+# Protocol: newline-delimited JSON. Every connection plays one battle against the AI strategy.
+# Client to server:
+#   {"type": "join", "matchup": "NEUTRAL"}     first message, the matchup is optional
+#   {"type": "move", "turn": 3, "slot": 0}     answer to a choose message
+# Server to client:
+#   {"type": "start", "you": {...}, "opponent": {...}}
+#   {"type": "events", "lines": [...]}         battle text since the last message
+#   {"type": "choose", "turn": 3, "you": {...}, "opponent": {...}, "moves": [...], "timeout": 30.0}
+#   {"type": "timeout", "turn": 3, "slot": 1}  no answer in time, so a random move was played
+#   {"type": "error", "message": "..."}        the last message was invalid, the turn is still open
+#   {"type": "end", "winner": 0, "you_won": true, "reason": "fainted" or "timeout"}
+DEFAULT_PORT = 8765
+
+
+class AsyncBattleStrategy(ABC):
+    """Like BattleStrategy, but the move can arrive asynchronously (e.g. from a player over the network)."""
+    @abstractmethod
+    async def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        raise NotImplementedError()
+
+
+class SyncStrategy(AsyncBattleStrategy):
+    """Any BattleStrategy that decides right away."""
+    def __init__(self, strategy: BattleStrategy):
+        self.strategy = strategy
+
+    async def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        return self.strategy.pick_move(curr_pokemon, opposing_pokemon)
+
+
+class DecisionBatcher:
+    """
+    Collects the decisions asked of a Q-learning strategy and makes them with one pick_moves call (per
+    max_batch_size) once the event loop gets to it, max_delay seconds after the first one of a batch.
+    """
+    def __init__(self, strategy: BaseQLearningStrategy, max_batch_size: int = 1024, max_delay: float = 0.0):
+        self.strategy = strategy
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.num_decisions = 0
+        self.num_batches = 0
+        self._pending: list[tuple[State, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+
+    async def decide(self, state: State) -> int:
+        """Index of the chosen move in the move set of the state's first Pokemon."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((state, future))
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush) if self.max_delay > 0 \
+                else loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        self._flush_handle = None
+        # Sessions that ended while waiting don't need their decisions anymore
+        pending = [(state, future) for state, future in self._pending if not future.done()]
+        self._pending = []
+        for start in range(0, len(pending), self.max_batch_size):
+            batch = pending[start:start + self.max_batch_size]
+            try:
+                move_inds = self.strategy.pick_moves([state for state, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), move_ind in zip(batch, move_inds):
+                future.set_result(move_ind)
+            self.num_decisions += len(batch)
+            self.num_batches += 1
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.num_decisions / self.num_batches if self.num_batches else 0.0
+
+
+class BatchedAIStrategy(AsyncBattleStrategy):
+    def __init__(self, batcher: DecisionBatcher):
+        self.batcher = batcher
+
+    async def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        move_ind = await self.batcher.decide((curr_pokemon.snapshot(), opposing_pokemon.snapshot()))
+        return curr_pokemon.move_set[move_ind]
+
+
+class _PresetStrategy(BattleStrategy):
+    """Plays whatever move AsyncBattle decided for it before the turn."""
+    def __init__(self):
+        self.move: Optional[Move] = None
+
+    def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        move, self.move = self.move, None
+        return move
+
+
+class AsyncBattle:
+    """A Battle whose moves are picked by awaitable strategies, all of a turn's decisions concurrently."""
+    def __init__(self, trainers: Sequence[tuple[str, Pokemon, AsyncBattleStrategy]],
+                 sink: Optional[EventSink] = None, seed: Optional[int] = None):
+        self.strategies = [strategy for _, _, strategy in trainers]
+        self._presets = [_PresetStrategy() for _ in trainers]
+        self.battle = Battle(*(Trainer(name, pokemon, preset) for (name, pokemon, _), preset
+                               in zip(trainers, self._presets)),
+                             training_mode=True, sink=sink, seed=seed)
+
+    async def run(self) -> int:
+        """Returns the index of the winning trainer."""
+        battle = self.battle
+        battle.begin()
+        while not battle.finished:
+            deciding = [ind for ind in range(len(battle.trainers)) if battle.awaiting_decision(ind)]
+            moves = await asyncio.gather(*(
+                self.strategies[ind].pick_move(battle.trainers[ind].pokemon,
+                                               battle.trainers[(ind + 1) % len(battle.trainers)].pokemon)
+                for ind in deciding
+            ))
+            for ind, move in zip(deciding, moves):
+                self._presets[ind].move = move
+            battle.step()
+        return battle.end()
+
+
+class _LineSink(EventSink):
+    """Battle text, collected until it's sent to the client."""
+    def __init__(self):
+        self.lines: list[str] = []
+        self._printer = PrintSink()
+
+    def emit(self, event: BattleEvent):
+        self.lines.append(" ".join(self._printer.format(event)))
+
+
+class SessionTimedOut(Exception):
+    pass
+
+
+def _describe(pokemon: Pokemon) -> dict[str, Any]:
+    return {"nickname": pokemon.nickname, "species": pokemon.species.display_name, "level": pokemon.level,
+            "hp": pokemon.hp, "total_hp": pokemon.stats.total_hp, "types": [t.name for t in pokemon.types],
+            "statuses": sorted(status.name for status in pokemon.statuses)}
+
+
+class _Session(AsyncBattleStrategy):
+    """A client's side of a battle: asks the client for each move, or plays a random one when it takes too long."""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, sink: _LineSink,
+                 turn_timeout: float, max_timeouts: int, rng: random.Random):
+        self.reader = reader
+        self.writer = writer
+        self.sink = sink
+        self.turn_timeout = turn_timeout
+        self.max_timeouts = max_timeouts
+        self.rng = rng
+        self.turn = 0
+        self._timeouts_in_a_row = 0
+
+    async def send(self, message: dict[str, Any]):
+        if self.sink.lines and message["type"] != "events":
+            lines, self.sink.lines = self.sink.lines, []
+            await self.send({"type": "events", "lines": lines})
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def receive(self, timeout: Optional[float]) -> Optional[dict[str, Any]]:
+        """The next message, or None if there wasn't one in time. Raises ConnectionError if the client left."""
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            # A line longer than the reader's limit
+            return {}
+        if not line:
+            raise ConnectionError("Client disconnected")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            # Not JSON, or not UTF-8
+            return {}
+        return message if isinstance(message, dict) else {}
+
+    async def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        self.turn += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.turn_timeout
+        await self.send({"type": "choose", "turn": self.turn, "you": _describe(curr_pokemon),
+                         "opponent": _describe(opposing_pokemon), "timeout": self.turn_timeout,
+                         "moves": [{"slot": slot, "name": move.display_name, "pp": move.pp,
+                                    "total_pp": move.info.total_pp}
+                                   for slot, move in enumerate(curr_pokemon.move_set)]})
+        while (remaining := deadline - loop.time()) > 0:
+            message = await self.receive(remaining)
+            if message is None:
+                break
+            if message.get("type") != "move":
+                await self.send({"type": "error", "message": "Expected a move"})
+                continue
+            if message.get("turn") != self.turn:
+                # An answer that arrived after its turn timed out
+                continue
+            slot = message.get("slot")
+            if not isinstance(slot, int) or not 0 <= slot < len(curr_pokemon.move_set):
+                await self.send({"type": "error", "message": f"Invalid move slot: {slot}"})
+                continue
+            self._timeouts_in_a_row = 0
+            return curr_pokemon.move_set[slot]
+
+        self._timeouts_in_a_row += 1
+        if self._timeouts_in_a_row >= self.max_timeouts:
+            raise SessionTimedOut()
+        slot = self.rng.randrange(len(curr_pokemon.move_set))
+        await self.send({"type": "timeout", "turn": self.turn, "slot": slot})
+        return curr_pokemon.move_set[slot]
+
+
+class BattleServer:
+    """
+    Hosts a battle against the AI strategy for every connection. A client that doesn't answer within
+    turn_timeout seconds has a random move played for it, and loses after max_timeouts turns in a row of that.
+    """
+    def __init__(self, all_pokemon: Sequence[PokemonSpecies], ai_strategy: BaseQLearningStrategy,
+                 turn_timeout: float = 60.0, max_timeouts: int = 3, max_batch_size: int = 1024,
+                 join_timeout: float = 10.0, rng: Optional[random.Random] = None):
+        self.rng = new_stream(rng)
+        self.generator = PokemonGenerator(all_pokemon, rng=spawn(self.rng))
+        self.batcher = DecisionBatcher(ai_strategy, max_batch_size)
+        self.turn_timeout = turn_timeout
+        self.max_timeouts = max_timeouts
+        self.join_timeout = join_timeout
+        self.active_sessions = 0
+        self.finished_sessions = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, backlog: int = 1024) -> asyncio.Server:
+        """Port 0 picks a free one (see the returned server's sockets)."""
+        return await asyncio.start_server(self._handle, host, port, backlog=backlog)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.active_sessions += 1
+        sink = _LineSink()
+        session = _Session(reader, writer, sink, self.turn_timeout, self.max_timeouts, spawn(self.rng))
+        pokemon = []
+        try:
+            join = await session.receive(self.join_timeout)
+            if join is None or join.get("type") != "join":
+                await session.send({"type": "error", "message": "Expected a join message"})
+                return
+            matchup_name = join.get("matchup", Matchup.NEUTRAL.name)
+            if not isinstance(matchup_name, str) or matchup_name not in Matchup.__members__:
+                await session.send({"type": "error", "message": f"Unknown matchup: {matchup_name}"})
+                return
+            pokemon = self.generator.generate(2, Matchup[matchup_name])
+            battle = AsyncBattle([("You", pokemon[0], session),
+                                  ("AI", pokemon[1], BatchedAIStrategy(self.batcher))],
+                                 sink=sink, seed=self.rng.getrandbits(64))
+            await session.send({"type": "start", "you": _describe(pokemon[0]), "opponent": _describe(pokemon[1])})
+            try:
+                winner = await battle.run()
+                reason = "fainted"
+            except SessionTimedOut:
+                winner, reason = 1, "timeout"
+            await session.send({"type": "end", "winner": winner, "you_won": winner == 0, "reason": reason})
+        except ConnectionError:
+            logger.info("Client disconnected mid-battle")
+        finally:
+            self.active_sessions -= 1
+            self.finished_sessions += 1
+            if pokemon:
+                self.generator.release(*pokemon)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(host: str, port: int, turn_timeout: float, checkpoint_path: str):
+    data_store = DataStore()
+    if Path(checkpoint_path).exists():
+        strategy = BaseQLearningStrategy.load_checkpoint(checkpoint_path)
+        logger.info(f"Loaded strategy trained for {strategy.episodes_trained} episodes")
+    else:
+        strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1)
+        logger.warning(f"No checkpoint at {checkpoint_path}, playing an untrained strategy")
+    server = await BattleServer(data_store.all_pokemon, strategy, turn_timeout=turn_timeout).start(host, port)
+    logger.info(f"Serving battles on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def play_in_terminal(host: str, port: int, matchup: str):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps({"type": "join", "matchup": matchup}).encode() + b"\n")
+    await writer.drain()
+    while line := await reader.readline():
+        message = json.loads(line)
+        if message["type"] == "events":
+            print("\n".join(message["lines"]))
+        elif message["type"] == "choose":
+            print(f"Please select a move ({message['timeout']:.0f}s):")
+            for move in message["moves"]:
+                print(f"{move['slot'] + 1}. {move['name']} ({move['pp']}/{move['total_pp']})")
+            choice = (await asyncio.to_thread(input, "> ")).strip()
+            slot = int(choice) - 1 if choice.isdigit() else -1
+            writer.write(json.dumps({"type": "move", "turn": message["turn"], "slot": slot}).encode() + b"\n")
+            await writer.drain()
+        elif message["type"] == "timeout":
+            print(f"Too slow! Played move {message['slot'] + 1}")
+        elif message["type"] == "error":
+            print(message["message"])
+        elif message["type"] == "end":
+            print("You won!" if message["you_won"] else f"You lost ({message['reason']})")
+    writer.close()
+
+
+if __name__ == '__main__':
+    # python battle_server.py serves battles, python battle_server.py --connect plays one in the terminal
+    parser = argparse.ArgumentParser(description="Serves battles against a trained strategy, or plays one")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--connect", action="store_true", help="Play against a running server instead")
+    parser.add_argument("--matchup", default=Matchup.NEUTRAL.name, choices=Matchup.__members__)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.connect:
+        asyncio.run(play_in_terminal(args.host, args.port, args.matchup))
+    else:
+        asyncio.run(serve(args.host, args.port, args.turn_timeout, args.checkpoint))
@@ -1,13 +1,24 @@
-import copy
 import itertools
 import math
 import random
+import time
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
 
+import numpy as np
+
+import instrumentation
+from checkpoint import Checkpoint, restored_rng
+from experience_replay import ReplayBuffer, TransitionBatch
 from gameplay import Battle
 from generator import PokemonGenerator
-from models import Move, Pokemon, Trainer, Type, DamageClass
+from models import Move, MoveInfo, Pokemon, PokemonSnapshot, Trainer, Type, DamageClass
+from q_table import QTable
+from rng_streams import new_stream, spawn
+
+# The strategy's own Pokemon followed by its opponent
+State = tuple[PokemonSnapshot, PokemonSnapshot]
 
 
 class BattleStrategy(ABC):
@@ -17,8 +28,11 @@ class BattleStrategy(ABC):
 
 
 class FullyRandomStrategy(BattleStrategy):
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = new_stream(rng)
+
     def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
-        return random.choice(curr_pokemon.move_set)
+        return self.rng.choice(curr_pokemon.move_set)
 
 
 class InteractiveBattleStrategy(BattleStrategy):
@@ -33,7 +47,10 @@ class InteractiveBattleStrategy(BattleStrategy):
 
 
 class BaseQLearningStrategy(BattleStrategy, ABC):
-    def __init__(self, gamma: float, alpha: float, epsilon: float, softmax: bool):
+    SOFTMAX_TEMPERATURE = 1  # TODO: Change this
+
+    def __init__(self, gamma: float, alpha: float, epsilon: float, softmax: bool,
+                 rng: Optional[random.Random] = None):
         self.gamma = gamma
         self.alpha = alpha
         self.epsilon = epsilon
@@ -41,58 +58,110 @@ class BaseQLearningStrategy(BattleStrategy, ABC):
         self.training = False
         self._move = None
         self.softmax = softmax  # Whether to use softmax or epsilon-greedy exploration
+        # Drives exploration, tie-breaking and the seeds of training battles
+        self.rng = new_stream(rng)
 
-    def _health_buckets(self, pokemon: Pokemon, num_buckets: int = 4) -> int:
+    def _health_buckets(self, pokemon: PokemonSnapshot, num_buckets: int = 4) -> int:
         return num_buckets - math.ceil(num_buckets * (pokemon.hp / pokemon.stats.total_hp))
 
-    def _power_buckets(self, move: Move, num_buckets: int = 3) -> int:
-        return num_buckets - math.ceil(num_buckets * (move.info.power / 250))
+    def _power_buckets(self, move: MoveInfo, num_buckets: int = 3) -> int:
+        return num_buckets - math.ceil(num_buckets * (move.power / 250))
 
-    def _poke_type_indices(self, pokemon: Pokemon) -> tuple[int, int]:
-        all_types = list(Type)
-        poke_types = pokemon.species.types
-        first_type_ind = all_types.index(poke_types[0])
+    def _poke_type_indices(self, pokemon: PokemonSnapshot) -> tuple[int, int]:
+        poke_types = pokemon.types
+        first_type_ind = poke_types[0].index
         if len(poke_types) == 1:
             return first_type_ind, 0
-        second_type_ind = all_types.index(poke_types[1]) + 1
+        second_type_ind = poke_types[1].index + 1
         return first_type_ind, second_type_ind
 
     @abstractmethod
-    def _get_q_value(self, state: tuple[Pokemon, Pokemon], move: Move) -> float:
+    def _get_q_value(self, state: State, move: MoveInfo) -> float:
         raise NotImplementedError()
 
-    def _choose_move_from_policy(self, state: tuple[Pokemon, Pokemon], epsilon: bool = False) -> Move:
-        if not self.softmax:
-            # Epsilon Greedy
-            if epsilon and random.random() >= self.epsilon:
-                # Explore - only if training
-                return random.choice(state[0].move_set)
-            # Exploit
-            max_q_val = max(self._get_q_value(state, move) for move in state[0].move_set)
-            best_moves = [move for move in state[0].move_set if self._get_q_value(state, move) == max_q_val]
-            return random.choice(best_moves)
+    def _get_q_values(self, state: State) -> list[float]:
+        """Q-values of every move in the move set of the first Pokemon."""
+        return [self._get_q_value(state, move) for move in state[0].move_infos]
+
+    def _choose_move_from_policy(self, state: State, epsilon: bool = False) -> int:
+        """Returns the index of the chosen move in the move set of the first Pokemon."""
+        stats = instrumentation.active
+        start = time.perf_counter() if stats is not None else 0.0
+        move_inds = range(len(state[0].move_infos))
+        q_vals = None
+        if not self.softmax and epsilon and self.rng.random() >= self.epsilon:
+            # Epsilon Greedy Exploration - only if training
+            chosen_move = self.rng.choice(move_inds)
         else:
-            if not epsilon:
+            q_vals = self._get_q_values(state)
+            if self.softmax and epsilon:
+                # Softmax Exploration. Shifting by the highest Q-value keeps exp from overflowing, and choices
+                # normalizes the weights itself.
+                max_q_val = max(q_vals)
+                weights = [math.exp((q_val - max_q_val) / self.SOFTMAX_TEMPERATURE) for q_val in q_vals]
+                chosen_move = self.rng.choices(move_inds, weights=weights, k=1)[0]
+            else:
                 # Exploit
-                max_q_val = max(self._get_q_value(state, move) for move in state[0].move_set)
-                best_moves = [move for move in state[0].move_set if self._get_q_value(state, move) == max_q_val]
-                return random.choice(best_moves)
-            # Softmax Exploration
-            temperature = 1  # TODO: Change this
-            raw_probabilities = [math.e ** (self._get_q_value(state, move) / temperature) for move in state[0].move_set]
-            probabilities = [(prob / sum(raw_probabilities)) for prob in raw_probabilities]
-            chosen_move = random.choices(state[0].move_set, weights=probabilities, k=1)[0]
-            return chosen_move
-
-    def _transition(self, battle: Battle) -> tuple[float, tuple[Pokemon, Pokemon]]:
+                max_q_val = max(q_vals)
+                best_moves = [ind for ind in move_inds if q_vals[ind] == max_q_val]
+                chosen_move = self.rng.choice(best_moves)
+
+        if stats is not None:
+            stats.count("decisions")
+            if q_vals is not None:
+                stats.count("policy_evaluations", len(q_vals))
+            stats.add_time("choose_move_from_policy", time.perf_counter() - start)
+        return chosen_move
+
+    def _get_q_matrix(self, states: Sequence[State]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Q-values of every move of every state's first Pokemon as a (num states, most moves) array, and which
+        entries are actual moves (move sets can be smaller than the widest one).
+        """
+        num_moves = np.array([len(state[0].move_infos) for state in states])
+        has_move = np.arange(num_moves.max(initial=0)) < num_moves[:, None]
+        q_vals = np.zeros(has_move.shape)
+        for ind, state in enumerate(states):
+            q_vals[ind, :num_moves[ind]] = self._get_q_values(state)
+        return q_vals, has_move
+
+    def pick_moves(self, states: Sequence[State], explore: bool = False) -> list[int]:
+        """
+        Index of the chosen move in the move set of each state's first Pokemon, deciding for every state in one
+        vectorized pass. Picks greedily (breaking ties randomly), or like _choose_move_from_policy does when
+        training if explore is set. Draws differently from the strategy's stream than _choose_move_from_policy,
+        so the picks are just as likely but not the same ones.
+        """
+        if not states:
+            return []
+        q_vals, has_move = self._get_q_matrix(states)
+        draws = np.array([self.rng.random() for _ in states])
+        num_moves = has_move.sum(axis=1)
+        if explore and self.softmax:
+            # Shifting by each row's highest Q-value keeps exp from overflowing
+            logits = np.where(has_move, q_vals / self.SOFTMAX_TEMPERATURE, -np.inf)
+            cum_weights = np.exp(logits - logits.max(axis=1, keepdims=True)).cumsum(axis=1)
+            chosen = (cum_weights < draws[:, None] * cum_weights[:, -1:]).sum(axis=1)
+        else:
+            best = has_move & (q_vals == np.where(has_move, q_vals, -np.inf).max(axis=1, keepdims=True))
+            # The draw picks one of the tied moves
+            nth_best = (draws * best.sum(axis=1)).astype(np.int64)
+            chosen = (best.cumsum(axis=1) <= nth_best[:, None]).sum(axis=1)
+            if explore:
+                # Epsilon greedy, exploring when the draw is at least epsilon like _choose_move_from_policy
+                explore_draws = np.array([self.rng.random() for _ in states])
+                exploring = explore_draws >= self.epsilon
+                chosen[exploring] = (draws[exploring] * num_moves[exploring]).astype(np.int64)
+        return np.minimum(chosen, num_moves - 1).tolist()
+
+    def _transition(self, battle: Battle) -> tuple[float, State]:
         initial_self_hp = battle.trainers[0].pokemon.hp
         initial_opponent_hp = battle.trainers[1].pokemon.hp
 
         # Simulate one round of the battle
         battle.play_turn()
 
-        own_pokemon = copy.deepcopy(battle.trainers[0].pokemon)
-        opponent_pokemon = copy.deepcopy(battle.trainers[1].pokemon)
+        own_pokemon, opponent_pokemon = battle.snapshots()
 
         self_hp = own_pokemon.hp
         opponent_hp = opponent_pokemon.hp
@@ -122,46 +191,132 @@ class BaseQLearningStrategy(BattleStrategy, ABC):
     def _new_battle(self, pokemon_generator: PokemonGenerator) -> Battle:
         pokemon_a, pokemon_b = pokemon_generator.generate(2)
         battle = Battle(Trainer("self", pokemon_a, self),
-                        Trainer("sparring partner", pokemon_b, FullyRandomStrategy()),
-                        training_mode=True)
+                        Trainer("sparring partner", pokemon_b, FullyRandomStrategy(spawn(self.rng))),
+                        training_mode=True, seed=self.rng.getrandbits(64))
         return battle
 
     @abstractmethod
-    def _update(self, reward, action: Move, state: tuple[Pokemon, Pokemon], next_state: tuple[Pokemon, Pokemon]):
+    def _update(self, reward, action: MoveInfo, state: State, next_state: State):
         raise NotImplementedError()
 
-    def train(self, pokemon_generator: PokemonGenerator, num_episodes: int):
+    def _play_episode(self, pokemon_generator: PokemonGenerator) -> Iterator[
+        tuple[float, MoveInfo, State, State]
+    ]:
+        """Yields (reward, action, state, next_state) for every turn of one training battle."""
+        battle = self._new_battle(pokemon_generator)
+
+        state = battle.snapshots()
+        while not battle.finished:
+            move_ind = self._choose_move_from_policy(state, epsilon=True)
+            self._move = battle.trainers[0].pokemon.move_set[move_ind]
+            current_action = state[0].move_infos[move_ind]
+            # Use Battle here instead of state + action for simplicity
+            reward, next_state = self._transition(battle)
+            yield reward, current_action, state, next_state
+            state = next_state
+        # States are snapshots, so nothing refers to the Pokemon anymore
+        pokemon_generator.release(*(trainer.pokemon for trainer in battle.trainers))
+
+    def train(self, pokemon_generator: PokemonGenerator, num_episodes: int,
+              checkpoint_path: Optional[Union[str, Path]] = None, checkpoint_every: int = 1000):
+        """
+        If checkpoint_path is given, a checkpoint (including the generator's stream) is written there every
+        checkpoint_every episodes and at the end, so an interrupted run can be resumed with load_checkpoint.
+        """
         self.training = True
 
-        for _ in range(num_episodes):
-            battle = self._new_battle(pokemon_generator)
-
-            state = copy.deepcopy(battle.trainers[0].pokemon), copy.deepcopy(battle.trainers[1].pokemon)
-            while not battle.finished:
-                self._move = self._choose_move_from_policy(state, epsilon=True)
-                current_action = copy.deepcopy(self._move)
-                # Use Battle here instead of state + action for simplicity
-                reward, next_state = self._transition(battle)
-                self._update(reward, current_action, state, next_state)
-                state = next_state
+        for episode in range(1, num_episodes + 1):
+            stats = instrumentation.active
+            for reward, action, state, next_state in self._play_episode(pokemon_generator):
+                if stats is None:
+                    self._update(reward, action, state, next_state)
+                else:
+                    start = time.perf_counter()
+                    self._update(reward, action, state, next_state)
+                    stats.add_time("update", time.perf_counter() - start)
 
             self.episodes_trained += 1
+            if checkpoint_path is not None and (episode % checkpoint_every == 0 or episode == num_episodes):
+                self.save_checkpoint(checkpoint_path, pokemon_generator)
         self.training = False
 
+    @abstractmethod
+    def _checkpoint_arrays(self) -> dict[str, np.ndarray]:
+        """What the strategy has learned, as named arrays."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def _restore_arrays(self, arrays: dict[str, np.ndarray]):
+        raise NotImplementedError()
+
+    def save_checkpoint(self, path: Union[str, Path], pokemon_generator: Optional[PokemonGenerator] = None):
+        """
+        Saves the learned values, hyperparameters, episodes trained and the strategy's stream. Also saving the
+        generator's stream means training that resumes from the checkpoint plays exactly the same battles.
+        """
+        rngs = [self.rng] if pokemon_generator is None else [self.rng, pokemon_generator.rng]
+        if any(type(rng) is not random.Random for rng in rngs):
+            raise ValueError("Can only checkpoint plain random.Random streams")
+        Checkpoint(kind=type(self).__name__, gamma=self.gamma, alpha=self.alpha, epsilon=self.epsilon,
+                   softmax=self.softmax, episodes_trained=self.episodes_trained,
+                   rng_states=[rng.getstate() for rng in rngs], arrays=self._checkpoint_arrays()).write(path)
+
+    @classmethod
+    def load_checkpoint(cls, path: Union[str, Path],
+                        pokemon_generator: Optional[PokemonGenerator] = None) -> 'BaseQLearningStrategy':
+        """
+        Loads a strategy saved by save_checkpoint. Called on the base class, it returns whichever strategy was
+        saved. If a generator is given, its stream is restored too.
+        """
+        checkpoint = Checkpoint.read(path)
+        strategy_cls = _CHECKPOINT_KINDS.get(checkpoint.kind)
+        if strategy_cls is None or not issubclass(strategy_cls, cls):
+            raise ValueError(f"Checkpoint is for a {checkpoint.kind}, not a {cls.__name__}")
+        if pokemon_generator is not None:
+            if len(checkpoint.rng_states) < 2:
+                raise ValueError("Checkpoint was saved without a generator stream")
+            pokemon_generator.rng = restored_rng(checkpoint.rng_states[1])
+        strategy = strategy_cls(checkpoint.gamma, checkpoint.alpha, checkpoint.epsilon, checkpoint.softmax,
+                                rng=restored_rng(checkpoint.rng_states[0]))
+        strategy.episodes_trained = checkpoint.episodes_trained
+        strategy._restore_arrays(checkpoint.arrays)
+        return strategy
+
     def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
         if self.training and self._move is not None:
             # If we're training and have already selected a move based on the policy,
             # make sure to pick it when prompted by simulated Battle
             return self._move
-        return self._choose_move_from_policy((curr_pokemon, opposing_pokemon))
+        move_ind = self._choose_move_from_policy((curr_pokemon.snapshot(), opposing_pokemon.snapshot()))
+        return curr_pokemon.move_set[move_ind]
 
 
 class QLearningStrategy(BaseQLearningStrategy):
-    def __init__(self, gamma: float, alpha: float, epsilon: float, softmax: bool = False):
-        super().__init__(gamma, alpha, epsilon, softmax)
-        self._q_values = defaultdict(lambda: 0.0)
+    # How many values each component of _extract_state and _extract_action can take
+    STATE_RADICES = (5, 5, 2, 2, len(Type), len(Type) + 1, len(Type), len(Type) + 1)
+    ACTION_RADICES = (len(Type), 4)
+
+    def __init__(self, gamma: float, alpha: float, epsilon: float, softmax: bool = False,
+                 rng: Optional[random.Random] = None):
+        super().__init__(gamma, alpha, epsilon, softmax, rng)
+        self.q_table = QTable(self.STATE_RADICES, self.ACTION_RADICES)
+        self._action_codes: dict[MoveInfo, int] = {}
+
+    def load_q_table(self, path: Union[str, Path]):
+        self._set_q_table(QTable.load(path))
+
+    def _set_q_table(self, q_table: QTable):
+        if (q_table.states.radices, q_table.actions.radices) != (self.STATE_RADICES, self.ACTION_RADICES):
+            raise ValueError("Q-table was saved with a different state or action encoding")
+        self.q_table = q_table
+
+    def _checkpoint_arrays(self) -> dict[str, np.ndarray]:
+        return self.q_table.to_arrays()
+
+    def _restore_arrays(self, arrays: dict[str, np.ndarray]):
+        self._set_q_table(QTable.from_arrays(**arrays))
 
-    def _extract_state(self, state: tuple[Pokemon, Pokemon]) -> tuple[int, int, int, int, int, int, int, int]:
+    def _extract_state(self, state: State) -> tuple[int, int, int, int, int, int, int, int]:
         # This is already somewhat approximated but not fully with features
         pokemon_a, pokemon_b = state
         type_a1, type_a2 = self._poke_type_indices(pokemon_a)
@@ -177,83 +332,287 @@ class QLearningStrategy(BaseQLearningStrategy):
             type_b2
         )
 
-    def _extract_action(self, move: Move) -> tuple[int, int]:
+    def _extract_action(self, move: MoveInfo) -> tuple[int, int]:
         return (
-            list(Type).index(move.info.type),
+            move.type.index,
             self._power_buckets(move)
         )
 
-    def _get_q_value(self, state: tuple[Pokemon, Pokemon], move: Move) -> float:
+    def _state_code(self, state: State) -> int:
+        return self.q_table.states.encode(self._extract_state(state))
+
+    def _action_code(self, move: MoveInfo) -> int:
+        code = self._action_codes.get(move)
+        if code is None:
+            code = self._action_codes[move] = self.q_table.actions.encode(self._extract_action(move))
+        return code
+
+    def _move_action_codes(self, state: State) -> np.ndarray:
+        return np.array([self._action_code(move) for move in state[0].move_infos])
+
+    def _get_q_value(self, state: State, move: MoveInfo) -> float:
         if state[0].fainted:
             # Losing terminal state
             return 0
-        extracted_state = self._extract_state(state)
-        extracted_action = self._extract_action(move)
-        return self._q_values[(extracted_state, extracted_action)]
+        return self.q_table.get(self._state_code(state), self._action_code(move))
 
-    def _update(self, reward, action: Move, state: tuple[Pokemon, Pokemon], next_state: tuple[Pokemon, Pokemon]):
-        next_action = self._choose_move_from_policy(next_state, epsilon=False)
+    def _get_q_values(self, state: State) -> list[float]:
+        if state[0].fainted:
+            return [0.0] * len(state[0].move_infos)
+        return self.q_table.get_many(self._state_code(state), self._move_action_codes(state)).tolist()
+
+    def _get_q_matrix(self, states: Sequence[State]) -> tuple[np.ndarray, np.ndarray]:
+        num_moves = np.array([len(state[0].move_infos) for state in states])
+        has_move = np.arange(num_moves.max(initial=0)) < num_moves[:, None]
+        action_codes = np.zeros(has_move.shape, dtype=np.int64)
+        for ind, state in enumerate(states):
+            action_codes[ind, :num_moves[ind]] = self._move_action_codes(state)
+        state_codes = self.q_table.states.encode_many([self._extract_state(state) for state in states])
+        q_vals = self.q_table.get_batch(state_codes, action_codes)
+        # Losing terminal states and padding are worth 0
+        q_vals[[state[0].fainted for state in states]] = 0
+        q_vals[~has_move] = 0
+        return q_vals, has_move
+
+    def _update(self, reward, action: MoveInfo, state: State, next_state: State):
+        # The greedy next action is the one with the highest Q-value
+        next_q_val = 0 if next_state[0].fainted \
+            else self.q_table.max(self._state_code(next_state), self._move_action_codes(next_state))
         q_val = self._get_q_value(state, action)
-        td_error = (
-                reward
-                + (self.gamma * self._get_q_value(next_state, next_action))
-                - q_val
-        )
-        self._q_values[(self._extract_state(state), self._extract_action(action))] = q_val + self.alpha * td_error
+        td_error = reward + (self.gamma * next_q_val) - q_val
+        self.q_table.set(self._state_code(state), self._action_code(action), q_val + self.alpha * td_error)
 
 
 class ApproxQLearningStrategy(BaseQLearningStrategy):
-    def __init__(self, gamma: float, alpha: float, epsilon: float, softmax: bool = False):
-        super().__init__(gamma, alpha, epsilon, softmax)
+    NUM_FEATURES = 8
+    # Static move features only depend on the matchup, so they're cached per matchup (up to this many)
+    MAX_CACHED_MATCHUPS = 4096
+
+    def __init__(self, gamma: float, alpha: float, epsilon: float, softmax: bool = False,
+                 rng: Optional[random.Random] = None):
+        super().__init__(gamma, alpha, epsilon, softmax, rng)
         # Initialized for real during training
-        self.weights = defaultdict(lambda: 0.0)
+        self.weights = np.zeros(self.NUM_FEATURES)
+        self._static_features: dict[tuple, np.ndarray] = {}
+        # Set by use_replay
+        self.replay: Optional[ReplayBuffer] = None
+        self.batch_size = 32
 
-    def load_weights(self, weights: dict[int, float]):
-        self.weights.update(weights)
+    def __getstate__(self):
+        # The feature cache is cheap to rebuild, so don't ship it to other processes
+        return {**self.__dict__, "_static_features": {}}
 
-    def _get_features(self, state: tuple[Pokemon, Pokemon], move: Move):
-        # TODO: Optimize feature extraction
+    def load_weights(self, weights: dict[int, float]):
+        for ind, weight in weights.items():
+            self.weights[ind] = weight
+
+    def use_replay(self, capacity: int = 10000, batch_size: int = 32):
+        """
+        Learns from mini-batches sampled from the last capacity transitions, instead of from each transition
+        once as it happens. Every transition adds one batch update, starting once the buffer holds a batch.
+        """
+        self.replay = ReplayBuffer(capacity, self.NUM_FEATURES)
+        self.batch_size = batch_size
+
+    def _checkpoint_arrays(self) -> dict[str, np.ndarray]:
+        if self.replay is None:
+            return {"weights": self.weights}
+        return {"weights": self.weights, "batch_size": np.array(self.batch_size),
+                **{f"replay_{name}": array for name, array in self.replay.to_arrays().items()}}
+
+    def _restore_arrays(self, arrays: dict[str, np.ndarray]):
+        if arrays["weights"].shape != self.weights.shape:
+            raise ValueError(f"Checkpoint has {arrays['weights'].shape} weights, expected {self.weights.shape}")
+        self.weights = arrays["weights"].copy()
+        if "batch_size" in arrays:
+            self.batch_size = int(arrays["batch_size"])
+            self.replay = ReplayBuffer.from_arrays(**{name.removeprefix("replay_"): array
+                                                      for name, array in arrays.items()
+                                                      if name.startswith("replay_")})
+
+    def _get_static_features(self, state: State) -> np.ndarray:
+        """Features of each move that don't change within a matchup (everything but the health features)."""
+        pokemon_a, pokemon_b = state
+        move_infos = pokemon_a.move_infos
+        key = (pokemon_a.stats, pokemon_b.stats, pokemon_b.types, tuple(move.api_id for move in move_infos))
+        static_features = self._static_features.get(key)
+        if static_features is not None:
+            return static_features
+
+        static_features = np.zeros((len(move_infos), self.NUM_FEATURES))
+        for move_ind, move in enumerate(move_infos):
+            type_mod = Type.effectiveness(move.type, pokemon_b.types)
+            type_mod /= 4  # Normalize the value between 0 and 1
+
+            dmg_class_mod_stat_atk, dmg_class_mod_stat_def = (pokemon_a.stats.attack, pokemon_b.stats.defense) \
+                if move.damage_class is DamageClass.PHYSICAL else (pokemon_a.stats.special, pokemon_b.stats.special)
+            dmg_class_mod = (dmg_class_mod_stat_atk / (dmg_class_mod_stat_atk + dmg_class_mod_stat_def))
+            static_features[move_ind, 2:] = [
+                dmg_class_mod,
+                type_mod,
+                (move.power / 250),
+                (move.accuracy if move.accuracy is not None else 1),
+                # move.hit_info.min_hits,
+                # move.hit_info.max_hits,
+                int(move.high_crit_ratio),
+                # move.priority,
+                move.drain,
+                # move.healing,
+                # TODO: Add more features
+            ]
+        if len(self._static_features) >= self.MAX_CACHED_MATCHUPS:
+            self._static_features.clear()
+        self._static_features[key] = static_features
+        return static_features
+
+    def _get_feature_matrix(self, state: State) -> np.ndarray:
+        """One row of features per move in the move set of the first Pokemon."""
+        stats = instrumentation.active
+        start = time.perf_counter() if stats is not None else 0.0
         pokemon_a, pokemon_b = state
-        type_mod = Type.dmg_modifier(move.info.type, pokemon_b.species.types[0]) * \
-               (Type.dmg_modifier(move.info.type, pokemon_b.species.types[1]) if len(pokemon_b.species.types) > 1 else 1)
-        type_mod /= 4  # Normalize the value between 0 and 1
-
-        dmg_class_mod_stat_atk, dmg_class_mod_stat_def = (pokemon_a.stats.attack, pokemon_b.stats.defense) \
-            if move.info.damage_class is DamageClass.PHYSICAL else (pokemon_a.stats.special, pokemon_b.stats.special)
-        dmg_class_mod = (dmg_class_mod_stat_atk / (dmg_class_mod_stat_atk + dmg_class_mod_stat_def))
-        return [
-            pokemon_a.hp / pokemon_a.stats.total_hp,
-            pokemon_b.hp / pokemon_b.stats.total_hp,
-            dmg_class_mod,
-            type_mod,
-            (move.info.power / 250),
-            (move.info.accuracy if move.info.accuracy is not None else 1),
-            # move.info.hit_info.min_hits,
-            # move.info.hit_info.max_hits,
-            int(move.info.high_crit_ratio),
-            # move.info.priority,
-            move.info.drain,
-            # move.info.healing,
-            # int(move.pp == 0)
-            # TODO: Add more features
-        ]
-
-    def _get_q_value(self, state: tuple[Pokemon, Pokemon], move: Move) -> float:
+        features = self._get_static_features(state).copy()
+        features[:, 0] = pokemon_a.hp / pokemon_a.stats.total_hp
+        features[:, 1] = pokemon_b.hp / pokemon_b.stats.total_hp
+        if stats is not None:
+            stats.add_time("get_features", time.perf_counter() - start)
+        return features
+
+    def _get_features(self, state: State, move: MoveInfo) -> np.ndarray:
+        return self._get_feature_matrix(state)[state[0].move_infos.index(move)]
+
+    def _get_q_values(self, state: State) -> list[float]:
         if state[0].fainted:
             # Losing terminal state
-            return 0
-        features = self._get_features(state, move)
-        q_val = sum(self.weights[ind] * feature for ind, feature in enumerate(features))
-        return q_val
-
-    def _update(self, reward, action: Move, state: tuple[Pokemon, Pokemon], next_state: tuple[Pokemon, Pokemon]):
-        next_action = self._choose_move_from_policy(next_state, epsilon=False)
-        q_val = self._get_q_value(state, action)
-        td_error = (
-                reward
-                + (self.gamma * self._get_q_value(next_state, next_action))
-                - q_val
-        )
+            return [0.0] * len(state[0].move_infos)
+        return (self._get_feature_matrix(state) @ self.weights).tolist()
+
+    def _get_q_value(self, state: State, move: MoveInfo) -> float:
+        return self._get_q_values(state)[state[0].move_infos.index(move)]
+
+    def _get_q_matrix(self, states: Sequence[State]) -> tuple[np.ndarray, np.ndarray]:
+        num_moves = np.array([len(state[0].move_infos) for state in states])
+        has_move = np.arange(num_moves.max(initial=0)) < num_moves[:, None]
+        features = np.zeros(has_move.shape + (self.NUM_FEATURES,))
+        hp_fractions = np.zeros((len(states), 2))
+        for ind, state in enumerate(states):
+            pokemon_a, pokemon_b = state
+            # Losing terminal states keep all-zero features, so they're worth 0
+            if not pokemon_a.fainted:
+                features[ind, :num_moves[ind]] = self._get_static_features(state)
+                hp_fractions[ind] = pokemon_a.hp / pokemon_a.stats.total_hp, pokemon_b.hp / pokemon_b.stats.total_hp
+        features[:, :, :2] = np.where(has_move[:, :, None], hp_fractions[:, None, :], 0)
+        return features @ self.weights, has_move
+
+    def _update(self, reward, action: MoveInfo, state: State, next_state: State):
         features = self._get_features(state, action)
-        for i, feature in enumerate(features):
-            self.weights[i] += self.alpha * td_error * feature
+        next_features = None if next_state[0].fainted else self._get_feature_matrix(next_state)
+        self._update_from_features(features, reward, next_features)
+
+    def _update_from_features(self, features: np.ndarray, reward: float, next_features: Optional[np.ndarray]):
+        """
+        TD update from the features of the chosen move and the feature matrix of the next state.
+        next_features is None when the next state is terminal. With replay, the transition is stored and a
+        sampled batch is learned from instead.
+        """
+        if self.replay is not None:
+            self.replay.add(features, reward, next_features)
+            if len(self.replay) >= self.batch_size:
+                self._update_from_batch(self.replay.sample(self.batch_size, self.rng))
+            return
+
+        q_val = features @ self.weights
+        # The greedy next action is the one with the highest Q-value
+        next_q_val = 0 if next_features is None else (next_features @ self.weights).max()
+        td_error = reward + (self.gamma * next_q_val) - q_val
+        self.weights += self.alpha * td_error * features
+
+    def _update_from_batch(self, batch: TransitionBatch):
+        """One TD update with the mean of the batch's updates, so alpha means the same as online."""
+        q_vals = batch.features @ self.weights
+        next_q_vals = batch.next_features @ self.weights
+        has_move = np.arange(next_q_vals.shape[1]) < batch.num_next_moves[:, None]
+        # The greedy next action is the one with the highest Q-value, and terminal states are worth 0
+        next_q_val = np.where(has_move, next_q_vals, -np.inf).max(axis=1)
+        next_q_val[batch.num_next_moves == 0] = 0
+        td_errors = batch.rewards + (self.gamma * next_q_val) - q_vals
+        self.weights += self.alpha * (td_errors @ batch.features) / len(td_errors)
+
+
+class BatchedStrategy(BattleStrategy):
+    """
+    Lets a Battle use a Q-learning strategy that decides for many battles at once (see play_batched). While
+    play_batched plays, it plays the move picked for its Pokemon in that turn's batch. Otherwise it's the
+    strategy itself.
+    """
+    def __init__(self, strategy: BaseQLearningStrategy):
+        self.strategy = strategy
+        # Set by play_batched while it plays: the picks of the turn by the id of the Pokemon they're for
+        self._picks: Optional[dict[int, int]] = None
+
+    def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        if self._picks is not None:
+            move_ind = self._picks.pop(id(curr_pokemon), None)
+            if move_ind is not None:
+                return curr_pokemon.move_set[move_ind]
+        return self.strategy.pick_move(curr_pokemon, opposing_pokemon)
+
+
+def play_batched(battles: Sequence[Battle]) -> list[int]:
+    """
+    Plays the battles turn by turn side by side. Every turn, the decisions of all trainers using the same
+    BatchedStrategy's strategy are made with one pick_moves call. The same BatchedStrategy may be used by both
+    trainers of a battle and in several battles, but a Pokemon can only be in one battle. Returns the winner of
+    each battle like Battle.run.
+    """
+    # The trainers that decide in batches, by battle
+    batched_trainers: list[list[tuple[int, BaseQLearningStrategy]]] = []
+    shims: set[BatchedStrategy] = set()
+    pokemon_ids: set[int] = set()
+    for battle in battles:
+        trainer_strategies = []
+        for trainer_ind, trainer in enumerate(battle.trainers):
+            if id(trainer.pokemon) in pokemon_ids:
+                raise ValueError(f"{trainer.pokemon.nickname} is in more than one of the battles")
+            pokemon_ids.add(id(trainer.pokemon))
+            shim = trainer.battle_strategy
+            if isinstance(shim, BatchedStrategy):
+                trainer_strategies.append((trainer_ind, shim.strategy))
+                shims.add(shim)
+        batched_trainers.append(trainer_strategies)
+
+    picks: dict[int, int] = {}
+    for shim in shims:
+        shim._picks = picks
+    try:
+        for battle in battles:
+            battle.begin()
+        playing = [(battle, trainer_strategies) for battle, trainer_strategies in zip(battles, batched_trainers)
+                   if not battle.finished]
+        while playing:
+            pending: dict[int, tuple[BaseQLearningStrategy, list[int], list[State]]] = {}
+            for battle, trainer_strategies in playing:
+                trainers = battle.trainers
+                snapshots = None
+                for trainer_ind, strategy in trainer_strategies:
+                    if battle.awaiting_decision(trainer_ind):
+                        if snapshots is None:
+                            snapshots = [trainer.pokemon.snapshot() for trainer in trainers]
+                        _, keys, states = pending.setdefault(id(strategy), (strategy, [], []))
+                        keys.append(id(trainers[trainer_ind].pokemon))
+                        states.append((snapshots[trainer_ind], snapshots[(trainer_ind + 1) % len(trainers)]))
+            picks.clear()
+            for strategy, keys, states in pending.values():
+                picks.update(zip(keys, strategy.pick_moves(states)))
+            for battle, _ in playing:
+                battle.step()
+            playing = [(battle, trainer_strategies) for battle, trainer_strategies in playing if not battle.finished]
+    finally:
+        for shim in shims:
+            shim._picks = None
+    return [battle.end() for battle in battles]
+
+
+# Strategy classes by the name save_checkpoint stores
+_CHECKPOINT_KINDS: dict[str, type[BaseQLearningStrategy]] = {
+    strategy_cls.__name__: strategy_cls for strategy_cls in (QLearningStrategy, ApproxQLearningStrategy)
+}
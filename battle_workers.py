@@ -0,0 +1,49 @@
+import pickle
+import random
+from typing import Optional, Sequence
+
+import instrumentation
+from battle_strategies import BattleStrategy
+from generator import PokemonGenerator
+from instrumentation import Instrumentation
+from models import PokemonSpecies
+from rng_streams import spawn
+
+# Per-process state for playing tasks (evaluation shards, tournament blocks), set once by init_worker
+strategies: list[BattleStrategy] = []
+generator: Optional[PokemonGenerator] = None
+# Only set in worker processes when the caller is recording (see instrumentation.py)
+recording: Optional[Instrumentation] = None
+# Only worker processes own the global random module, so playing in the caller's process leaves it alone
+_seeds_global = True
+
+
+def init_worker(worker_strategies: Sequence[BattleStrategy], all_pokemon: Sequence[PokemonSpecies],
+                instrumented: bool = False, in_process: bool = False):
+    """
+    ProcessPoolExecutor initializer. With in_process, tasks are played in the caller's process instead, on
+    copies of the strategies so the caller's keep their streams, like they would with workers.
+    """
+    global strategies, generator, recording, _seeds_global
+    strategies = pickle.loads(pickle.dumps(list(worker_strategies))) if in_process else list(worker_strategies)
+    # Every task replaces the stream, so this one is never drawn from
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(0))
+    _seeds_global = not in_process
+    if instrumented:
+        recording = instrumentation.enable()
+
+
+def start_task(seed: int, task_strategies: Sequence[BattleStrategy]) -> random.Random:
+    """
+    Gives the generator and the task's strategies their own streams, so results don't depend on which worker
+    plays the task, and returns the task's stream. In worker processes the global module is seeded too, for
+    strategies that draw from it.
+    """
+    rng = random.Random(seed)
+    if _seeds_global:
+        random.seed(seed)
+    generator.rng = spawn(rng)
+    for strategy in task_strategies:
+        if hasattr(strategy, "rng"):
+            strategy.rng = spawn(rng)
+    return rng
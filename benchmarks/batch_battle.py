@@ -0,0 +1,92 @@
+"""
+Statistical equivalence check and throughput comparison between Battle and BatchBattle.
+
+Both engines play the same seeded corpus of random-vs-random matchups many times. Since their random draws
+happen in a different order, individual battles differ, but win rates and battle lengths must agree within
+sampling error. Run from the repository root with: python -m benchmarks.batch_battle
+"""
+import copy
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from batch_gameplay import BatchBattle
+from battle_strategies import FullyRandomStrategy
+from data_store import DataStore
+from gameplay import Battle
+from generator import PokemonGenerator
+from models import Pokemon, Trainer
+
+
+def _run_scalar(matchups: list[tuple[Pokemon, Pokemon]]) -> tuple[np.ndarray, np.ndarray]:
+    winners, turns = [], []
+    for pokemon_a, pokemon_b in matchups:
+        battle = Battle(Trainer("Trainer A", copy.deepcopy(pokemon_a), FullyRandomStrategy()),
+                        Trainer("Trainer B", copy.deepcopy(pokemon_b), FullyRandomStrategy()),
+                        training_mode=True)
+        winners.append(battle.run())
+        turns.append(battle.turn_count)
+    return np.array(winners), np.array(turns)
+
+
+def _run_batch(matchups: list[tuple[Pokemon, Pokemon]], seed: int) -> tuple[np.ndarray, np.ndarray]:
+    batch = BatchBattle(matchups, rng=np.random.default_rng(seed))
+    winners = batch.run()
+    return winners, batch.turn_count
+
+
+def _proportion_z(a: np.ndarray, b: np.ndarray) -> float:
+    pooled = np.concatenate([a, b]).mean()
+    std_err = math.sqrt(pooled * (1 - pooled) * (1 / len(a) + 1 / len(b)))
+    return 0.0 if std_err == 0 else (a.mean() - b.mean()) / std_err
+
+
+def _mean_z(a: np.ndarray, b: np.ndarray) -> float:
+    std_err = math.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    return 0.0 if std_err == 0 else (a.mean() - b.mean()) / std_err
+
+
+def _ks_statistic(a: np.ndarray, b: np.ndarray) -> tuple[float, float]:
+    """Two-sample Kolmogorov-Smirnov statistic and its critical value at alpha = 0.001."""
+    values = np.union1d(a, b)
+    cdf_a = np.searchsorted(np.sort(a), values, side="right") / len(a)
+    cdf_b = np.searchsorted(np.sort(b), values, side="right") / len(b)
+    critical = 1.95 * math.sqrt((len(a) + len(b)) / (len(a) * len(b)))
+    return float(np.abs(cdf_a - cdf_b).max()), critical
+
+
+def main(num_matchups: int = 200, repeats: int = 25, seed: int = 0, max_z: float = 4.0) -> bool:
+    random.seed(seed)
+    generator = PokemonGenerator(DataStore().all_pokemon)
+    corpus = [tuple(generator.generate(2)) for _ in range(num_matchups)]
+    matchups = [matchup for matchup in corpus for _ in range(repeats)]
+
+    start = time.time()
+    scalar_winners, scalar_turns = _run_scalar(matchups)
+    scalar_time = time.time() - start
+    start = time.time()
+    batch_winners, batch_turns = _run_batch(matchups, seed)
+    batch_time = time.time() - start
+
+    print(f"Battle:      {len(matchups) / scalar_time:>10,.0f} battles/sec")
+    print(f"BatchBattle: {len(matchups) / batch_time:>10,.0f} battles/sec")
+
+    win_z = _proportion_z(scalar_winners, batch_winners)
+    turns_z = _mean_z(scalar_turns, batch_turns)
+    ks, ks_critical = _ks_statistic(scalar_turns, batch_turns)
+    # Per-matchup win rates should track each other too, not just the aggregate
+    per_matchup_corr = np.corrcoef(scalar_winners.reshape(num_matchups, repeats).mean(axis=1),
+                                   batch_winners.reshape(num_matchups, repeats).mean(axis=1))[0, 1]
+    print(f"Win rate (B):   {scalar_winners.mean():.4f} vs {batch_winners.mean():.4f} (z = {win_z:.2f})")
+    print(f"Mean turns:     {scalar_turns.mean():.3f} vs {batch_turns.mean():.3f} (z = {turns_z:.2f})")
+    print(f"Turns KS:       {ks:.4f} (critical {ks_critical:.4f})")
+    print(f"Per-matchup win rate correlation: {per_matchup_corr:.3f}")
+
+    return abs(win_z) < max_z and abs(turns_z) < max_z and ks < ks_critical and per_matchup_corr > 0.8
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,142 @@
+"""
+Checks the batched pick_moves API of the Q-learning strategies and compares its decision throughput with
+deciding one state at a time, and play_batched with running battles one by one.
+
+For both strategies, the batched Q-values must match _get_q_values, greedy picks must be moves with the
+highest Q-value, softmax picks must follow the softmax probabilities (even for Q-values that would overflow
+a naive exp) and play_batched must play every battle to the end. When one BatchedStrategy plays both sides
+of every battle, each decision must be the move picked for it in its turn's batch. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.batched_policy
+"""
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from battle_strategies import (
+    ApproxQLearningStrategy, BaseQLearningStrategy, BatchedStrategy, FullyRandomStrategy, QLearningStrategy,
+    play_batched
+)
+from data_store import DataStore
+from gameplay import Battle
+from generator import PokemonGenerator
+from models import Trainer
+
+
+def _check_greedy(strategy: BaseQLearningStrategy, states: list) -> bool:
+    q_vals, has_move = strategy._get_q_matrix(states)
+    picks = strategy.pick_moves(states)
+    for state, row, mask, pick in zip(states, q_vals, has_move, picks):
+        expected = strategy._get_q_values(state)
+        if not np.allclose(row[mask], expected, rtol=1e-12, atol=0) or expected[pick] != max(expected):
+            return False
+    return True
+
+
+def _check_softmax(strategy: BaseQLearningStrategy, state, num_draws: int = 20000) -> bool:
+    """Pick frequencies within 5 standard errors of the softmax probabilities."""
+    q_vals = strategy._get_q_values(state)
+    weights = [math.exp((q_val - max(q_vals)) / strategy.SOFTMAX_TEMPERATURE) for q_val in q_vals]
+    probabilities = np.array(weights) / sum(weights)
+    counts = np.bincount(strategy.pick_moves([state] * num_draws, explore=True), minlength=len(q_vals))
+    std_errors = np.sqrt(probabilities * (1 - probabilities) / num_draws)
+    return bool(np.all(np.abs(counts / num_draws - probabilities) <= 5 * std_errors + 1e-12))
+
+
+def _decisions_per_sec(strategy: BaseQLearningStrategy, states: list, batch_size: int) -> float:
+    start = time.perf_counter()
+    if batch_size == 0:
+        for state in states:
+            strategy._choose_move_from_policy(state)
+    else:
+        for batch_start in range(0, len(states), batch_size):
+            strategy.pick_moves(states[batch_start:batch_start + batch_size])
+    return len(states) / (time.perf_counter() - start)
+
+
+def _battles(all_pokemon, strategy: BaseQLearningStrategy, num_battles: int, seed: int, batched: bool) -> list[Battle]:
+    rng = random.Random(seed)
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    opponent = FullyRandomStrategy(random.Random(seed))
+    return [Battle(Trainer("A", pokemon_a, BatchedStrategy(strategy) if batched else strategy),
+                   Trainer("B", pokemon_b, opponent), training_mode=True, seed=rng.getrandbits(64))
+            for pokemon_a, pokemon_b in (generator.generate(2) for _ in range(num_battles))]
+
+
+def _check_shared_shim(all_pokemon, strategy: BaseQLearningStrategy, num_battles: int, seed: int) -> bool:
+    """
+    Every move played must be one of the batch's picks, with no extra batches of one for picks that another
+    trainer overwrote or took.
+    """
+    picked: list[int] = []
+
+    def pick_moves(states, explore=False):
+        move_inds = type(strategy).pick_moves(strategy, states, explore)
+        picked.extend(move_inds)
+        return move_inds
+
+    strategy.pick_moves = pick_moves
+    try:
+        rng = random.Random(seed)
+        generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+        shim = BatchedStrategy(strategy)
+        battles = [Battle(Trainer("A", pokemon_a, shim), Trainer("B", pokemon_b, shim), training_mode=True,
+                          seed=rng.getrandbits(64))
+                   for pokemon_a, pokemon_b in (generator.generate(2) for _ in range(num_battles))]
+        winners = play_batched(battles)
+    finally:
+        del strategy.pick_moves
+    played = [slot for battle in battles for _, slot in battle.decisions]
+    return None not in winners and sorted(played) == sorted(picked)
+
+
+def main(num_states: int = 4096, num_battles: int = 1000, repeats: int = 5, seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    states = [tuple(pokemon.snapshot() for pokemon in generator.generate(2)) for _ in range(num_states)]
+    ok = True
+    for cls in (QLearningStrategy, ApproxQLearningStrategy):
+        strategy = cls(gamma=0.9, alpha=0.1, epsilon=0.1, softmax=True, rng=random.Random(seed))
+        strategy.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), 1000)
+        name = cls.__name__
+
+        greedy_ok = _check_greedy(strategy, states)
+        explored = max(states, key=lambda state: np.ptp(strategy._get_q_values(state)))
+        softmax_ok = _check_softmax(strategy, explored)
+        print(f"{name:<24} greedy {'OK' if greedy_ok else 'FAILED'}, softmax {'OK' if softmax_ok else 'FAILED'}")
+        ok &= greedy_ok and softmax_ok
+
+        rates = {batch_size: _decisions_per_sec(strategy, states, batch_size) for batch_size in (0, 1, 64, 1024)}
+        print(f"{'':<24} decisions/sec: one at a time {rates[0]:>9,.0f}, "
+              + ", ".join(f"batches of {batch_size} {rate:>9,.0f}" for batch_size, rate in rates.items() if batch_size))
+
+        win_rates = {}
+        # Alternating runs and keeping each one's best keeps noise on a busy machine from deciding the comparison
+        best_elapsed = {False: math.inf, True: math.inf}
+        for _ in range(repeats):
+            for batched in (False, True):
+                battles = _battles(all_pokemon, strategy, num_battles, seed, batched)
+                start = time.perf_counter()
+                winners = play_batched(battles) if batched else [battle.run() for battle in battles]
+                best_elapsed[batched] = min(best_elapsed[batched], time.perf_counter() - start)
+                ok &= all(battle.finished for battle in battles) and None not in winners
+                win_rates[batched] = winners.count(0) / num_battles
+        for batched, elapsed in best_elapsed.items():
+            print(f"{'':<24} {'play_batched' if batched else 'one by one':<12} {num_battles / elapsed:>9,.0f} "
+                  f"battles/sec, win rate {win_rates[batched]:.1%}")
+
+        shared_ok = _check_shared_shim(all_pokemon, strategy, num_battles, seed)
+        print(f"{'':<24} one BatchedStrategy on both sides {'OK' if shared_ok else 'FAILED'}")
+        ok &= shared_ok
+
+    strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.1, epsilon=0.1, softmax=True, rng=random.Random(seed))
+    strategy.weights[:] = 1e4
+    stable = _check_softmax(strategy, max(states, key=lambda state: np.ptp(strategy._get_q_values(state))))
+    print(f"softmax with huge Q-values       {'OK' if stable else 'FAILED'}")
+    return ok and stable
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
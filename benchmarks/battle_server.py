@@ -0,0 +1,119 @@
+"""
+Plays many concurrent sessions against battle_server.BattleServer over a local socket and reports session and
+decision throughput and how well AI decisions were batched across sessions.
+
+Bot clients answer every turn with a random move and must all get to the end of their battle. A client that
+never answers must lose by timeout, and one that sends an invalid move must get an error and can still answer.
+Malformed joins (not UTF-8, longer than the server reads, or with a matchup that isn't a name) must get an
+error or have their connection closed, without crashing the connection handler.
+Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.battle_server
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from battle_server import BattleServer
+from battle_strategies import ApproxQLearningStrategy
+from data_store import DataStore
+from generator import PokemonGenerator
+
+
+async def _send(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+
+async def _client(port: int, rng: random.Random, answer: bool = True, invalid_first: bool = False) -> list[dict]:
+    """Plays one session and returns every message the server sent."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await _send(writer, {"type": "join"})
+    messages = []
+    while line := await reader.readline():
+        message = json.loads(line)
+        messages.append(message)
+        if message["type"] == "choose" and answer:
+            if invalid_first:
+                invalid_first = False
+                await _send(writer, {"type": "move", "turn": message["turn"], "slot": 99})
+            await _send(writer, {"type": "move", "turn": message["turn"],
+                                 "slot": rng.randrange(len(message["moves"]))})
+    writer.close()
+    return messages
+
+
+async def _malformed_join(port: int, line: bytes) -> list[dict]:
+    """Sends the line as the join message and returns every message the server sent before closing."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    messages = []
+    try:
+        writer.write(line + b"\n")
+        await writer.drain()
+        while line := await reader.readline():
+            messages.append(json.loads(line))
+    except ConnectionError:
+        # The server can close before reading everything a client sent
+        pass
+    writer.close()
+    return messages
+
+
+async def _run(num_sessions: int, seed: int) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, rng=random.Random(seed))
+    strategy.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), 500)
+    server = BattleServer(all_pokemon, strategy, turn_timeout=0.2, max_timeouts=2, rng=random.Random(seed))
+    tcp_server = await server.start(port=0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    ok = True
+    # Exceptions that escape the connection handler end up here
+    unhandled = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+    async with tcp_server:
+        start = time.perf_counter()
+        sessions = await asyncio.gather(*(_client(port, random.Random(rng.getrandbits(64)))
+                                          for _ in range(num_sessions)))
+        elapsed = time.perf_counter() - start
+        ends = [messages[-1] for messages in sessions]
+        finished = all(end["type"] == "end" and end["reason"] == "fainted" for end in ends)
+        turns = sum(sum(message["type"] == "choose" for message in messages) for messages in sessions)
+        print(f"{num_sessions} concurrent bot sessions finished   {'OK' if finished else 'FAILED'}")
+        print(f"{num_sessions / elapsed:>10,.0f} sessions/sec, {turns / elapsed:>10,.0f} client turns/sec, "
+              f"win rate {sum(end['you_won'] for end in ends) / num_sessions:.1%} against the AI")
+        print(f"{server.batcher.num_decisions:>10,} AI decisions in {server.batcher.num_batches:,} batches "
+              f"(mean {server.batcher.mean_batch_size:.1f})")
+        ok &= finished
+
+        silent, invalid = await asyncio.gather(_client(port, rng, answer=False),
+                                               _client(port, rng, invalid_first=True))
+        timed_out = silent[-1] == {"type": "end", "winner": 1, "you_won": False, "reason": "timeout"} \
+            and sum(message["type"] == "timeout" for message in silent) == 1
+        print(f"silent client loses by timeout    {'OK' if timed_out else 'FAILED'}")
+        rejected = any(message["type"] == "error" for message in invalid) and invalid[-1]["reason"] == "fainted"
+        print(f"invalid move rejected             {'OK' if rejected else 'FAILED'}")
+        ok &= timed_out and rejected
+
+        malformed = {"not UTF-8": b"\xff\xfe", "over the line limit": b"x" * (1 << 17),
+                     "matchup not a name": json.dumps({"type": "join", "matchup": ["a"]}).encode()}
+        replies = await asyncio.gather(*(_malformed_join(port, line) for line in malformed.values()))
+        for name, messages in zip(malformed, replies):
+            # Only the overlong line may be cut off without a reply
+            handled = all(message["type"] == "error" for message in messages) \
+                and (bool(messages) or name == "over the line limit")
+            print(f"malformed join ({name + ')':<20} {'OK' if handled else 'FAILED'}")
+            ok &= handled
+        await asyncio.sleep(0.1)
+        ok &= not unhandled
+        ok &= server.active_sessions == 0
+    return ok
+
+
+def main(num_sessions: int = 1000, seed: int = 0) -> bool:
+    return asyncio.run(_run(num_sessions, seed))
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,72 @@
+"""
+Checks that Q-learning training resumed from a checkpoint ends up exactly where an uninterrupted run does,
+for both strategies, and reports checkpoint sizes and load times.
+
+Each strategy is trained for 2 * N episodes in one go, and separately for N episodes, checkpointed, loaded
+into a fresh strategy and generator and trained for N more; the learned values, episodes trained and
+streams must be identical. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.checkpoint
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from battle_strategies import ApproxQLearningStrategy, BaseQLearningStrategy, QLearningStrategy
+from data_store import DataStore
+from generator import PokemonGenerator
+
+
+def _learned(strategy: BaseQLearningStrategy) -> list[np.ndarray]:
+    if isinstance(strategy, QLearningStrategy):
+        return [strategy.q_table.state_codes, strategy.q_table.values]
+    return [strategy.weights]
+
+
+def main(num_episodes: int = 1000, seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for cls, hyperparameters in [(QLearningStrategy, dict(gamma=0.9, alpha=0.1, epsilon=0.1)),
+                                     (ApproxQLearningStrategy, dict(gamma=0.9, alpha=0.01, epsilon=0.1,
+                                                                    softmax=True))]:
+            path = os.path.join(tmp_dir, f"{cls.__name__}.ckpt")
+
+            straight = cls(**hyperparameters, rng=random.Random(seed))
+            straight_generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+            straight.train(straight_generator, 2 * num_episodes)
+
+            first_half = cls(**hyperparameters, rng=random.Random(seed))
+            first_half.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), num_episodes,
+                             checkpoint_path=path, checkpoint_every=num_episodes // 4)
+            resumed_generator = PokemonGenerator(all_pokemon)
+            start = time.perf_counter()
+            resumed = BaseQLearningStrategy.load_checkpoint(path, resumed_generator)
+            load_time = time.perf_counter() - start
+            resumed.train(resumed_generator, num_episodes)
+
+            same = (type(resumed) is cls and resumed.episodes_trained == straight.episodes_trained
+                    and (resumed.gamma, resumed.alpha, resumed.epsilon, resumed.softmax)
+                    == (straight.gamma, straight.alpha, straight.epsilon, straight.softmax)
+                    and resumed.rng.getstate() == straight.rng.getstate()
+                    and resumed_generator.rng.getstate() == straight_generator.rng.getstate()
+                    and all(np.array_equal(a, b) for a, b in zip(_learned(resumed), _learned(straight))))
+            print(f"{cls.__name__:<24} resumed run matches: {'OK' if same else 'FAILED'}, "
+                  f"{os.path.getsize(path) / 1024:,.1f} KB, loads in {load_time * 1000:.2f} ms")
+            ok &= same
+
+        try:
+            ApproxQLearningStrategy.load_checkpoint(os.path.join(tmp_dir, "QLearningStrategy.ckpt"))
+            rejects_wrong_kind = False
+        except ValueError:
+            rejects_wrong_kind = True
+        print(f"rejects the wrong strategy       {'OK' if rejects_wrong_kind else 'FAILED'}")
+        ok &= rejects_wrong_kind
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,98 @@
+"""
+Golden check and micro-benchmark for Battle.calc_dmg's damage table.
+
+For many generated matchups, every move is rolled many times by the original calc_dmg (kept here as a
+baseline) and by the table-backed one from identically seeded streams; the damage sequences, and so their
+distributions, must be identical. The table must also be rebuilt when a stat-affecting status is applied.
+Exits with status 1 otherwise. Run from the repository root with: python -m benchmarks.damage
+"""
+import dataclasses
+import math
+import random
+import sys
+import time
+from collections import Counter
+
+from battle_strategies import FullyRandomStrategy
+from data_store import DataStore
+from gameplay import ATTACK_SELF, Battle
+from generator import PokemonGenerator
+from models import Ailment, DamageClass, Move, MoveInfo, Pokemon, PokemonStatus, Trainer, Type
+
+
+class LegacyBattle(Battle):
+    """The original calc_dmg, kept here only as a baseline."""
+    def calc_dmg(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon, move_used: MoveInfo, hit_num=0) -> int:
+        crit = self.is_crit(attacking_pokemon.species, move_used) and hit_num == 0
+        effective_lvl = attacking_pokemon.level * (2 if crit else 1)
+        ad_ratio = attacking_pokemon.stats.attack / defending_pokemon.stats.defense \
+            if move_used.damage_class == DamageClass.PHYSICAL \
+            else attacking_pokemon.stats.special / defending_pokemon.stats.special
+        rand_modifier = self.rng.uniform(0.85, 1.0)
+        if move_used.name == ATTACK_SELF:
+            modifier = rand_modifier
+        else:
+            stab = 1.5 if move_used.type in attacking_pokemon.species.types else 1
+            modifier = rand_modifier * stab * Type.effectiveness(move_used.type, defending_pokemon.species.types)
+        return math.floor(((((2 * effective_lvl / 5) + 2) * move_used.power * ad_ratio / 50) + 2) * modifier)
+
+
+def _battle(cls, pokemon_a: Pokemon, pokemon_b: Pokemon, seed: int) -> Battle:
+    return cls(Trainer("A", pokemon_a, FullyRandomStrategy()), Trainer("B", pokemon_b, FullyRandomStrategy()),
+               training_mode=True, seed=seed)
+
+
+def _rolls(battle: Battle, num_rolls: int) -> list[int]:
+    pokemon_a, pokemon_b = (trainer.pokemon for trainer in battle.trainers)
+    moves = [(pokemon_a, pokemon_b, move.info) for move in pokemon_a.move_set]
+    moves += [(pokemon_b, pokemon_a, move.info) for move in pokemon_b.move_set]
+    moves += [(pokemon_a, pokemon_a, Move.attack_self().info), (pokemon_b, pokemon_b, Move.struggle().info)]
+    return [battle.calc_dmg(attacking, defending, move_info)
+            for _ in range(num_rolls) for attacking, defending, move_info in moves]
+
+
+def main(num_matchups: int = 300, num_rolls: int = 200, seed: int = 0) -> bool:
+    generator = PokemonGenerator(DataStore().all_pokemon, rng=random.Random(seed))
+    matchups = [generator.generate(2) for _ in range(num_matchups)]
+
+    mismatched = 0
+    legacy_counts, table_counts = Counter(), Counter()
+    for ind, (pokemon_a, pokemon_b) in enumerate(matchups):
+        legacy = _rolls(_battle(LegacyBattle, pokemon_a, pokemon_b, ind), num_rolls)
+        table = _rolls(_battle(Battle, pokemon_a, pokemon_b, ind), num_rolls)
+        mismatched += legacy != table
+        legacy_counts.update(legacy)
+        table_counts.update(table)
+    print(f"identical damage rolls           {'OK' if mismatched == 0 else f'FAILED ({mismatched} matchups)'}")
+    print(f"identical distributions          {'OK' if legacy_counts == table_counts else 'FAILED'}")
+    ok = mismatched == 0 and legacy_counts == table_counts
+
+    # Gen 1 burn halves attack, which isn't modelled yet, so halving the stats by hand stands in for that
+    pokemon_a, pokemon_b = matchups[0]
+    battle = _battle(Battle, pokemon_a, pokemon_b, seed)
+    legacy_battle = _battle(LegacyBattle, pokemon_a, pokemon_b, seed)
+    _rolls(battle, 1)
+    _rolls(legacy_battle, 1)
+    original_stats, original_statuses = pokemon_b.stats, set(pokemon_b.statuses)
+    pokemon_b.stats = dataclasses.replace(original_stats, attack=original_stats.attack // 2,
+                                          special=original_stats.special // 2)
+    pokemon_b.statuses.clear()
+    burn = Move(dataclasses.replace(pokemon_a.move_set[0].info, type=Type.NORMAL, ailment=Ailment.BURN), pp=1)
+    battle.apply_ailment(burn, pokemon_b)
+    rebuilt = PokemonStatus.BURNED in pokemon_b.statuses and not battle._dmg_table
+    rebuilt &= _rolls(battle, num_rolls) == _rolls(legacy_battle, num_rolls)
+    pokemon_b.stats, pokemon_b.statuses = original_stats, original_statuses
+    print(f"table rebuilt on burn            {'OK' if rebuilt else 'FAILED'}")
+    ok &= rebuilt
+
+    for name, cls in [("calc_dmg, original", LegacyBattle), ("calc_dmg, table", Battle)]:
+        battles = [_battle(cls, pokemon_a, pokemon_b, ind) for ind, (pokemon_a, pokemon_b) in enumerate(matchups)]
+        start = time.perf_counter()
+        num_calls = sum(len(_rolls(battle, num_rolls)) for battle in battles)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<32} {num_calls / elapsed:>12,.0f} hits/sec")
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
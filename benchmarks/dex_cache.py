@@ -0,0 +1,53 @@
+"""
+Startup benchmark for the memory-mapped dex cache against the pickled dex, plus a round trip check.
+
+Compares loading both pickles, opening the dex cache, and opening it and building every species, along with the
+bytes it takes to ship all_pokemon to a worker process. Exits with status 1 if the dex cache doesn't reproduce
+the pickled dex exactly. Run from the repository root with: python -m benchmarks.dex_cache
+"""
+import pickle
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from dex_cache import DexCache
+
+
+def _load_pickles(moves_cache: str, pokemon_cache: str):
+    with open(moves_cache, "rb") as f:
+        all_moves = pickle.load(f)
+    with open(pokemon_cache, "rb") as f:
+        all_pokemon = pickle.load(f)
+    return all_moves, all_pokemon
+
+
+def main(moves_cache: str = "./data/all_moves.data", pokemon_cache: str = "./data/all_pokemon.data") -> bool:
+    all_moves, all_pokemon = _load_pickles(moves_cache, pokemon_cache)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dex_path = Path(tmp_dir) / "dex.bin"
+        DexCache.write(dex_path, all_moves, all_pokemon)
+        dex = DexCache(dex_path)
+        ok = list(dex.all_moves) == all_moves and list(dex.all_pokemon) == all_pokemon and all(
+            (a.types, a.learn_set) == (b.types, b.learn_set) for a, b in zip(dex.all_pokemon, all_pokemon)
+        )
+
+        timings = {
+            "pickle load": lambda: _load_pickles(moves_cache, pokemon_cache),
+            "dex cache open": lambda: DexCache(dex_path),
+            "dex cache open + build all": lambda: list(DexCache(dex_path).all_pokemon),
+        }
+        for name, func in timings.items():
+            best = min(timeit.repeat(func, number=20, repeat=5)) / 20
+            print(f"{name:<27} {best * 1000:>8.3f} ms")
+
+        print(f"{'file size':<27} {Path(moves_cache).stat().st_size + Path(pokemon_cache).stat().st_size:>8,} B "
+              f"(pickles) vs {dex_path.stat().st_size:,} B (dex cache)")
+        print(f"{'shipped to each worker':<27} {len(pickle.dumps(all_pokemon)):>8,} B "
+              f"(pickles) vs {len(pickle.dumps(DexCache(dex_path).all_pokemon)):,} B (dex cache)")
+    print("round trip:", "OK" if ok else "MISMATCH")
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
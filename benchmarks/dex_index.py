@@ -0,0 +1,67 @@
+"""
+Checks every DexIndex query against the linear scan it replaces, then times learn set resolution
+(PokemonScraper's old per-species scan over every move vs name lookups) and species-by-type queries.
+Exits with status 1 if any query disagrees. Run from the repository root with: python -m benchmarks.dex_index
+"""
+import sys
+import timeit
+
+from data_store import DataStore
+from dex_index import DexIndex
+from models import DamageClass, Type
+
+
+def main() -> bool:
+    data_store = DataStore()
+    all_moves, all_pokemon = list(data_store.all_moves), list(data_store.all_pokemon)
+    index = DexIndex(all_moves, all_pokemon)
+
+    ok = True
+
+    def check(name: str, passed: bool):
+        nonlocal ok
+        print(f"{name:<32} {'OK' if passed else 'FAILED'}")
+        ok &= passed
+
+    check("moves by id and name", all(index.move_by_id(move.api_id) is move and index.move_by_name(move.name) is move
+                                      for move in all_moves))
+    check("species by id and name", all(index.species_by_id(species.api_id) is species
+                                        and index.species_by_name(species.name) is species
+                                        for species in all_pokemon))
+    check("moves by type and class", all(
+        list(index.moves_of_type(move_type, damage_class))
+        == [move for move in all_moves if move.type is move_type and move.damage_class is damage_class]
+        for move_type in Type for damage_class in DamageClass
+    ) and all(list(index.moves_of_damage_class(damage_class))
+              == [move for move in all_moves if move.damage_class is damage_class] for damage_class in DamageClass))
+    check("species by type", all(list(index.species_of_type(species_type))
+                                 == [species for species in all_pokemon if species_type in species.types]
+                                 for species_type in Type))
+    check("learners of move", all(
+        set(index.learners_of(move)) == {species for species in all_pokemon if move in species.learn_set}
+        for move in all_moves
+    ))
+    check("missing keys", index.move_by_id(-1) is None and index.species_by_name("") is None)
+
+    learn_sets = [[move.name for move in species.learn_set] for species in all_pokemon]
+
+    def scan():
+        for raw_learn_set in learn_sets:
+            {m for m in all_moves if m.name in raw_learn_set}
+
+    def lookup():
+        for raw_learn_set in learn_sets:
+            {move for move in map(index.move_by_name, raw_learn_set) if move is not None}
+
+    for name, func in [("learn sets, scan", scan), ("learn sets, index", lookup),
+                       ("species by type, scan", lambda: [[s for s in all_pokemon if t in s.types] for t in Type]),
+                       ("species by type, index", lambda: [index.species_of_type(t) for t in Type])]:
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name:<32} {best * 1000:>8.3f} ms")
+    build = min(timeit.repeat(lambda: DexIndex(all_moves, all_pokemon), number=1, repeat=5))
+    print(f"{'index build':<32} {build * 1000:>8.3f} ms")
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,92 @@
+"""
+Checks damage_calc against Monte-Carlo sampling through Battle's own is_hit/num_hits/calc_dmg, and times
+memoized lookups against sampling.
+
+For every move of a set of generated matchups, the sampled HP loss distribution must be within sampling
+error of the analytic one (total variation distance), and so must the expected damage and the chance of a
+knockout within a few turns. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.expected_damage
+"""
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+import damage_calc
+from battle_strategies import FullyRandomStrategy
+from data_store import DataStore
+from gameplay import Battle
+from generator import PokemonGenerator
+from models import MoveInfo, Pokemon, Trainer
+
+
+def _sample_loss(battle: Battle, attacker: Pokemon, defender: Pokemon, move: MoveInfo) -> int:
+    """One use of the move, following Battle.use_move."""
+    if not battle.is_hit(attacker, defender, move):
+        return 0
+    total = sum(max(1, battle.calc_dmg(attacker, defender, move)) for _ in range(move.hit_info.num_hits(battle.rng)))
+    return -(-total // Battle.LENGTH_MODIFIER)
+
+
+def main(num_matchups: int = 40, num_samples: int = 4000, ko_turns: int = 3, seed: int = 0) -> bool:
+    generator = PokemonGenerator(DataStore().all_pokemon, rng=random.Random(seed))
+    matchups = [generator.generate(2) for _ in range(num_matchups)]
+
+    worst_tv = worst_mean = worst_ko = 0.0
+    sample_time = 0.0
+    num_moves = 0
+    for ind, (attacker, defender) in enumerate(matchups):
+        battle = Battle(Trainer("A", attacker, FullyRandomStrategy()), Trainer("B", defender, FullyRandomStrategy()),
+                        training_mode=True, seed=seed + ind)
+        for move in attacker.move_set:
+            distribution = damage_calc.damage_distribution(attacker, defender, move.info)
+            start = time.perf_counter()
+            losses = np.array([_sample_loss(battle, attacker, defender, move.info) for _ in range(num_samples)])
+            sample_time += time.perf_counter() - start
+            num_moves += 1
+
+            sampled = np.bincount(losses, minlength=len(distribution.pmf)) / num_samples
+            analytic = np.pad(distribution.pmf, (0, len(sampled) - len(distribution.pmf)))
+            worst_tv = max(worst_tv, 0.5 * np.abs(sampled - analytic).sum())
+            values = np.arange(len(distribution.pmf))
+            std = math.sqrt(max(np.dot(distribution.pmf, (values - distribution.expected) ** 2), 1e-9))
+            worst_mean = max(worst_mean, abs(losses.mean() - distribution.expected) / (std / math.sqrt(num_samples)))
+
+            uses = distribution.uses_within(ko_turns)
+            sampled_ko = np.mean(losses[:num_samples // uses * uses].reshape(-1, uses).sum(axis=1) >= defender.hp) \
+                if uses else 0.0
+            analytic_ko = distribution.ko_probability(defender.hp, ko_turns)
+            # In units of the sampling standard error
+            std_err = math.sqrt(max(analytic_ko * (1 - analytic_ko), 1e-4) / max(num_samples // max(uses, 1), 1))
+            worst_ko = max(worst_ko, abs(sampled_ko - analytic_ko) / std_err)
+
+    # The loss distributions have up to a few hundred outcomes, so this much sampling noise is expected
+    tv_ok = worst_tv < 0.1
+    mean_ok = worst_mean < 5
+    ko_ok = worst_ko < 5
+    print(f"loss distributions match         {'OK' if tv_ok else 'FAILED'} (worst total variation {worst_tv:.3f})")
+    print(f"expected damage matches          {'OK' if mean_ok else 'FAILED'} (worst {worst_mean:.1f} standard errors)")
+    print(f"KO probabilities match           {'OK' if ko_ok else 'FAILED'} (worst {worst_ko:.1f} standard errors)")
+
+    damage_calc._distribution.cache_clear()
+    start = time.perf_counter()
+    for attacker, defender in matchups:
+        for move in attacker.move_set:
+            damage_calc.ko_probability(attacker, defender, move.info, ko_turns)
+    cold = (time.perf_counter() - start) / num_moves
+    start = time.perf_counter()
+    for _ in range(100):
+        for attacker, defender in matchups:
+            for move in attacker.move_set:
+                damage_calc.ko_probability(attacker, defender, move.info, ko_turns)
+    warm = (time.perf_counter() - start) / (100 * num_moves)
+    print(f"{num_samples} samples per move        {sample_time / num_moves * 1e6:>10,.0f} us")
+    print(f"analytic, first lookup           {cold * 1e6:>10,.1f} us")
+    print(f"analytic, memoized               {warm * 1e6:>10,.1f} us")
+    return tv_ok and mean_ok and ko_ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,88 @@
+"""
+Compares ApproxQLearningStrategy trained online with training from an experience replay buffer, and checks
+the vectorized mini-batch update and resuming replay training from a checkpoint.
+
+The batch update must match the mean of the per-transition updates computed one at a time, and training
+resumed from a checkpoint (buffer included) must end up exactly where an uninterrupted run does.
+Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.experience_replay
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from battle_strategies import ApproxQLearningStrategy, BaseQLearningStrategy
+from data_store import DataStore
+from evaluation import evaluate
+from generator import Matchup, PokemonGenerator
+
+HYPERPARAMETERS = dict(gamma=0.9, alpha=0.01, epsilon=0.1)
+
+
+def _strategy(seed: int, replay: bool) -> ApproxQLearningStrategy:
+    strategy = ApproxQLearningStrategy(**HYPERPARAMETERS, rng=random.Random(seed))
+    if replay:
+        strategy.use_replay()
+    return strategy
+
+
+def _check_batch_update(strategy: ApproxQLearningStrategy) -> bool:
+    batch = strategy.replay.sample(strategy.batch_size, random.Random(0))
+    expected = np.zeros_like(strategy.weights)
+    for features, reward, next_features, num_next_moves in zip(batch.features, batch.rewards,
+                                                                batch.next_features, batch.num_next_moves):
+        next_q_val = 0 if num_next_moves == 0 else (next_features[:num_next_moves] @ strategy.weights).max()
+        td_error = reward + strategy.gamma * next_q_val - features @ strategy.weights
+        expected += strategy.alpha * td_error * features / strategy.batch_size
+    weights = strategy.weights.copy()
+    strategy._update_from_batch(batch)
+    return np.allclose(strategy.weights - weights, expected, rtol=1e-12, atol=1e-15)
+
+
+def _check_resume(all_pokemon, num_episodes: int, seed: int) -> bool:
+    straight = _strategy(seed, replay=True)
+    straight.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), 2 * num_episodes)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "replay.ckpt")
+        first_half = _strategy(seed, replay=True)
+        first_half.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), num_episodes, checkpoint_path=path)
+        generator = PokemonGenerator(all_pokemon)
+        resumed = BaseQLearningStrategy.load_checkpoint(path, generator)
+        print(f"replay checkpoint size           {os.path.getsize(path) / 1024:>10,.0f} KB")
+    resumed.train(generator, num_episodes)
+    return (resumed.replay is not None and np.array_equal(resumed.weights, straight.weights)
+            and np.array_equal(resumed.replay.features, straight.replay.features)
+            and resumed.rng.getstate() == straight.rng.getstate())
+
+
+def main(num_episodes: int = 3000, num_test_battles: int = 1000, seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    ok = True
+    for replay in (False, True):
+        strategy = _strategy(seed, replay)
+        generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+        start = time.perf_counter()
+        strategy.train(generator, num_episodes)
+        elapsed = time.perf_counter() - start
+        results = evaluate(strategy, all_pokemon, {Matchup.ADVANTAGEOUS: num_test_battles // 2,
+                                                   Matchup.DISADVANTAGEOUS: num_test_battles // 2}, seed=seed)
+        # Online, every transition is learned from once; with replay, every transition adds a batch update
+        print(f"{'replay' if replay else 'online':<8} {num_episodes / elapsed:>8,.0f} episodes/sec, "
+              f"{strategy.batch_size if replay else 1} transitions per update, "
+              f"win rate {results.total_win_rate:.1%}")
+        if replay:
+            batch_ok = _check_batch_update(strategy)
+            print(f"batch update matches loop        {'OK' if batch_ok else 'FAILED'}")
+            ok &= batch_ok
+
+    resume_ok = _check_resume(all_pokemon, num_episodes // 10, seed)
+    print(f"resumed replay training matches  {'OK' if resume_ok else 'FAILED'}")
+    return ok and resume_ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
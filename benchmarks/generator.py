@@ -0,0 +1,79 @@
+"""
+Measures how fast PokemonGenerator produces combatants: fresh Pokemon from species templates vs Pokemon
+recycled through release(), against the original per-call stat computation.
+
+Recycled Pokemon must be indistinguishable from fresh ones generated from the same seed, even after a
+battle has changed their hp, pp and statuses. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.generator
+"""
+import random
+import sys
+import time
+
+from battle_strategies import FullyRandomStrategy
+from data_store import DataStore
+from gameplay import Battle
+from generator import PokemonGenerator
+from models import Move, Pokemon, PokemonSpecies, Trainer
+
+
+def _legacy_pokemon(generator: PokemonGenerator, poke_species: PokemonSpecies) -> Pokemon:
+    """The original _pokemon_from_species, kept here only as a baseline."""
+    full_stats = generator.calc_all_stats(poke_species.base_stats, 100)
+    move_infos = generator.rng.sample(sorted(poke_species.learn_set, key=lambda move_info: move_info.api_id),
+                                      min(len(poke_species.learn_set), 4))
+    # noinspection PyTypeChecker
+    move_set = tuple(Move(move_info, pp=move_info.total_pp) for move_info in move_infos)
+    nickname = generator.rng.choice([name for name in generator.names])
+    return Pokemon(poke_species, hp=full_stats.total_hp, stats=full_stats, move_set=move_set, nickname=nickname)
+
+
+def _describe(pokemon: Pokemon) -> tuple:
+    return (pokemon.species.api_id, pokemon.stats, pokemon.hp, pokemon.nickname, pokemon.level,
+            pokemon.dmg_multiplier, pokemon.confusion_turns, pokemon.bound_turns, frozenset(pokemon.statuses),
+            tuple((move.info.api_id, move.pp) for move in pokemon.move_set))
+
+
+def main(num_pairs: int = 20_000, seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+
+    fresh_generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    pooled_generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    battle_rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(2000):
+        fresh = fresh_generator.generate(2)
+        pooled = pooled_generator.generate(2)
+        mismatches += [_describe(pokemon) for pokemon in fresh] != [_describe(pokemon) for pokemon in pooled]
+        Battle(Trainer("A", pooled[0], FullyRandomStrategy(battle_rng)),
+               Trainer("B", pooled[1], FullyRandomStrategy(battle_rng)),
+               training_mode=True, seed=battle_rng.getrandbits(64)).run()
+        pooled_generator.release(*pooled)
+    print(f"recycled Pokemon match fresh ones: {'OK' if mismatches == 0 else f'FAILED ({mismatches})'}")
+
+    def legacy(generator: PokemonGenerator):
+        for _ in range(num_pairs):
+            _legacy_pokemon(generator, generator.all_pokemon[generator.rng.randrange(len(generator.all_pokemon))])
+            _legacy_pokemon(generator, generator.all_pokemon[generator.rng.randrange(len(generator.all_pokemon))])
+
+    def templates(generator: PokemonGenerator):
+        for _ in range(num_pairs):
+            generator.generate(2)
+
+    def pooled(generator: PokemonGenerator):
+        for _ in range(num_pairs):
+            generator.release(*generator.generate(2))
+
+    for name, func in [("per-call stats", legacy), ("templates", templates), ("templates + pool", pooled)]:
+        generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+        # Builds the templates
+        templates(generator)
+        start = time.perf_counter()
+        func(generator)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<17} {num_pairs * 2 / elapsed:>12,.0f} Pokemon/sec")
+    return mismatches == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
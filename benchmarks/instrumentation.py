@@ -0,0 +1,94 @@
+"""
+Checks the instrumentation counters against the events battles emit, that recording doesn't change any result
+and that evaluation merges what its workers record, and reports the cost of recording.
+
+The same seeded battles are played with a CounterSink, with and without instrumentation; every counter with an
+event equivalent must match the sink's count and the winners must be identical. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.instrumentation
+"""
+import random
+import sys
+import time
+
+import instrumentation
+from battle_events import CounterSink, EventKind
+from battle_strategies import ApproxQLearningStrategy, FullyRandomStrategy
+from data_store import DataStore
+from evaluation import evaluate
+from gameplay import Battle
+from generator import Matchup, PokemonGenerator
+from models import PokemonStatus, Trainer
+
+# Counters and the event kinds they count
+EVENT_COUNTERS = {
+    "crits": EventKind.CRIT,
+    "misses": EventKind.MISS,
+    "charging_turns": EventKind.CHARGING,
+    "recharging_turns": EventKind.MUST_RECHARGE,
+    "status_applications": EventKind.AILMENT_APPLIED,
+}
+
+
+def _play(all_pokemon, num_battles: int, seed: int) -> tuple[list[int], CounterSink, float]:
+    rng = random.Random(seed)
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    sink = CounterSink()
+    battles = [Battle(Trainer("A", pokemon_a, FullyRandomStrategy(random.Random(seed))),
+                      Trainer("B", pokemon_b, FullyRandomStrategy(random.Random(seed))),
+                      training_mode=True, sink=sink, seed=rng.getrandbits(64))
+               for pokemon_a, pokemon_b in (generator.generate(2) for _ in range(num_battles))]
+    start = time.perf_counter()
+    winners = [battle.run() for battle in battles]
+    return winners, sink, time.perf_counter() - start
+
+
+def _training_rate(all_pokemon, num_episodes: int, seed: int) -> tuple[float, bytes]:
+    strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, rng=random.Random(seed))
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    start = time.perf_counter()
+    strategy.train(generator, num_episodes)
+    return num_episodes / (time.perf_counter() - start), strategy.weights.tobytes()
+
+
+def main(num_battles: int = 2000, num_episodes: int = 2000, seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    ok = True
+
+    plain_winners, _, plain_time = _play(all_pokemon, num_battles, seed)
+    with instrumentation.instrumented() as stats:
+        winners, sink, instrumented_time = _play(all_pokemon, num_battles, seed)
+    counts_match = all(stats.counters[counter] == sink.counts[kind] for counter, kind in EVENT_COUNTERS.items())
+    counts_match &= all(stats.counters[f"status_applications.{status.name.lower()}"] == sink.ailments[status]
+                        for status in PokemonStatus if sink.ailments[status])
+    print(f"counters match battle events     {'OK' if counts_match else 'FAILED'}")
+    same_winners = winners == plain_winners
+    print(f"same battles when recording      {'OK' if same_winners else 'FAILED'}")
+    ok &= counts_match and same_winners
+
+    plain_rate, plain_weights = _training_rate(all_pokemon, num_episodes, seed)
+    with instrumentation.instrumented() as stats:
+        instrumented_rate, weights = _training_rate(all_pokemon, num_episodes, seed)
+    same_training = weights == plain_weights
+    print(f"same training when recording     {'OK' if same_training else 'FAILED'}")
+    ok &= same_training
+    print(f"battles:  {num_battles / plain_time:>10,.0f}/sec, recording {num_battles / instrumented_time:>10,.0f}/sec")
+    print(f"training: {plain_rate:>10,.0f}/sec, recording {instrumented_rate:>10,.0f}/sec "
+          f"({stats.snapshot()['policy_evaluations_per_decision']:.2f} policy evaluations per decision)")
+
+    strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, rng=random.Random(seed))
+    strategy.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), num_episodes // 10)
+    snapshots = []
+    for num_workers in (1, 2):
+        with instrumentation.instrumented() as stats:
+            evaluate(strategy, all_pokemon, {Matchup.NEUTRAL: 200}, num_workers=num_workers, seed=seed)
+        snapshots.append(stats.snapshot())
+    merged = (snapshots[0]["counters"] == snapshots[1]["counters"]
+              and all(snapshots[0]["timers"][phase]["calls"] == timer["calls"]
+                      for phase, timer in snapshots[1]["timers"].items()))
+    print(f"evaluation merges worker counts  {'OK' if merged else 'FAILED'}")
+    ok &= merged
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
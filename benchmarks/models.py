@@ -0,0 +1,82 @@
+"""
+Memory and attribute-access benchmark for the slotted model classes.
+
+The "legacy" numbers come from plain dataclass twins of the models (same fields, with a per-instance __dict__
+and field-tuple hashing), which is how models.py defined them before. Run from the repository root with:
+python -m benchmarks.models
+"""
+import dataclasses
+import random
+import timeit
+import tracemalloc
+from typing import Any, Callable
+
+from data_store import DataStore
+from generator import PokemonGenerator
+import models
+
+MODEL_CLASSES = [models.HitInfo, models.MoveInfo, models.Move, models.Sprite, models.PokemonStats,
+                 models.PokemonSpecies, models.Pokemon]
+
+
+def _legacy_twin(cls):
+    twin_fields = [
+        (f.name, f.type, dataclasses.field(default=f.default, default_factory=f.default_factory))
+        for f in dataclasses.fields(cls)
+    ]
+    params = cls.__dataclass_params__
+    return dataclasses.make_dataclass(f"Legacy{cls.__name__}", twin_fields, frozen=params.frozen)
+
+
+LEGACY_CLASSES = {cls: _legacy_twin(cls) for cls in MODEL_CLASSES}
+
+
+def _rebuild(obj: Any, class_map: dict) -> Any:
+    """Deep copy of a model graph, building each model with class_map[type(model)] (or its own type)."""
+    if dataclasses.is_dataclass(obj):
+        target = class_map.get(type(obj), type(obj))
+        return target(**{f.name: _rebuild(getattr(obj, f.name), class_map) for f in dataclasses.fields(obj)})
+    if isinstance(obj, (list, tuple, set)):
+        return type(obj)(_rebuild(item, class_map) for item in obj)
+    return obj
+
+
+def _allocated(build: Callable[[], Any]) -> tuple[Any, int]:
+    tracemalloc.start()
+    result = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated
+
+
+def main(num_battles: int = 2000, seed: int = 0):
+    random.seed(seed)
+    data_store = DataStore()
+    generator = PokemonGenerator(data_store.all_pokemon)
+    battles = [generator.generate(2) for _ in range(num_battles)]
+
+    for name, class_map in (("legacy", LEGACY_CLASSES), ("slotted", {})):
+        dex, dex_bytes = _allocated(lambda: (_rebuild(list(data_store.all_moves), class_map),
+                                             _rebuild(list(data_store.all_pokemon), class_map)))
+        # Species are shared between battles, just like in the real generator
+        live, battle_bytes = _allocated(lambda: [
+            [class_map.get(models.Pokemon, models.Pokemon)(
+                species=pokemon.species, stats=_rebuild(pokemon.stats, class_map), hp=pokemon.hp,
+                move_set=_rebuild(pokemon.move_set, class_map), nickname=pokemon.nickname
+            ) for pokemon in battle]
+            for battle in battles
+        ])
+        moves = dex[0]
+        access = min(timeit.repeat(lambda: [(m.power, m.type, m.accuracy) for m in moves], number=200, repeat=5))
+        hashing = min(timeit.repeat(lambda: set(moves), number=200, repeat=5))
+        num_accesses = 3 * 200 * len(moves)
+
+        print(f"{name}:")
+        print(f"  dex:             {dex_bytes / 1024:>10,.1f} KiB")
+        print(f"  per live battle: {battle_bytes / num_battles:>10,.1f} B")
+        print(f"  attribute reads: {num_accesses / access:>14,.0f} /sec")
+        print(f"  set(all_moves):  {200 / hashing:>14,.0f} /sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Checks QLearningStrategy's array-backed Q-table against the original dict-backed one and compares their
+training speed, lookup speed and saved size.
+
+Both are trained from the same seed and must end up with exactly the same Q-value for every (state, action)
+they visited, and the table must survive a save/load round trip. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.q_table
+"""
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from battle_strategies import QLearningStrategy, State
+from data_store import DataStore
+from generator import PokemonGenerator
+from models import MoveInfo
+
+
+class DictQLearningStrategy(QLearningStrategy):
+    """The original defaultdict Q-values keyed by (state tuple, action tuple), kept here only as a baseline."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._q_values = defaultdict(float)
+
+    def _get_q_value(self, state: State, move: MoveInfo) -> float:
+        if state[0].fainted:
+            return 0
+        return self._q_values[(self._extract_state(state), self._extract_action(move))]
+
+    def _get_q_values(self, state: State) -> list[float]:
+        return [self._get_q_value(state, move) for move in state[0].move_infos]
+
+    def _update(self, reward, action: MoveInfo, state: State, next_state: State):
+        next_q_val = max(self._get_q_values(next_state))
+        q_val = self._get_q_value(state, action)
+        td_error = reward + (self.gamma * next_q_val) - q_val
+        self._q_values[(self._extract_state(state), self._extract_action(action))] = q_val + self.alpha * td_error
+
+
+def _train(cls, all_pokemon, num_episodes: int, seed: int) -> tuple[QLearningStrategy, float]:
+    strategy = cls(gamma=0.9, alpha=0.1, epsilon=0.1, rng=random.Random(seed))
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    start = time.perf_counter()
+    strategy.train(generator, num_episodes)
+    return strategy, time.perf_counter() - start
+
+
+def main(num_episodes: int = 3000, seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    legacy, legacy_time = _train(DictQLearningStrategy, all_pokemon, num_episodes, seed)
+    table, table_time = _train(QLearningStrategy, all_pokemon, num_episodes, seed)
+
+    q_table = table.q_table
+    written = {(state, action): value for (state, action), value in legacy._q_values.items() if value != 0}
+    from_table = {
+        (q_table.states.decode(int(state_code)), q_table.actions.decode(action_code)): float(value)
+        for state_code, row in zip(q_table.state_codes, q_table.values)
+        for action_code, value in enumerate(row) if value != 0
+    }
+    same_values = written == from_table
+    print(f"same Q-values as the dict        {'OK' if same_values else 'FAILED'} ({len(from_table)} non-zero)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table_path, pickle_path = os.path.join(tmp_dir, "q.npz"), os.path.join(tmp_dir, "q.pickle")
+        start = time.perf_counter()
+        q_table.save(table_path)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        table.load_q_table(table_path)
+        load_time = time.perf_counter() - start
+        with open(pickle_path, "wb") as f:
+            pickle.dump(dict(legacy._q_values), f)
+        round_trip = (np.array_equal(table.q_table.values, q_table.values)
+                      and np.array_equal(table.q_table.state_codes, q_table.state_codes))
+        print(f"save/load round trip             {'OK' if round_trip else 'FAILED'}")
+        print(f"saved size: table {os.path.getsize(table_path) / 1024:,.0f} KB, "
+              f"pickled dict {os.path.getsize(pickle_path) / 1024:,.0f} KB "
+              f"(save {save_time * 1000:.1f} ms, load {load_time * 1000:.1f} ms)")
+
+    print(f"training, dict                   {num_episodes / legacy_time:>10,.0f} episodes/sec")
+    print(f"training, table                  {num_episodes / table_time:>10,.0f} episodes/sec")
+
+    generator = PokemonGenerator(all_pokemon, rng=random.Random(seed))
+    states = [tuple(pokemon.snapshot() for pokemon in generator.generate(2)) for _ in range(5000)]
+    for name, strategy in [("lookups, dict", legacy), ("lookups, table", table)]:
+        start = time.perf_counter()
+        for state in states:
+            strategy._get_q_values(state)
+        print(f"{name:<32} {len(states) / (time.perf_counter() - start):>10,.0f} states/sec")
+    return same_values and round_trip
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
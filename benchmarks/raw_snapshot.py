@@ -0,0 +1,81 @@
+"""
+Checks that the dex can be rebuilt offline from the raw snapshot and that refreshes are incremental, using the
+local pokeapi.co stand-in from benchmarks.scrapers.
+
+Exits with status 1 if any check fails. Run from the repository root with: python -m benchmarks.raw_snapshot
+"""
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from benchmarks.scrapers import FLAKY_PATH, _StandInServer
+from data_store import DataStore
+from scrapers import MoveScraper
+
+
+def main(num_moves: int = 165, num_pokemon: int = 151) -> bool:
+    server = _StandInServer(num_moves, num_pokemon, latency=0, etags=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    checks = {}
+    num_documents = 1 + num_moves + num_pokemon
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+
+            def new_store() -> DataStore:
+                return DataStore(moves_cache=str(tmp_dir / "all_moves.data"),
+                                 pokemon_cache=str(tmp_dir / "all_pokemon.data"), dex_cache=str(tmp_dir / "dex.bin"),
+                                 http_cache=None, snapshot_dir=str(tmp_dir / "snapshot"),
+                                 generation_url=server.gen_url)
+
+            data_store = new_store()
+            # The stand-in fails the first request for one move, which gets retried
+            checks["first load downloads every document once"] = server.num_requests == num_documents + 1 and \
+                all(hits == 1 for path, hits in server.hits.items() if path != FLAKY_PATH)
+            num_moves_before = len(data_store.all_moves)
+
+            requests_before = server.num_requests
+            new_store()
+            checks["second load is offline"] = server.num_requests == requests_before
+
+            changed_path = "/api/v2/move/7/"
+            server.docs[changed_path] = {**server.docs[changed_path], "power": 999, "damage_class": {"name": "special"}}
+            stats = new_store().refresh()
+            changed_url = server.gen_url.replace("/api/v2/generation/1/", changed_path)
+            checks["refresh only updates the changed document"] = \
+                stats.updated == [changed_url] and len(stats.unchanged) == num_documents - 1
+            checks["refresh re-derives the dex"] = any(
+                move.api_id == 7 and move.power == 999 for move in new_store().all_moves
+            )
+
+            server.etags = False
+            stats = new_store().refresh()
+            checks["refresh without ETags compares contents"] = not stats.changed
+
+            original_init = MoveScraper.__init__
+
+            def init_with_blacklist(self, *args, **kwargs):
+                original_init(self, *args, **kwargs)
+                self.blacklist.add("move-7")
+
+            requests_before = server.num_requests
+            MoveScraper.__init__ = init_with_blacklist
+            try:
+                data_store = new_store()
+            finally:
+                MoveScraper.__init__ = original_init
+            checks["blacklist change re-derives offline"] = (
+                server.num_requests == requests_before and len(data_store.all_moves) == num_moves_before - 1
+                and all(move.api_id != 7 for move in data_store.all_moves)
+            )
+    finally:
+        server.shutdown()
+
+    for name, passed in checks.items():
+        print(f"{name:<43} {'OK' if passed else 'FAILED'}")
+    return all(checks.values())
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
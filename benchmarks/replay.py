@@ -0,0 +1,79 @@
+"""
+Checks that replays reproduce battles exactly and reports replay sizes and battle throughput with and without
+the buffered RNG stream.
+
+Every battle is captured, serialized, parsed back and replayed; the replayed battle must emit exactly the same
+events (kind, Pokemon, move, amount, hits, status) and end the same way. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.replay
+"""
+import random
+import sys
+import time
+
+from battle_events import BattleEvent, EventSink
+from battle_strategies import FullyRandomStrategy
+from data_store import DataStore
+from gameplay import Battle
+from generator import PokemonGenerator
+from models import Trainer
+from replay import BattleReplay
+
+
+class _RecordingSink(EventSink):
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event: BattleEvent):
+        pokemon = event.pokemon
+        self.events.append((event.kind, pokemon.nickname if pokemon is not None else None,
+                            pokemon.hp if pokemon is not None else None,
+                            event.move.info.api_id if event.move is not None else None,
+                            event.amount, event.hits, event.status))
+
+
+def _new_battle(generator: PokemonGenerator, rng: random.Random, buffered: bool, sink=None) -> Battle:
+    pokemon_a, pokemon_b = generator.generate(2)
+    return Battle(Trainer("Trainer A", pokemon_a, FullyRandomStrategy(rng)),
+                  Trainer("Trainer B", pokemon_b, FullyRandomStrategy(rng)),
+                  training_mode=True, sink=sink, seed=rng.getrandbits(64), buffered=buffered)
+
+
+def main(num_battles: int = 2000, seed: int = 0) -> bool:
+    data_store = DataStore()
+    all_pokemon = data_store.all_pokemon
+    ok = True
+    for buffered in (False, True):
+        rng = random.Random(seed)
+        generator = PokemonGenerator(all_pokemon, rng=rng)
+        mismatches = total_bytes = 0
+        for _ in range(num_battles):
+            sink = _RecordingSink()
+            battle = _new_battle(generator, rng, buffered, sink)
+            replay = BattleReplay.capture(battle)
+            winner = battle.run()
+
+            data = replay.to_bytes()
+            total_bytes += len(data)
+            replay_sink = _RecordingSink()
+            replayed = BattleReplay.from_bytes(data).to_battle(data_store.index, sink=replay_sink)
+            replayed_winner = replayed.run()
+            if (replayed_winner, replayed.turn_count, replay_sink.events) != (winner, battle.turn_count, sink.events):
+                mismatches += 1
+
+        rng = random.Random(seed)
+        generator = PokemonGenerator(all_pokemon, rng=rng)
+        battles = [_new_battle(generator, rng, buffered) for _ in range(num_battles)]
+        start = time.perf_counter()
+        for battle in battles:
+            battle.run()
+        elapsed = time.perf_counter() - start
+
+        name = "buffered" if buffered else "unbuffered"
+        print(f"{name:<11} {num_battles / elapsed:>10,.0f} battles/sec, "
+              f"{total_bytes / num_battles:.1f} bytes/replay, {mismatches} mismatched replays")
+        ok &= mismatches == 0
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,159 @@
+"""
+Checks the scraping pipeline against a local stand-in for pokeapi.co and compares its speed with scraping moves and
+Pokemon as two sequential phases.
+
+The server serves a synthetic generation with every response delayed by a fixed latency, and fails the first
+request for one move with a 503. Checks that the threaded pipeline, the asyncio pipeline and the two-phase scrape
+agree, that the failed request is retried, that a warm response cache makes no requests, and that the rate limit
+is respected. Exits with status 1 if any check fails. Run from the repository root with:
+python -m benchmarks.scrapers
+"""
+import asyncio
+import hashlib
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scrapers import Fetcher, MoveScraper, PokemonScraper, ResponseCache, scrape_dex, scrape_dex_async
+
+TYPES = ["normal", "fire", "water", "grass", "electric", "psychic", "ice", "dragon"]
+FLAKY_PATH = "/api/v2/move/3/"
+
+
+def _move_doc(move_id: int, rng: random.Random) -> dict:
+    return {
+        "id": move_id, "name": f"move-{move_id}", "past_values": [],
+        "damage_class": {"name": rng.choice(["physical", "special", "status"])},
+        "power": rng.choice([None, 40, 80, 120]), "pp": rng.choice([5, 10, 20]), "priority": 0,
+        "accuracy": rng.choice([None, 85, 100]), "type": {"name": rng.choice(TYPES)},
+        "meta": {"min_hits": None, "max_hits": None, "ailment": {"name": rng.choice(["none", "burn", "paralysis"])},
+                 "ailment_chance": rng.choice([0, 10, 30]), "healing": 0, "drain": rng.choice([0, 50, -25])},
+    }
+
+
+def _pokemon_doc(poke_id: int, num_moves: int, rng: random.Random) -> dict:
+    types = rng.sample(TYPES, rng.choice([1, 2]))
+    return {
+        "id": poke_id, "name": f"mon-{poke_id}", "past_types": [],
+        "sprites": {"versions": {"generation-i": {"red-blue": {"front_default": f"front-{poke_id}.png",
+                                                               "back_default": None}}}},
+        "stats": [{"stat": {"name": name}, "base_stat": rng.randint(20, 150)}
+                  for name in ("hp", "attack", "defense", "special-attack", "speed")],
+        "moves": [{"move": {"name": f"move-{move_id}"},
+                   "version_group_details": [{"version_group": {"name": "red-blue"}}]}
+                  for move_id in rng.sample(range(1, num_moves + 1), 8)],
+        "types": [{"slot": slot + 1, "type": {"name": name}} for slot, name in enumerate(types)],
+    }
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, num_moves: int, num_pokemon: int, latency: float, seed: int = 0, etags: bool = False):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        # Whether to send ETags and answer If-None-Match with 304 Not Modified
+        self.etags = etags
+        self.hits: Counter[str] = Counter()
+        self.lock = threading.Lock()
+        base = f"http://127.0.0.1:{self.server_address[1]}/api/v2"
+        self.gen_url = f"{base}/generation/1/"
+        rng = random.Random(seed)
+        self.docs = {f"/api/v2/move/{i}/": _move_doc(i, rng) for i in range(1, num_moves + 1)}
+        self.docs.update({f"/api/v2/pokemon/{i}/": _pokemon_doc(i, num_moves, rng) for i in range(1, num_pokemon + 1)})
+        self.docs["/api/v2/generation/1/"] = {
+            "moves": [{"url": f"{base}/move/{i}/"} for i in range(1, num_moves + 1)],
+            "pokemon_species": [{"url": f"{base}/pokemon-species/{i}/"} for i in range(1, num_pokemon + 1)],
+        }
+
+    @property
+    def num_requests(self) -> int:
+        return sum(self.hits.values())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _StandInServer
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits[self.path] += 1
+            num_hits = self.server.hits[self.path]
+        time.sleep(self.server.latency)
+        doc = self.server.docs.get(self.path)
+        status = 404 if doc is None else 503 if self.path == FLAKY_PATH and num_hits == 1 else 200
+        body = json.dumps(doc if status == 200 else {}).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if status == 200 and self.server.etags and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.etags:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _two_phase(gen_data: dict, fetcher: Fetcher):
+    moves = MoveScraper(fetcher).scrape(gen_data)
+    return moves, PokemonScraper(moves, fetcher).scrape(gen_data)
+
+
+def main(num_moves: int = 165, num_pokemon: int = 151, latency: float = 0.02) -> bool:
+    server = _StandInServer(num_moves, num_pokemon, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    checks = {}
+    try:
+        with Fetcher() as fetcher:
+            gen_data = fetcher.get_json(server.gen_url)
+        results = {}
+        runs = {
+            "two phases": lambda fetcher: _two_phase(gen_data, fetcher),
+            "pipeline": lambda fetcher: scrape_dex(gen_data, fetcher),
+            "asyncio pipeline": lambda fetcher: asyncio.run(scrape_dex_async(gen_data, fetcher)),
+        }
+        for name, run in runs.items():
+            start = time.perf_counter()
+            with Fetcher(max_connections=8, backoff=0.01) as fetcher:
+                results[name] = run(fetcher)
+            print(f"{name:<17} {time.perf_counter() - start:>7.3f} s")
+            if name == "two phases":
+                checks["failed request retried"] = server.hits[FLAKY_PATH] == 2
+        checks["same results"] = results["two phases"] == results["pipeline"] == results["asyncio pipeline"]
+        checks["moves and pokemon scraped"] = bool(results["pipeline"][0]) and \
+            len(results["pipeline"][1]) == num_pokemon
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with Fetcher(cache=ResponseCache(cache_dir)) as fetcher:
+                cold = scrape_dex(gen_data, fetcher)
+            requests_before = server.num_requests
+            with Fetcher(cache=ResponseCache(cache_dir)) as fetcher:
+                warm = scrape_dex(gen_data, fetcher)
+                checks["warm cache makes no requests"] = server.num_requests == requests_before and \
+                    fetcher.num_cache_hits == num_moves + num_pokemon and warm == cold
+
+        urls = [doc["url"] for doc in gen_data["moves"][:40]]
+        rate = 400
+        start = time.perf_counter()
+        with Fetcher(requests_per_sec=rate) as fetcher:
+            fetcher.map_json(urls)
+        checks["rate limit respected"] = time.perf_counter() - start >= (len(urls) - 1) / rate
+    finally:
+        server.shutdown()
+
+    for name, passed in checks.items():
+        print(f"{name:<29} {'OK' if passed else 'FAILED'}")
+    return all(checks.values())
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,31 @@
+"""
+Compares the per-turn state copy used by Q-learning training (Pokemon.snapshot) against copy.deepcopy,
+and reports training episodes/sec. Run from the repository root with: python -m benchmarks.snapshots
+"""
+import copy
+import random
+import time
+import timeit
+
+from battle_strategies import ApproxQLearningStrategy
+from data_store import DataStore
+from generator import PokemonGenerator
+
+
+def main(num_pokemon: int = 500, num_episodes: int = 500, seed: int = 0):
+    random.seed(seed)
+    generator = PokemonGenerator(DataStore().all_pokemon)
+    all_pokemon = generator.generate(num_pokemon)
+
+    for name, func in (("copy.deepcopy", copy.deepcopy), ("Pokemon.snapshot", lambda p: p.snapshot())):
+        best = min(timeit.repeat(lambda: [func(pokemon) for pokemon in all_pokemon], number=1, repeat=5))
+        print(f"{name:<18} {num_pokemon / best:>12,.0f} copies/sec")
+
+    strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, softmax=True)
+    start = time.time()
+    strategy.train(generator, num_episodes=num_episodes)
+    print(f"Training: {num_episodes / (time.time() - start):,.1f} episodes/sec")
+
+
+if __name__ == '__main__':
+    main()
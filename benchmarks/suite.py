@@ -0,0 +1,261 @@
+"""
+Benchmark suite for the engine, strategies, generator and data loading, over fixed seeded matchup corpora.
+
+Every benchmark is repeated and its best run kept. Results can be written to JSON (--output) and compared
+against a stored baseline (--baseline, benchmarks/baseline.json by default); any metric more than its
+threshold worse than the baseline counts as a regression and the suite exits with status 1.
+Run with --save-baseline to store the current results as the baseline.
+Run from the repository root with: python -m benchmarks.suite
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from battle_strategies import ApproxQLearningStrategy, BaseQLearningStrategy, FullyRandomStrategy, QLearningStrategy
+from data_store import DataStore
+from gameplay import Battle
+from generator import Matchup, PokemonGenerator
+from models import Pokemon, Trainer
+
+RESULTS_VERSION = 1
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# Fraction a metric may get worse than the baseline before it counts as a regression
+DEFAULT_THRESHOLD = 0.15
+# Metrics that are noisier than the rest
+THRESHOLDS = {
+    "datastore_load_pickle": 0.5,
+    "datastore_load_dex_cache": 0.5,
+}
+
+
+@dataclass
+class Result:
+    value: float
+    unit: str
+    higher_is_better: bool
+
+
+def _best(run: Callable[[], tuple[float, float]], repeat: int) -> float:
+    """run returns (amount of work, seconds taken); keeps the best rate. Like timeit, runs without the GC."""
+    rates = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            amount, elapsed = run()
+        finally:
+            gc.enable()
+        rates.append(amount / elapsed)
+    return max(rates)
+
+
+def _battle(pokemon_a: Pokemon, pokemon_b: Pokemon, rng: random.Random) -> Battle:
+    return Battle(Trainer("A", pokemon_a, FullyRandomStrategy(rng)), Trainer("B", pokemon_b, FullyRandomStrategy(rng)),
+                  training_mode=True, seed=rng.getrandbits(64))
+
+
+class Suite:
+    def __init__(self, data_store: DataStore, seed: int = 0, num_matchups: int = 1000, num_episodes: int = 1000,
+                 repeat: int = 3):
+        self.data_store = data_store
+        self.all_pokemon = data_store.all_pokemon
+        self.seed = seed
+        self.num_matchups = num_matchups
+        self.num_episodes = num_episodes
+        self.repeat = repeat
+
+    def _battles(self) -> list[Battle]:
+        """The same fresh battles every time, since battles use up their Pokemon."""
+        rng = random.Random(self.seed)
+        generator = PokemonGenerator(self.all_pokemon, rng=random.Random(self.seed))
+        return [_battle(*generator.generate(2), rng) for _ in range(self.num_matchups)]
+
+    def _states(self) -> list[tuple]:
+        generator = PokemonGenerator(self.all_pokemon, rng=random.Random(self.seed))
+        return [tuple(pokemon.snapshot() for pokemon in generator.generate(2)) for _ in range(self.num_matchups)]
+
+    def play_turn(self) -> Result:
+        def run():
+            battles = self._battles()
+            start = time.perf_counter()
+            for battle in battles:
+                while not battle.finished:
+                    battle.play_turn()
+            return sum(battle.turn_count for battle in battles), time.perf_counter() - start
+        return Result(_best(run, self.repeat), "turns/sec", True)
+
+    def battles(self) -> Result:
+        def run():
+            battles = self._battles()
+            start = time.perf_counter()
+            for battle in battles:
+                battle.run()
+            return len(battles), time.perf_counter() - start
+        return Result(_best(run, self.repeat), "battles/sec", True)
+
+    def generate(self, matchup: Matchup) -> Result:
+        def run():
+            generator = PokemonGenerator(self.all_pokemon, rng=random.Random(self.seed))
+            start = time.perf_counter()
+            for _ in range(self.num_matchups):
+                generator.generate(2, matchup)
+            return self.num_matchups, time.perf_counter() - start
+        return Result(_best(run, self.repeat), "calls/sec", True)
+
+    def _trained(self, cls: type[BaseQLearningStrategy], num_episodes: int) -> BaseQLearningStrategy:
+        strategy = cls(gamma=0.9, alpha=0.01, epsilon=0.1, rng=random.Random(self.seed))
+        strategy.train(PokemonGenerator(self.all_pokemon, rng=random.Random(self.seed)), num_episodes)
+        return strategy
+
+    def get_features(self) -> Result:
+        strategy = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1)
+        states = self._states()
+
+        def run():
+            # Starts from an empty matchup cache every time
+            strategy._static_features.clear()
+            start = time.perf_counter()
+            for state in states:
+                for move in state[0].move_infos:
+                    strategy._get_features(state, move)
+            return sum(len(state[0].move_infos) for state in states), time.perf_counter() - start
+        return Result(_best(run, self.repeat), "calls/sec", True)
+
+    def get_q_value(self, cls: type[BaseQLearningStrategy]) -> Result:
+        strategy = self._trained(cls, self.num_episodes // 10)
+        states = self._states()
+
+        def run():
+            start = time.perf_counter()
+            for state in states:
+                for move in state[0].move_infos:
+                    strategy._get_q_value(state, move)
+            return sum(len(state[0].move_infos) for state in states), time.perf_counter() - start
+        return Result(_best(run, self.repeat), "calls/sec", True)
+
+    def training(self, cls: type[BaseQLearningStrategy]) -> Result:
+        def run():
+            start = time.perf_counter()
+            self._trained(cls, self.num_episodes)
+            return self.num_episodes, time.perf_counter() - start
+        return Result(_best(run, self.repeat), "episodes/sec", True)
+
+    def datastore_load(self, use_dex_cache: bool) -> Result:
+        data_store = self.data_store
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dex_cache = None
+            if use_dex_cache:
+                dex_cache = str(Path(tmp_dir) / "dex.bin")
+                # Writes the dex cache for the timed loads
+                DataStore(data_store.moves_cache, data_store.pokemon_cache, dex_cache=dex_cache, http_cache=None,
+                          snapshot_dir=None)
+
+            def run():
+                start = time.perf_counter()
+                loaded = DataStore(data_store.moves_cache, data_store.pokemon_cache, dex_cache=dex_cache,
+                                   http_cache=None, snapshot_dir=None)
+                # Lazily loaded dexes only count once everything has been built
+                list(loaded.all_moves), list(loaded.all_pokemon)
+                return 1, time.perf_counter() - start
+            loads_per_sec = _best(run, self.repeat)
+        return Result(1000 / loads_per_sec, "ms", False)
+
+    def run(self, log: Callable[[str], None] = print) -> dict[str, Result]:
+        benchmarks = {
+            "play_turn": self.play_turn,
+            "battles": self.battles,
+            **{f"generate_{matchup.name.lower()}": (lambda matchup=matchup: self.generate(matchup))
+               for matchup in Matchup},
+            "approx_get_features": self.get_features,
+            "approx_get_q_value": lambda: self.get_q_value(ApproxQLearningStrategy),
+            "table_get_q_value": lambda: self.get_q_value(QLearningStrategy),
+            "approx_training": lambda: self.training(ApproxQLearningStrategy),
+            "table_training": lambda: self.training(QLearningStrategy),
+            "datastore_load_pickle": lambda: self.datastore_load(use_dex_cache=False),
+            "datastore_load_dex_cache": lambda: self.datastore_load(use_dex_cache=True),
+        }
+        results = {}
+        for name, benchmark in benchmarks.items():
+            results[name] = benchmark()
+            log(f"{name:<28} {results[name].value:>14,.2f} {results[name].unit}")
+        return results
+
+
+def to_json(results: dict[str, Result], settings: dict) -> dict:
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": {name: asdict(result) for name, result in results.items()},
+    }
+
+
+def compare(results: dict[str, Result], settings: dict, baseline: dict, threshold: Optional[float] = None,
+            log: Callable[[str], None] = print) -> list[str]:
+    """Returns the names of the metrics that regressed past their threshold."""
+    if baseline.get("version") != RESULTS_VERSION:
+        raise ValueError(f"Unsupported baseline version: {baseline.get('version')}")
+    if baseline["settings"] != settings:
+        # Rates depend on the corpora, so they're only comparable between runs over the same ones
+        raise ValueError(f"Baseline was run with {baseline['settings']}, not {settings}")
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            log(f"{name:<28} {'(not in baseline)':>14}")
+            continue
+        baseline_value = baseline["results"][name]["value"]
+        # Positive is better, whichever direction the metric goes
+        change = result.value / baseline_value - 1 if result.higher_is_better else baseline_value / result.value - 1
+        allowed = threshold if threshold is not None else THRESHOLDS.get(name, DEFAULT_THRESHOLD)
+        regressed = change < -allowed
+        if regressed:
+            regressions.append(name)
+        log(f"{name:<28} {change:>+13.1%} {'REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> bool:
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite")
+    parser.add_argument("--output", type=Path, help="Where to write the results as JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--threshold", type=float, help="Allowed fraction worse than the baseline, for every metric")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--matchups", type=int, default=1000, help="Size of the matchup corpora")
+    parser.add_argument("--episodes", type=int, default=1000, help="Training episodes per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    suite = Suite(DataStore(), seed=args.seed, num_matchups=args.matchups, num_episodes=args.episodes,
+                  repeat=args.repeat)
+    results = suite.run()
+    settings = {"seed": args.seed, "matchups": args.matchups, "episodes": args.episodes}
+    results_json = to_json(results, settings)
+    if args.output is not None:
+        args.output.write_text(json.dumps(results_json, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results_json, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+        return True
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one")
+        return True
+    print(f"\nCompared to {args.baseline}:")
+    regressions = compare(results, settings, json.loads(args.baseline.read_text()), args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+    return not regressions
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
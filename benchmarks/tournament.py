@@ -0,0 +1,66 @@
+"""
+Runs a small round-robin tournament and checks the sequential test, the Bradley-Terry ratings and that results
+don't depend on the number of workers.
+
+Two copies of the random strategy must come out even, a trained approximate Q-learning strategy must be found
+stronger than random in fewer games than the even pairing took, the tournament must play out identically with
+1 and 2 workers, and the ratings fitted to simulated games between strategies of known Elo must cover the true
+ratings about as often as their confidence level says. Exits with status 1 otherwise.
+Run from the repository root with: python -m benchmarks.tournament
+"""
+import random
+import sys
+
+import numpy as np
+
+from battle_strategies import ApproxQLearningStrategy, FullyRandomStrategy
+from data_store import DataStore
+from generator import PokemonGenerator
+from tournament import PairingResult, bradley_terry, elo_to_win_rate, run_tournament
+
+
+def _check_coverage(true_elos: list[float], games_per_pairing: int = 400, num_trials: int = 200,
+                    seed: int = 0) -> float:
+    """Fraction of simulated tournaments in which each strategy's true (centered) Elo is inside its interval."""
+    rng = np.random.default_rng(seed)
+    names = [f"s{ind}" for ind in range(len(true_elos))]
+    centered = np.array(true_elos) - np.mean(true_elos)
+    covered = 0
+    for _ in range(num_trials):
+        pairings = []
+        for first in range(len(names)):
+            for second in range(first + 1, len(names)):
+                wins = int(rng.binomial(games_per_pairing, elo_to_win_rate(true_elos[first] - true_elos[second])))
+                pairings.append(PairingResult(names[first], names[second], wins=wins, games=games_per_pairing))
+        for rating in bradley_terry(names, pairings):
+            covered += abs(rating.elo - centered[names.index(rating.name)]) <= rating.margin
+    return covered / (num_trials * len(names))
+
+
+def main(seed: int = 0) -> bool:
+    all_pokemon = DataStore().all_pokemon
+    trained = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, softmax=True, rng=random.Random(seed))
+    trained.train(PokemonGenerator(all_pokemon, rng=random.Random(seed)), 1000)
+    entrants = {"random": FullyRandomStrategy(), "random_copy": FullyRandomStrategy(), "approx_q": trained}
+
+    results = [run_tournament(entrants, all_pokemon, num_workers=num_workers, seed=seed) for num_workers in (1, 2)]
+    print(results[0].report())
+    print()
+    same = results[0].pairings == results[1].pairings and results[0].ratings == results[1].ratings
+    print(f"same with 1 and 2 workers        {'OK' if same else 'FAILED'}")
+
+    pairings = {(pairing.first, pairing.second): pairing for pairing in results[0].pairings}
+    even = pairings["random", "random_copy"]
+    lopsided = pairings["random", "approx_q"]
+    decided = even.decision == "even" and lopsided.decision == "second" and lopsided.games < even.games
+    print(f"sequential test decisions        {'OK' if decided else 'FAILED'} "
+          f"({lopsided.games} games to separate, {even.games} to call even)")
+
+    coverage = _check_coverage([0, 100, 150, 400], seed=seed)
+    covers = 0.92 <= coverage <= 0.98
+    print(f"95% intervals cover true Elo     {'OK' if covers else 'FAILED'} ({coverage:.1%})")
+    return same and decided and covers
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
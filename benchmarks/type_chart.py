@@ -0,0 +1,71 @@
+"""
+Micro-benchmark for type-effectiveness lookups.
+
+Compares the original JSON-backed list-scan implementation of Type.dmg_modifier against
+the precomputed type charts. Run from the repository root with: python -m benchmarks.type_chart
+"""
+import json
+import random
+import timeit
+
+from models import DATA_DIR, Type
+
+
+class LegacyTypeChart:
+    """The original Type.dmg_modifier, kept here only as a baseline."""
+    @classmethod
+    def dmg_modifier(cls, attacking_type: Type, defending_type: Type) -> float:
+        if not hasattr(cls, "_dmg_map"):
+            with open(DATA_DIR / "dmg_map.json", "r") as f:
+                data = json.load(f)
+            cls._dmg_map = {Type(k.upper()): {m: [Type(t.upper()) for t in t_list]
+                                              for m, t_list in v.items()}
+                            for k, v in data.items()}
+        type_dmg_map = cls._dmg_map[attacking_type]
+        if defending_type in type_dmg_map["double_damage_to"]:
+            return 2
+        elif defending_type in type_dmg_map["half_damage_to"]:
+            return 0.5
+        elif defending_type in type_dmg_map["no_damage_to"]:
+            return 0
+        else:
+            return 1
+
+    @classmethod
+    def effectiveness(cls, attacking_type: Type, defending_types: list[Type]) -> float:
+        type_modifier = cls.dmg_modifier(attacking_type, defending_types[0])
+        if len(defending_types) > 1:
+            type_modifier *= cls.dmg_modifier(attacking_type, defending_types[1])
+        return type_modifier
+
+
+def _lookups_per_sec(func, pairs: list, repeat: int = 5) -> float:
+    def run():
+        for attacking, defending in pairs:
+            func(attacking, defending)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return len(pairs) / best
+
+
+def main(num_lookups: int = 200_000, seed: int = 0):
+    rng = random.Random(seed)
+    all_types = list(Type)
+    single_pairs = [(rng.choice(all_types), rng.choice(all_types)) for _ in range(num_lookups)]
+    dual_pairs = [(rng.choice(all_types), rng.sample(all_types, rng.randint(1, 2))) for _ in range(num_lookups)]
+
+    # Sanity check before timing anything
+    for attacking, defending in dual_pairs[:1000]:
+        assert LegacyTypeChart.effectiveness(attacking, defending) == Type.effectiveness(attacking, defending)
+
+    results = {
+        "dmg_modifier (legacy)": _lookups_per_sec(LegacyTypeChart.dmg_modifier, single_pairs),
+        "dmg_modifier (chart)": _lookups_per_sec(Type.dmg_modifier, single_pairs),
+        "dual-type modifier (legacy)": _lookups_per_sec(LegacyTypeChart.effectiveness, dual_pairs),
+        "dual-type modifier (chart)": _lookups_per_sec(Type.effectiveness, dual_pairs),
+    }
+    for name, rate in results.items():
+        print(f"{name:<30} {rate:>14,.0f} lookups/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import random
+import struct
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+# Layout (little-endian):
+#   header:     magic, version, flags (bit 0: softmax), gamma, alpha, epsilon, episodes trained
+#   kind:       strategy class name
+#   rng states: u8 count, then per stream the 625 words of random.Random's state, a has-gauss byte and gauss_next
+#   arrays:     u8 count, then per array its name, dtype, u8 ndim, u32 per dimension, u32 length and the
+#               zlib-compressed data. Strings are a u8 length followed by UTF-8.
+MAGIC = b"PQCK"
+VERSION = 1
+_HEADER = struct.Struct("<4sBB3dQ")
+_RNG_STATE = struct.Struct("<625IBd")
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_SOFTMAX_FLAG = 1
+# random.Random.getstate() version this format stores
+_RNG_STATE_VERSION = 3
+# Where run.py saves the strategy it trains, and where the tournament and battle server look for it
+CHECKPOINT_PATH = "./data/approx_q.ckpt"
+
+
+@dataclass
+class Checkpoint:
+    """Everything needed to resume training a Q-learning strategy exactly where it left off."""
+    kind: str
+    gamma: float
+    alpha: float
+    epsilon: float
+    softmax: bool
+    episodes_trained: int
+    # random.Random.getstate() of the strategy's stream, then any others saved with it (e.g. a generator's)
+    rng_states: list[tuple] = field(default_factory=list)
+    # Weights or Q-table, by name
+    arrays: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(MAGIC, VERSION, _SOFTMAX_FLAG if self.softmax else 0, self.gamma, self.alpha,
+                              self.epsilon, self.episodes_trained),
+                 _pack_str(self.kind), _U8.pack(len(self.rng_states))]
+        for version, internal_state, gauss_next in self.rng_states:
+            if version != _RNG_STATE_VERSION:
+                raise ValueError(f"Unsupported random state version: {version}")
+            parts.append(_RNG_STATE.pack(*internal_state, gauss_next is not None,
+                                         gauss_next if gauss_next is not None else 0.0))
+        parts.append(_U8.pack(len(self.arrays)))
+        for name, array in self.arrays.items():
+            # Unlike np.ascontiguousarray, keeps 0-d arrays 0-d
+            array = np.require(array, requirements="C")
+            data = zlib.compress(array.tobytes(), 1)
+            parts += [_pack_str(name), _pack_str(array.dtype.str), _U8.pack(array.ndim)]
+            parts += [_U32.pack(dim) for dim in array.shape]
+            parts += [_U32.pack(len(data)), data]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Checkpoint':
+        magic, version, flags, gamma, alpha, epsilon, episodes_trained = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a strategy checkpoint")
+        if version != VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {version}")
+        offset = _HEADER.size
+        kind, offset = _unpack_str(data, offset)
+
+        rng_states = []
+        num_rng_states, = _U8.unpack_from(data, offset)
+        offset += _U8.size
+        for _ in range(num_rng_states):
+            *internal_state, has_gauss, gauss_next = _RNG_STATE.unpack_from(data, offset)
+            offset += _RNG_STATE.size
+            rng_states.append((_RNG_STATE_VERSION, tuple(internal_state), gauss_next if has_gauss else None))
+
+        arrays = {}
+        num_arrays, = _U8.unpack_from(data, offset)
+        offset += _U8.size
+        for _ in range(num_arrays):
+            name, offset = _unpack_str(data, offset)
+            dtype, offset = _unpack_str(data, offset)
+            ndim, = _U8.unpack_from(data, offset)
+            offset += _U8.size
+            shape = struct.unpack_from(f"<{ndim}I", data, offset)
+            offset += 4 * ndim
+            length, = _U32.unpack_from(data, offset)
+            offset += _U32.size
+            if offset + length > len(data):
+                raise ValueError("Truncated strategy checkpoint")
+            arrays[name] = np.frombuffer(zlib.decompress(data[offset:offset + length]), dtype=dtype).reshape(shape)
+            offset += length
+        return cls(kind=kind, gamma=gamma, alpha=alpha, epsilon=epsilon, softmax=bool(flags & _SOFTMAX_FLAG),
+                   episodes_trained=episodes_trained, rng_states=rng_states, arrays=arrays)
+
+    def write(self, path: Union[str, Path]):
+        # Written next to the target and renamed, so an interrupted run never leaves a broken checkpoint
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(self.to_bytes())
+        tmp_path.replace(path)
+
+    @classmethod
+    def read(cls, path: Union[str, Path]) -> 'Checkpoint':
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+def restored_rng(state: tuple) -> random.Random:
+    rng = random.Random()
+    rng.setstate(state)
+    return rng
+
+
+def _pack_str(value: str) -> bytes:
+    encoded = value.encode()
+    return _U8.pack(len(encoded)) + encoded
+
+
+def _unpack_str(data: bytes, offset: int) -> tuple[str, int]:
+    length = data[offset]
+    offset += 1
+    return data[offset:offset + length].decode(), offset + length
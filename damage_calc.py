@@ -0,0 +1,181 @@
+import math
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+from gameplay import ATTACK_SELF, Battle
+from models import MULTI_HIT_WEIGHTS, DamageClass, MoveInfo, Pokemon, Type
+
+# Battle.calc_dmg's random modifier is uniform over [0.85, 1.0)
+_MIN_ROLL, _MAX_ROLL = 0.85, 1.0
+
+
+@dataclass(frozen=True, eq=False)
+class DamageDistribution:
+    """
+    The HP a defender loses from one use of a move, exactly as Battle.use_move deals it: after the accuracy
+    check, crits and the random roll of every hit, the 1 damage minimum and LENGTH_MODIFIER.
+    """
+    # pmf[loss] is the probability of losing that much HP. Read-only.
+    pmf: np.ndarray
+    # Charging moves only hit every other turn, and recharging ones are followed by a turn without a move
+    charges: bool = False
+    recharges: bool = False
+    # Self-destructing moves can only be used once
+    self_destructs: bool = False
+    _ko_cache: dict[tuple[int, int], float] = field(default_factory=dict, init=False, repr=False)
+
+    @property
+    def expected(self) -> float:
+        return float(np.dot(np.arange(len(self.pmf)), self.pmf))
+
+    @property
+    def hit_chance(self) -> float:
+        """Chance of dealing any damage at all (every hit deals at least 1)."""
+        return float(1 - self.pmf[0])
+
+    def uses_within(self, turns: int) -> int:
+        if self.charges:
+            uses = turns // 2
+        elif self.recharges:
+            uses = (turns + 1) // 2
+        else:
+            uses = turns
+        return min(uses, 1) if self.self_destructs else uses
+
+    def ko_probability(self, hp: int, turns: int = 1) -> float:
+        """Probability that using the move every turn takes away at least hp within the given number of turns."""
+        if hp <= 0:
+            return 1.0
+        key = (hp, turns)
+        if key not in self._ko_cache:
+            self._ko_cache[key] = self._ko_probability(hp, self.uses_within(turns))
+        return self._ko_cache[key]
+
+    def _ko_probability(self, hp: int, uses: int) -> float:
+        # Distribution of the total HP lost, with everything at or past hp folded into the last bucket
+        capped = np.zeros(hp + 1)
+        capped[:min(len(self.pmf), hp)] = self.pmf[:hp]
+        capped[hp] = self.pmf[hp:].sum()
+        total = np.zeros(hp + 1)
+        total[0] = 1.0
+        for _ in range(uses):
+            knocked_out = total[hp]
+            total = np.convolve(total[:hp], capped)
+            total[hp] = total[hp:].sum() + knocked_out
+            total = total[:hp + 1]
+        return float(total[hp])
+
+
+def _roll_pmf(max_dmg: float) -> np.ndarray:
+    """Distribution of floor(max_dmg * roll) for a roll uniform over [0.85, 1.0)."""
+    if max_dmg <= 0:
+        return np.ones(1)
+    low, high = math.floor(max_dmg * _MIN_ROLL), math.floor(max_dmg * _MAX_ROLL)
+    if max_dmg * _MAX_ROLL == high:
+        # The roll never reaches 1.0, so the top value can't come up
+        high -= 1
+    pmf = np.zeros(high + 1)
+    for dmg in range(low, high + 1):
+        start = max(dmg / max_dmg, _MIN_ROLL)
+        end = min((dmg + 1) / max_dmg, _MAX_ROLL)
+        pmf[dmg] = max(end - start, 0) / (_MAX_ROLL - _MIN_ROLL)
+    return pmf / pmf.sum()
+
+
+def _base_dmg(level: int, power: int, ad_ratio: float, crit: bool) -> float:
+    # Same as Battle.calc_dmg, before the random modifier
+    effective_lvl = level * (2 if crit else 1)
+    return (((2 * effective_lvl / 5) + 2) * power * ad_ratio / 50) + 2
+
+
+def _loss_pmf(move: MoveInfo, level: int, ad_ratio: float, modifier: float, crit_chance: float,
+              hit_chance: float) -> np.ndarray:
+    hit_pmfs = []
+    for crit in (False, True):
+        raw = _roll_pmf(_base_dmg(level, move.power, ad_ratio, crit) * modifier)
+        if len(raw) < 2:
+            raw = np.pad(raw, (0, 2 - len(raw)))
+        # Every hit deals at least 1, even when the type makes it immune
+        raw[1] += raw[0]
+        raw[0] = 0
+        hit_pmfs.append(raw)
+    hit_pmf = np.zeros(max(len(pmf) for pmf in hit_pmfs))
+    hit_pmf[:len(hit_pmfs[0])] += (1 - crit_chance) * hit_pmfs[0]
+    hit_pmf[:len(hit_pmfs[1])] += crit_chance * hit_pmfs[1]
+
+    hit_info = move.hit_info
+    if hit_info.definite_hit_count is not None:
+        hit_counts = {hit_info.definite_hit_count: 1.0}
+    else:
+        hit_counts = dict(zip(range(hit_info.min_hits, hit_info.max_hits + 1), MULTI_HIT_WEIGHTS))
+        weight_sum = sum(hit_counts.values())
+        hit_counts = {num_hits: weight / weight_sum for num_hits, weight in hit_counts.items()}
+    total_pmf = np.zeros(1)
+    summed = np.ones(1)
+    for num_hits in range(1, max(hit_counts) + 1):
+        summed = np.convolve(summed, hit_pmf)
+        if num_hits in hit_counts:
+            if len(total_pmf) < len(summed):
+                total_pmf = np.pad(total_pmf, (0, len(summed) - len(total_pmf)))
+            total_pmf[:len(summed)] += hit_counts[num_hits] * summed
+
+    # The defender's health goes down by -total // LENGTH_MODIFIER, i.e. the total divided and rounded up
+    length_modifier = Battle.LENGTH_MODIFIER
+    loss_pmf = np.zeros(-(-(len(total_pmf) - 1) // length_modifier) + 1)
+    np.add.at(loss_pmf, -(-np.arange(len(total_pmf)) // length_modifier), total_pmf)
+    loss_pmf *= hit_chance
+    loss_pmf[0] += 1 - hit_chance
+    loss_pmf.setflags(write=False)
+    return loss_pmf
+
+
+def crit_chance(attacker: Pokemon, move: MoveInfo) -> float:
+    """Per-hit crit chance, as in Battle.is_crit."""
+    if move.name == ATTACK_SELF:
+        return 0.0
+    threshold = attacker.species.base_stats.speed / 2
+    if move.high_crit_ratio:
+        threshold *= 8
+    return math.floor(min(threshold, 255)) / 256
+
+
+def hit_chance(move: MoveInfo) -> float:
+    """Chance the accuracy check passes, as in Battle.is_hit (assuming the defender isn't invulnerable)."""
+    if move.accuracy is None:
+        return 1.0
+    return max(min(math.floor(move.accuracy * 255), 255), 1) / 256
+
+
+@lru_cache(maxsize=65536)
+def _distribution(move: MoveInfo, level: int, ad_ratio: float, modifier: float, crit: float,
+                  hit: float) -> DamageDistribution:
+    hit_info = move.hit_info
+    return DamageDistribution(_loss_pmf(move, level, ad_ratio, modifier, crit, hit), charges=hit_info.requires_charge,
+                              recharges=hit_info.has_recharge, self_destructs=hit_info.self_destructing)
+
+
+def damage_distribution(attacker: Pokemon, defender: Pokemon, move: MoveInfo) -> DamageDistribution:
+    """
+    Exact distribution of the HP defender loses when attacker uses move. Statuses and stat stages aren't taken
+    into account. Results are memoized by everything the damage depends on, so repeated matchups are lookups.
+    """
+    attacker_stats, defender_stats = attacker.stats, defender.stats
+    ad_ratio = attacker_stats.attack / defender_stats.defense if move.damage_class == DamageClass.PHYSICAL \
+        else attacker_stats.special / defender_stats.special
+    if move.name == ATTACK_SELF:
+        modifier = 1
+    else:
+        stab = 1.5 if move.type in attacker.species.types else 1
+        modifier = stab * Type.effectiveness(move.type, defender.species.types)
+    return _distribution(move, attacker.level, ad_ratio, modifier, crit_chance(attacker, move), hit_chance(move))
+
+
+def expected_damage(attacker: Pokemon, defender: Pokemon, move: MoveInfo) -> float:
+    return damage_distribution(attacker, defender, move).expected
+
+
+def ko_probability(attacker: Pokemon, defender: Pokemon, move: MoveInfo, turns: int = 1) -> float:
+    """Probability that using move every turn knocks out defender (from its current hp) within the given turns."""
+    return damage_distribution(attacker, defender, move).ko_probability(defender.hp, turns)
@@ -1,41 +1,160 @@
+import hashlib
 import logging
 import pickle
+from functools import cached_property
 from pathlib import Path
+from typing import Optional, Sequence
 
-import requests
-
-from models import PokemonSpecies, MoveInfo
-from scrapers import MoveScraper, PokemonScraper
+from dex_cache import DexCache
+from dex_index import DexIndex
+from models import DATA_DIR, PokemonSpecies, MoveInfo
+from scrapers import (
+    GEN1_URL, Fetcher, MoveScraper, PokemonScraper, RawSnapshot, RefreshStats, ResponseCache, scrape_dex
+)
 
 logger = logging.getLogger(__name__)
 
 
 class DataStore:
-    def __init__(self, moves_cache: str = "./data/all_moves.data", pokemon_cache: str = "./data/all_pokemon.data"):
-        gen1_data = None
-        if Path(moves_cache).exists():
-            with open(moves_cache, "rb") as f:
-                self.all_moves: list[MoveInfo] = pickle.load(f)
-                logger.info("Pulled move data from Cache")
-        else:
-            resp = requests.get("https://pokeapi.co/api/v2/generation/1")
-            gen1_data = resp.json()
-            move_scraper = MoveScraper()
-            self.all_moves = move_scraper.scrape(gen1_data)
+    def __init__(self, moves_cache: str = "./data/all_moves.data", pokemon_cache: str = "./data/all_pokemon.data",
+                 dex_cache: Optional[str] = "./data/dex.bin", http_cache: Optional[str] = "./data/http_cache",
+                 snapshot_dir: Optional[str] = "./data/snapshot", generation_url: str = GEN1_URL):
+        """
+        Loads the dex from the memory-mapped dex cache if there's an up-to-date one, otherwise from the pickles
+        (or by scraping), and then writes the dex cache. Pass dex_cache=None to only use the pickles.
+        Scraped responses are kept in http_cache (None disables it).
+
+        Scraping goes through the raw snapshot in snapshot_dir (None scrapes directly). While there is a snapshot,
+        the caches are re-derived from it, offline, whenever it or the scraping rules have changed since they were
+        written.
+        """
+        self.moves_cache = moves_cache
+        self.pokemon_cache = pokemon_cache
+        self.dex_cache = dex_cache
+        self.http_cache = http_cache
+        self.generation_url = generation_url
+        self.snapshot = RawSnapshot(snapshot_dir) if snapshot_dir is not None else None
+
+        if self.snapshot is not None and self.snapshot.exists and not self._derived_from_snapshot():
+            self._derive_from_snapshot()
+            return
+
+        if dex_cache is not None and self._dex_cache_current():
+            try:
+                dex = DexCache(dex_cache)
+            except ValueError as e:
+                logger.warning(f"Rebuilding dex cache: {e}")
+            else:
+                self.all_moves: Sequence[MoveInfo] = dex.all_moves
+                self.all_pokemon: Sequence[PokemonSpecies] = dex.all_pokemon
+                logger.info("Pulled dex from the dex cache")
+                return
+
+        have_moves, have_pokemon = Path(moves_cache).exists(), Path(pokemon_cache).exists()
+        if not have_moves and not have_pokemon and self.snapshot is not None:
+            self.refresh(check_existing=False)
+            return
+
+        # Only opened to scrape, so loading the pickles never touches the network or the HTTP cache
+        if not have_moves and not have_pokemon:
+            with self._new_fetcher() as fetcher:
+                self.all_moves, self.all_pokemon = scrape_dex(fetcher.get_json(generation_url), fetcher)
             with open(moves_cache, "wb") as f:
                 pickle.dump(self.all_moves, f)
-            logger.info("Refetched move data")
-
-        if Path(pokemon_cache).exists():
-            with open(pokemon_cache, "rb") as f:
-                self.all_pokemon: list[PokemonSpecies] = pickle.load(f)
-            logger.info("Pulled pokemon data from Cache")
-        else:
-            if gen1_data is None:
-                resp = requests.get("https://pokeapi.co/api/v2/generation/1")
-                gen1_data = resp.json()
-            poke_scraper = PokemonScraper(self.all_moves)
-            self.all_pokemon: list[PokemonSpecies] = poke_scraper.scrape(gen1_data)
             with open(pokemon_cache, "wb") as f:
                 pickle.dump(self.all_pokemon, f)
-            logger.info("Refetched pokemon data")
+            logger.info("Refetched move and pokemon data")
+        else:
+            if have_moves:
+                with open(moves_cache, "rb") as f:
+                    self.all_moves = pickle.load(f)
+                    logger.info("Pulled move data from Cache")
+            else:
+                with self._new_fetcher() as fetcher:
+                    move_scraper = MoveScraper(fetcher)
+                    self.all_moves = move_scraper.scrape(fetcher.get_json(generation_url))
+                with open(moves_cache, "wb") as f:
+                    pickle.dump(self.all_moves, f)
+                logger.info("Refetched move data")
+
+            if have_pokemon:
+                with open(pokemon_cache, "rb") as f:
+                    self.all_pokemon = pickle.load(f)
+                logger.info("Pulled pokemon data from Cache")
+            else:
+                with self._new_fetcher() as fetcher:
+                    poke_scraper = PokemonScraper(self.all_moves, fetcher)
+                    self.all_pokemon = poke_scraper.scrape(fetcher.get_json(generation_url))
+                with open(pokemon_cache, "wb") as f:
+                    pickle.dump(self.all_pokemon, f)
+                logger.info("Refetched pokemon data")
+
+        if dex_cache is not None:
+            DexCache.write(dex_cache, self.all_moves, self.all_pokemon)
+            logger.info("Wrote dex cache")
+
+    @cached_property
+    def index(self) -> DexIndex:
+        """Lookups over the dex, built on first use."""
+        return DexIndex(self.all_moves, self.all_pokemon)
+
+    def _dex_cache_current(self) -> bool:
+        """
+        Whether the dex cache exists and was written from the pickles as they are now. It's written after them,
+        so deleting or regenerating either pickle makes it stale.
+        """
+        paths = [Path(self.dex_cache), Path(self.moves_cache), Path(self.pokemon_cache)]
+        if not all(path.exists() for path in paths):
+            return False
+        dex_mtime, moves_mtime, pokemon_mtime = (path.stat().st_mtime_ns for path in paths)
+        # Strictly newer, since a pickle rewritten within the same timestamp tick would look current otherwise
+        return dex_mtime > max(moves_mtime, pokemon_mtime)
+
+    def _new_fetcher(self) -> Fetcher:
+        return Fetcher(cache=ResponseCache(self.http_cache) if self.http_cache is not None else None)
+
+    @property
+    def _derived_hash_path(self) -> Path:
+        return self.snapshot.directory / "derived.sha256"
+
+    def _source_hash(self, move_scraper: MoveScraper) -> str:
+        """Identifies everything the dex is derived from: the raw documents and the scraping rules."""
+        sources = (self.snapshot.content_hash(), move_scraper.config_hash(),
+                   hashlib.sha256((DATA_DIR / "poke_specials.json").read_bytes()).hexdigest())
+        return hashlib.sha256(" ".join(sources).encode()).hexdigest()
+
+    def _derived_from_snapshot(self) -> bool:
+        """Whether the caches exist and were derived from the snapshot as it is now, with the current rules."""
+        if not Path(self.moves_cache).exists() or not Path(self.pokemon_cache).exists():
+            return False
+        try:
+            return self._derived_hash_path.read_text() == self._source_hash(MoveScraper())
+        except FileNotFoundError:
+            return False
+
+    def _derive_from_snapshot(self):
+        move_scraper = MoveScraper()
+        self.all_moves, self.all_pokemon = self.snapshot.build_dex(move_scraper)
+        with open(self.moves_cache, "wb") as f:
+            pickle.dump(self.all_moves, f)
+        with open(self.pokemon_cache, "wb") as f:
+            pickle.dump(self.all_pokemon, f)
+        if self.dex_cache is not None:
+            DexCache.write(self.dex_cache, self.all_moves, self.all_pokemon)
+        # Built again from the new dex on next use
+        self.__dict__.pop("index", None)
+        self._derived_hash_path.write_text(self._source_hash(move_scraper))
+        logger.info("Derived move and pokemon data from the snapshot")
+
+    def refresh(self, check_existing: bool = True) -> RefreshStats:
+        """
+        Downloads documents that are missing from the snapshot and, if check_existing, the ones that have changed
+        upstream. The dex is re-derived if anything changed.
+        """
+        if self.snapshot is None:
+            raise ValueError("Can't refresh a DataStore without a snapshot directory")
+        with self._new_fetcher() as fetcher:
+            stats = self.snapshot.refresh(fetcher, self.generation_url, check_existing=check_existing)
+        if stats.changed or not self._derived_from_snapshot():
+            self._derive_from_snapshot()
+        return stats
@@ -0,0 +1,224 @@
+import hashlib
+import math
+import mmap
+import struct
+from pathlib import Path
+from typing import Callable, Optional, Sequence, TypeVar, Union
+
+import numpy as np
+
+from models import Ailment, DamageClass, HitInfo, MoveInfo, PokemonSpecies, PokemonStats, Sprite, Type
+
+T = TypeVar("T")
+
+# Layout (little-endian): header, then the move table, species table, learn set index and string heap,
+# each starting on an 8-byte boundary. Strings live in the heap and are referenced by (offset, length),
+# with a length of -1 meaning None. Enums are stored as their index in the enum, plus one when nullable.
+MAGIC = b"PDEX"
+VERSION = 1
+_HEADER = struct.Struct("<4sHxxQIIII")
+_NO_TYPE = 255
+
+_MOVE_DTYPE = np.dtype([
+    ("api_id", "<i4"), ("name_offset", "<u4"), ("name_len", "<i4"),
+    ("type", "u1"), ("damage_class", "u1"), ("ailment", "u1"), ("flags", "u1"),
+    ("power", "<i2"), ("total_pp", "<i2"), ("priority", "<i2"), ("min_hits", "u1"), ("max_hits", "u1"),
+    ("healing", "<f8"), ("drain", "<f8"), ("accuracy", "<f8"), ("ailment_chance", "<f8"),
+])
+_SPECIES_DTYPE = np.dtype([
+    ("api_id", "<i4"), ("name_offset", "<u4"), ("name_len", "<i4"),
+    ("front_offset", "<u4"), ("front_len", "<i4"), ("back_offset", "<u4"), ("back_len", "<i4"),
+    ("type1", "u1"), ("type2", "u1"), ("learn_count", "<u2"), ("learn_offset", "<u4"),
+    ("total_hp", "<i2"), ("attack", "<i2"), ("defense", "<i2"), ("special", "<i2"), ("speed", "<i2"),
+])
+_LEARN_DTYPE = np.dtype("<u2")
+
+# Move flags
+_HIGH_CRIT_RATIO = 1
+_INVULNERABLE_PHASE = 2
+_REQUIRES_CHARGE = 4
+_HAS_RECHARGE = 8
+_SELF_DESTRUCTING = 16
+
+_TYPES = list(Type)
+_DAMAGE_CLASSES = list(DamageClass)
+_AILMENTS = list(Ailment)
+
+
+def _schema_fingerprint() -> int:
+    """Changes whenever the table layout or any stored enum changes, which invalidates existing caches."""
+    schema = repr((VERSION, _MOVE_DTYPE.descr, _SPECIES_DTYPE.descr, _LEARN_DTYPE.str,
+                   [t.name for t in _TYPES], [c.name for c in _DAMAGE_CLASSES], [a.name for a in _AILMENTS]))
+    return int.from_bytes(hashlib.sha256(schema.encode()).digest()[:8], "little")
+
+
+SCHEMA_FINGERPRINT = _schema_fingerprint()
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _StringHeap:
+    def __init__(self):
+        self.data = bytearray()
+
+    def add(self, value: Optional[str]) -> tuple[int, int]:
+        if value is None:
+            return 0, -1
+        encoded = value.encode()
+        offset = len(self.data)
+        self.data += encoded
+        return offset, len(encoded)
+
+
+class LazyTable(Sequence[T]):
+    """Read-only sequence that builds each item the first time it's accessed and keeps it."""
+    def __init__(self, size: int, build: Callable[[int], T]):
+        self._items: list[Optional[T]] = [None] * size
+        self._build = build
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, ind: Union[int, slice]):
+        if isinstance(ind, slice):
+            return [self[i] for i in range(*ind.indices(len(self)))]
+        item = self._items[ind]
+        if item is None:
+            item = self._items[ind] = self._build(ind % len(self._items))
+        return item
+
+    def __getstate__(self):
+        # Built items are cheap to rebuild from the (shared) file, so don't ship them
+        return {"_items": [None] * len(self._items), "_build": self._build}
+
+    @property
+    def num_materialized(self) -> int:
+        return sum(item is not None for item in self._items)
+
+
+class DexCache:
+    """
+    Read-only view of a dex cache file. The tables are memory-mapped, so processes that open the same file
+    share one copy, and MoveInfo/PokemonSpecies objects are only built when they're accessed.
+    Pickling a DexCache (or one of its tables) only pickles the path.
+    """
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"Not a dex cache: {self.path}")
+        magic, version, fingerprint, num_moves, num_species, num_learn, heap_size = \
+            _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"Not a dex cache: {self.path}")
+        if version != VERSION or fingerprint != SCHEMA_FINGERPRINT:
+            raise ValueError(f"Dex cache {self.path} has an outdated format (version {version})")
+
+        offset = _aligned(_HEADER.size)
+        self._move_rows = np.frombuffer(self._mmap, _MOVE_DTYPE, num_moves, offset)
+        offset = _aligned(offset + self._move_rows.nbytes)
+        self._species_rows = np.frombuffer(self._mmap, _SPECIES_DTYPE, num_species, offset)
+        offset = _aligned(offset + self._species_rows.nbytes)
+        self._learn_index = np.frombuffer(self._mmap, _LEARN_DTYPE, num_learn, offset)
+        offset = _aligned(offset + self._learn_index.nbytes)
+        self._heap = memoryview(self._mmap)[offset:offset + heap_size]
+
+        self.all_moves: LazyTable[MoveInfo] = LazyTable(num_moves, self._build_move)
+        self.all_pokemon: LazyTable[PokemonSpecies] = LazyTable(num_species, self._build_species)
+
+    def __reduce__(self):
+        return self.__class__, (str(self.path),)
+
+    def _str(self, offset: int, length: int) -> Optional[str]:
+        if length < 0:
+            return None
+        return bytes(self._heap[offset:offset + length]).decode()
+
+    def _build_move(self, ind: int) -> MoveInfo:
+        row = self._move_rows[ind].item()
+        (api_id, name_offset, name_len, type_ind, damage_class_ind, ailment_ind, flags,
+         power, total_pp, priority, min_hits, max_hits, healing, drain, accuracy, ailment_chance) = row
+        hit_info = HitInfo(min_hits=min_hits, max_hits=max_hits,
+                           has_invulnerable_phase=bool(flags & _INVULNERABLE_PHASE),
+                           requires_charge=bool(flags & _REQUIRES_CHARGE),
+                           has_recharge=bool(flags & _HAS_RECHARGE),
+                           self_destructing=bool(flags & _SELF_DESTRUCTING))
+        return MoveInfo(api_id=api_id, name=self._str(name_offset, name_len), type=_TYPES[type_ind],
+                        power=power, total_pp=total_pp, damage_class=_DAMAGE_CLASSES[damage_class_ind],
+                        priority=priority, healing=healing, drain=drain,
+                        high_crit_ratio=bool(flags & _HIGH_CRIT_RATIO), hit_info=hit_info,
+                        accuracy=None if math.isnan(accuracy) else accuracy,
+                        ailment=_AILMENTS[ailment_ind - 1] if ailment_ind else None, ailment_chance=ailment_chance)
+
+    def _build_species(self, ind: int) -> PokemonSpecies:
+        (api_id, name_offset, name_len, front_offset, front_len, back_offset, back_len, type1, type2,
+         learn_count, learn_offset, total_hp, attack, defense, special, speed) = self._species_rows[ind].item()
+        types = [_TYPES[type1]] if type2 == _NO_TYPE else [_TYPES[type1], _TYPES[type2]]
+        learn_set = {self.all_moves[move_ind]
+                     for move_ind in self._learn_index[learn_offset:learn_offset + learn_count].tolist()}
+        return PokemonSpecies(
+            api_id=api_id,
+            name=self._str(name_offset, name_len),
+            sprite=Sprite(front=self._str(front_offset, front_len), back=self._str(back_offset, back_len)),
+            types=types,
+            base_stats=PokemonStats(total_hp=total_hp, attack=attack, defense=defense, special=special,
+                                    speed=speed),
+            learn_set=learn_set
+        )
+
+    @classmethod
+    def write(cls, path: Union[str, Path], all_moves: Sequence[MoveInfo], all_pokemon: Sequence[PokemonSpecies]):
+        heap = _StringHeap()
+        move_rows = np.zeros(len(all_moves), _MOVE_DTYPE)
+        move_inds: dict[MoveInfo, int] = {}
+        for ind, move in enumerate(all_moves):
+            move_inds.setdefault(move, ind)
+            hit_info = move.hit_info
+            flags = (
+                (_HIGH_CRIT_RATIO if move.high_crit_ratio else 0)
+                | (_INVULNERABLE_PHASE if hit_info.has_invulnerable_phase else 0)
+                | (_REQUIRES_CHARGE if hit_info.requires_charge else 0)
+                | (_HAS_RECHARGE if hit_info.has_recharge else 0)
+                | (_SELF_DESTRUCTING if hit_info.self_destructing else 0)
+            )
+            move_rows[ind] = (
+                move.api_id, *heap.add(move.name), move.type.index, _DAMAGE_CLASSES.index(move.damage_class),
+                _AILMENTS.index(move.ailment) + 1 if move.ailment is not None else 0, flags,
+                move.power, move.total_pp, move.priority, hit_info.min_hits, hit_info.max_hits,
+                move.healing, move.drain, move.accuracy if move.accuracy is not None else np.nan,
+                move.ailment_chance,
+            )
+
+        species_rows = np.zeros(len(all_pokemon), _SPECIES_DTYPE)
+        learn_index: list[int] = []
+        for ind, species in enumerate(all_pokemon):
+            try:
+                # Sorted so the file doesn't depend on set iteration order
+                learned = sorted(move_inds[move] for move in species.learn_set)
+            except KeyError as e:
+                raise ValueError(f"{species.name} can learn a move that isn't in the move table") from e
+            stats = species.base_stats
+            species_rows[ind] = (
+                species.api_id, *heap.add(species.name), *heap.add(species.sprite.front),
+                *heap.add(species.sprite.back), species.types[0].index,
+                species.types[1].index if len(species.types) > 1 else _NO_TYPE,
+                len(learned), len(learn_index),
+                stats.total_hp, stats.attack, stats.defense, stats.special, stats.speed,
+            )
+            learn_index.extend(learned)
+
+        sections = [move_rows.tobytes(), species_rows.tobytes(), np.array(learn_index, _LEARN_DTYPE).tobytes(),
+                    bytes(heap.data)]
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, SCHEMA_FINGERPRINT, len(move_rows), len(species_rows),
+                                     len(learn_index), len(heap.data)))
+        for section in sections:
+            out += bytes(_aligned(len(out)) - len(out))
+            out += section
+        # Write then rename, so readers never see a partial file
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_bytes(out)
+        tmp_path.replace(path)
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from typing import Optional, Sequence
+
+from models import DamageClass, MoveInfo, PokemonSpecies, Type
+
+
+class DexIndex:
+    """
+    Lookups over the dex, all built once up front. Queries by id or name are O(1), and the grouped ones
+    (species by type, moves by type or damage class, learners of a move) return a precomputed tuple.
+    Missing keys return None or an empty tuple.
+    """
+    def __init__(self, all_moves: Sequence[MoveInfo] = (), all_pokemon: Sequence[PokemonSpecies] = ()):
+        self.all_moves: tuple[MoveInfo, ...] = tuple(all_moves)
+        self.all_pokemon: tuple[PokemonSpecies, ...] = tuple(all_pokemon)
+
+        self._moves_by_id: dict[int, MoveInfo] = {}
+        self._moves_by_name: dict[str, MoveInfo] = {}
+        moves_by_type: dict[Type, list[MoveInfo]] = defaultdict(list)
+        moves_by_class: dict[tuple[Type, DamageClass], list[MoveInfo]] = defaultdict(list)
+        for move in self.all_moves:
+            # The first entry wins, just like a linear scan would find it
+            self._moves_by_id.setdefault(move.api_id, move)
+            self._moves_by_name.setdefault(move.name, move)
+            moves_by_type[move.type].append(move)
+            moves_by_class[move.type, move.damage_class].append(move)
+        self._moves_by_type = {move_type: tuple(moves) for move_type, moves in moves_by_type.items()}
+        self._moves_by_class = {key: tuple(moves) for key, moves in moves_by_class.items()}
+        self._moves_by_damage_class = {
+            damage_class: tuple(move for move in self.all_moves if move.damage_class is damage_class)
+            for damage_class in DamageClass
+        }
+
+        self._species_by_id: dict[int, PokemonSpecies] = {}
+        self._species_by_name: dict[str, PokemonSpecies] = {}
+        species_by_type: dict[Type, list[PokemonSpecies]] = defaultdict(list)
+        species_by_typing: dict[int, list[int]] = defaultdict(list)
+        learners: dict[int, list[PokemonSpecies]] = defaultdict(list)
+        for ind, species in enumerate(self.all_pokemon):
+            self._species_by_id.setdefault(species.api_id, species)
+            self._species_by_name.setdefault(species.name, species)
+            for species_type in species.types:
+                species_by_type[species_type].append(species)
+            species_by_typing[Type.combo_index(species.types)].append(ind)
+            for move in species.learn_set:
+                learners[move.api_id].append(species)
+        self._species_by_type = {species_type: tuple(species) for species_type, species in species_by_type.items()}
+        self._species_inds_by_typing = {combo_ind: tuple(inds) for combo_ind, inds in species_by_typing.items()}
+        self._learners = {
+            api_id: tuple(sorted(species_list, key=lambda species: species.api_id))
+            for api_id, species_list in learners.items()
+        }
+
+    def move_by_id(self, api_id: int) -> Optional[MoveInfo]:
+        return self._moves_by_id.get(api_id)
+
+    def move_by_name(self, name: str) -> Optional[MoveInfo]:
+        return self._moves_by_name.get(name)
+
+    def moves_of_type(self, move_type: Type, damage_class: Optional[DamageClass] = None) -> tuple[MoveInfo, ...]:
+        if damage_class is None:
+            return self._moves_by_type.get(move_type, ())
+        return self._moves_by_class.get((move_type, damage_class), ())
+
+    def moves_of_damage_class(self, damage_class: DamageClass) -> tuple[MoveInfo, ...]:
+        return self._moves_by_damage_class[damage_class]
+
+    def species_by_id(self, api_id: int) -> Optional[PokemonSpecies]:
+        return self._species_by_id.get(api_id)
+
+    def species_by_name(self, name: str) -> Optional[PokemonSpecies]:
+        return self._species_by_name.get(name)
+
+    def species_of_type(self, species_type: Type) -> tuple[PokemonSpecies, ...]:
+        """Species with the type as either of their types."""
+        return self._species_by_type.get(species_type, ())
+
+    def species_inds_by_typing(self) -> dict[int, tuple[int, ...]]:
+        """Indices into all_pokemon grouped by Type.combo_index of their typing."""
+        return self._species_inds_by_typing
+
+    def learners_of(self, move: MoveInfo) -> tuple[PokemonSpecies, ...]:
+        """Species that can learn the move, by api_id."""
+        return self._learners.get(move.api_id, ())
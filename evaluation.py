@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+import battle_workers
+import instrumentation
+from battle_strategies import BattleStrategy, FullyRandomStrategy
+from gameplay import Battle
+from generator import Matchup
+from models import PokemonSpecies, Trainer
+from rng_streams import spawn
+
+
+@dataclass(frozen=True)
+class EvaluationResult:
+    wins: dict[Matchup, int]
+    battles: dict[Matchup, int]
+
+    @property
+    def total_wins(self) -> int:
+        return sum(self.wins.values())
+
+    @property
+    def total_battles(self) -> int:
+        return sum(self.battles.values())
+
+    @property
+    def total_win_rate(self) -> float:
+        return self.total_wins / self.total_battles
+
+    def win_rate(self, matchup: Matchup) -> float:
+        return self.wins[matchup] / self.battles[matchup]
+
+
+@dataclass(frozen=True)
+class _Shard:
+    matchup: Matchup
+    num_battles: int
+    seed: int
+
+
+# Set once per worker process by _init_worker
+_worker_opponent_factory: Optional[Callable[[], BattleStrategy]] = None
+
+
+def _init_worker(strategy: BattleStrategy, opponent_factory: Callable[[], BattleStrategy],
+                 all_pokemon: Sequence[PokemonSpecies], instrumented: bool = False, in_process: bool = False):
+    global _worker_opponent_factory
+    _worker_opponent_factory = opponent_factory
+    battle_workers.init_worker([strategy], all_pokemon, instrumented, in_process)
+
+
+def _play_shard(shard: _Shard) -> tuple[int, Optional[dict]]:
+    """Returns the number of wins and, in instrumented workers, what was recorded while playing the shard."""
+    strategy, = battle_workers.strategies
+    generator = battle_workers.generator
+    rng = battle_workers.start_task(shard.seed, [strategy])
+    opponent = _worker_opponent_factory()
+    if hasattr(opponent, "rng"):
+        opponent.rng = spawn(rng)
+    num_wins = 0
+    for _ in range(shard.num_battles):
+        pokemon_a, pokemon_b = generator.generate(2, shard.matchup)
+        battle = Battle(Trainer("Trainer A", pokemon_a, strategy),
+                        Trainer("Trainer B", pokemon_b, opponent),
+                        training_mode=True, seed=rng.getrandbits(64))
+        num_wins += int(battle.run() == 0)
+        generator.release(pokemon_a, pokemon_b)
+    recording = battle_workers.recording
+    if recording is None:
+        return num_wins, None
+    snapshot = recording.snapshot()
+    recording.reset()
+    return num_wins, snapshot
+
+
+def _make_shards(num_battles: dict[Matchup, int], shard_size: int, seed: int) -> list[_Shard]:
+    shards = []
+    for matchup, matchup_battles in num_battles.items():
+        for start in range(0, matchup_battles, shard_size):
+            shards.append(_Shard(matchup, min(shard_size, matchup_battles - start), seed=0))
+    shard_seeds = np.random.SeedSequence(seed).generate_state(len(shards), dtype=np.uint64)
+    return [_Shard(shard.matchup, shard.num_battles, int(shard_seed)) for shard, shard_seed in zip(shards, shard_seeds)]
+
+
+def evaluate(strategy: BattleStrategy, all_pokemon: Sequence[PokemonSpecies], num_battles: dict[Matchup, int],
+             opponent_factory: Callable[[], BattleStrategy] = FullyRandomStrategy,
+             num_workers: Optional[int] = None, shard_size: int = 50, seed: int = 0) -> EvaluationResult:
+    """
+    Plays the strategy (as the first trainer) against fresh opponents across processes.
+    Each worker receives its own read-only copy of the strategy, so it must be picklable and done training.
+    Results only depend on the seed, not on num_workers or scheduling, unless the opponents draw from the
+    global random module. With num_workers=1, the shards are played in this process on a copy of the strategy,
+    and the global random module isn't reseeded. If instrumentation is enabled, what the workers record is
+    merged into it.
+    """
+    if getattr(strategy, "training", False):
+        raise ValueError("Can't evaluate a strategy while it's training")
+    shards = _make_shards(num_battles, shard_size, seed)
+    num_workers = num_workers or os.cpu_count() or 1
+
+    recording = instrumentation.active
+    if num_workers == 1:
+        # Battles record straight to the active instrumentation, if any
+        _init_worker(strategy, opponent_factory, all_pokemon, in_process=True)
+        shard_results = [_play_shard(shard) for shard in shards]
+    else:
+        init_args = (strategy, opponent_factory, all_pokemon, recording is not None)
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker, initargs=init_args) as executor:
+            # map preserves shard order, which keeps the merge deterministic
+            shard_results = list(executor.map(_play_shard, shards))
+
+    wins = {matchup: 0 for matchup in num_battles}
+    for shard, (num_wins, snapshot) in zip(shards, shard_results):
+        wins[shard.matchup] += num_wins
+        if snapshot is not None:
+            recording.merge(snapshot)
+    return EvaluationResult(wins=wins, battles=dict(num_battles))
@@ -0,0 +1,82 @@
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class TransitionBatch:
+    # (batch size, num features) features of the chosen moves
+    features: np.ndarray
+    rewards: np.ndarray
+    # (batch size, max moves, num features), zero past each next state's move count
+    next_features: np.ndarray
+    # Moves in each next state, 0 if it's terminal
+    num_next_moves: np.ndarray
+
+
+class ReplayBuffer:
+    """
+    The last capacity transitions (features of the chosen move, reward, feature matrix of the next state) in
+    preallocated arrays. Once full, every new transition overwrites the oldest one.
+    """
+    def __init__(self, capacity: int, num_features: int, max_moves: int = 4):
+        if capacity < 1:
+            raise ValueError(f"Invalid replay buffer capacity: {capacity}")
+        self.capacity = capacity
+        self.max_moves = max_moves
+        self.features = np.zeros((capacity, num_features))
+        self.rewards = np.zeros(capacity)
+        self.next_features = np.zeros((capacity, max_moves, num_features))
+        self.num_next_moves = np.zeros(capacity, dtype=np.int8)
+        # Where the next transition goes
+        self.position = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, features: np.ndarray, reward: float, next_features: Optional[np.ndarray]):
+        """next_features is None when the next state is terminal."""
+        num_next_moves = 0 if next_features is None else len(next_features)
+        if num_next_moves > self.max_moves:
+            raise ValueError(f"Next state has {num_next_moves} moves, the buffer holds up to {self.max_moves}")
+        ind = self.position
+        self.features[ind] = features
+        self.rewards[ind] = reward
+        self.num_next_moves[ind] = num_next_moves
+        if num_next_moves:
+            self.next_features[ind, :num_next_moves] = next_features
+        # Rows past the move count are never read, but zeroing them keeps saved buffers deterministic
+        self.next_features[ind, num_next_moves:] = 0
+        self.position = (ind + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size: int, rng: random.Random) -> TransitionBatch:
+        """Uniformly, with replacement."""
+        if self.size == 0:
+            raise ValueError("Can't sample from an empty replay buffer")
+        inds = np.array(rng.choices(range(self.size), k=batch_size))
+        return TransitionBatch(features=self.features[inds], rewards=self.rewards[inds],
+                               next_features=self.next_features[inds], num_next_moves=self.num_next_moves[inds])
+
+    @classmethod
+    def from_arrays(cls, features: np.ndarray, rewards: np.ndarray, next_features: np.ndarray,
+                    num_next_moves: np.ndarray, position: np.ndarray, size: np.ndarray) -> 'ReplayBuffer':
+        capacity, max_moves, num_features = next_features.shape
+        buffer = cls(capacity, num_features, max_moves)
+        if features.shape != buffer.features.shape or len(rewards) != capacity or len(num_next_moves) != capacity:
+            raise ValueError("Replay buffer arrays have inconsistent shapes")
+        buffer.features[:] = features
+        buffer.rewards[:] = rewards
+        buffer.next_features[:] = next_features
+        buffer.num_next_moves[:] = num_next_moves
+        buffer.position, buffer.size = int(position), int(size)
+        return buffer
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """The arrays from_arrays takes, by argument name."""
+        return {"features": self.features, "rewards": self.rewards, "next_features": self.next_features,
+                "num_next_moves": self.num_next_moves, "position": np.array(self.position),
+                "size": np.array(self.size)}
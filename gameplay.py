@@ -1,36 +1,64 @@
 import logging
 import math
 import random
+import time
 from typing import Optional
 
+import instrumentation
+from battle_events import BattleEvent, EventKind, EventSink, NullSink, PrintSink
+from instrumentation import Instrumentation
 from models import (
-    Pokemon, Move, DamageClass, Type, MoveInfo, PokemonSpecies, Trainer, PokemonStatus, Ailment
+    Pokemon, Move, DamageClass, Type, MoveInfo, PokemonSpecies, Trainer, PokemonStatus, Ailment, PokemonSnapshot
 )
+from rng_streams import BufferedRandom
 
 ATTACK_SELF = "attack_self"
 
 
 class Battle:
     LENGTH_MODIFIER = 2  # Effectively: Damage is divided by this with the intention of lengthening battles
-
-    def __init__(self, *trainers: Trainer, training_mode: bool = False):
+    # Statuses that change a Pokemon's effective stats in Gen 1 (burn halves attack, paralysis cuts speed).
+    # Applying one invalidates the damage table.
+    STAT_STATUSES = frozenset({PokemonStatus.BURNED, PokemonStatus.PARALYZED})
+
+    def __init__(self, *trainers: Trainer, training_mode: bool = False, sink: Optional[EventSink] = None,
+                 seed: Optional[int] = None, buffered: bool = False):
+        # Every random draw in the battle comes from this stream, so the seed plus the recorded
+        # decisions are enough to replay it (see replay.py)
+        self.seed: int = seed if seed is not None else random.getrandbits(64)
+        self.buffered = buffered
+        self.rng: random.Random = BufferedRandom(self.seed) if buffered else random.Random(self.seed)
+        # (trainer index, move set slot) for every move a strategy picked, in order
+        self.decisions: list[tuple[int, int]] = []
         self.turn_count: int = 0
         self.trainers: tuple[Trainer, ...] = trainers
         self.move_queue: list[Optional[Move]] = [None, None]
         self.training_mode = training_mode
+        # Battle text is printed unless training. Every event is guarded by a sink check, so events
+        # aren't even constructed without one.
+        if sink is None and not training_mode:
+            sink = PrintSink()
+        self.sink: Optional[EventSink] = None if isinstance(sink, NullSink) else sink
+        # (attacker index, defender index, move, crit) -> (base damage, STAB * type modifier).
+        # Only the random modifier changes between hits, so everything else is computed once per battle.
+        self._dmg_table: dict[tuple[int, int, MoveInfo, bool], tuple[float, float]] = {}
+        # Whatever was recording when the battle was created (see instrumentation.py)
+        self.instrumentation: Optional[Instrumentation] = instrumentation.active
 
     @property
     def finished(self) -> bool:
         return any(trainer.cannot_continue for trainer in self.trainers)
 
-    def print_battle_text(self, *msgs: str):
-        if not self.training_mode:
-            print(*msgs)
+    def snapshots(self) -> tuple[PokemonSnapshot, ...]:
+        if self.instrumentation is None:
+            return tuple(trainer.pokemon.snapshot() for trainer in self.trainers)
+        with self.instrumentation.timed("snapshots"):
+            return tuple(trainer.pokemon.snapshot() for trainer in self.trainers)
 
     def _calc_move_order_sort(self, chosen_move: tuple[int, Move]) -> tuple[int, int, int]:
         trainer_ind, move = chosen_move
         poke_speed = self.trainers[trainer_ind].pokemon.stats.speed
-        return move.info.priority, poke_speed, random.randint(0, 1000)  # random move order if all other things equal
+        return move.info.priority, poke_speed, self.rng.randint(0, 1000)  # random move order if all other things equal
 
     def is_crit(self, attacking_pokemon: PokemonSpecies, move_used: MoveInfo) -> bool:
         if move_used.name == ATTACK_SELF:
@@ -41,7 +69,7 @@ class Battle:
             threshold *= 8
         threshold = min(threshold, 255)
         threshold = math.floor(threshold)
-        rand_val = random.randint(0, 255)
+        rand_val = self.rng.randint(0, 255)
         return rand_val < threshold
 
     def is_hit(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon, move_used: MoveInfo):
@@ -55,36 +83,63 @@ class Battle:
         accuracy_val = math.floor(move_used.accuracy * 255)
         threshold = max(min(accuracy_val, 255), 1)
         # Yes this does actually implement the possible miss for a 100% accuracy move bug in Gen 1
-        rand_val = random.randint(0, 255)
+        rand_val = self.rng.randint(0, 255)
         return rand_val < threshold
 
     def _calc_modifier(self, attacking_pokemon: PokemonSpecies, defending_pokemon: PokemonSpecies,
                        move_used: MoveInfo) -> float:
-        rand_modifier = random.uniform(0.85, 1.0)
+        """STAB * type modifier. Both are powers of two or 1.5, so multiplying by them in one go is exact."""
         if move_used.name == ATTACK_SELF:
-            return rand_modifier
+            return 1
 
         stab = 1.5 if move_used.type in attacking_pokemon.types else 1
-        type_modifier = Type.dmg_modifier(move_used.type, defending_pokemon.types[0])
-        if len(defending_pokemon.types) > 1:
-            type_modifier *= Type.dmg_modifier(move_used.type, defending_pokemon.types[1])
-        return rand_modifier * stab * type_modifier
+        type_modifier = Type.effectiveness(move_used.type, defending_pokemon.types)
+        return stab * type_modifier
 
-    def calc_dmg(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon, move_used: MoveInfo, hit_num=0) -> int:
+    def _calc_base_dmg(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon, move_used: MoveInfo,
+                       crit: bool) -> float:
         # For ease of use, these calculations don't floor until the end
-        effective_lvl = attacking_pokemon.level * (2 if self.is_crit(attacking_pokemon.species, move_used) and hit_num == 0 else 1)
+        effective_lvl = attacking_pokemon.level * (2 if crit else 1)
         ad_ratio = attacking_pokemon.stats.attack / defending_pokemon.stats.defense \
             if move_used.damage_class == DamageClass.PHYSICAL \
             else attacking_pokemon.stats.special / defending_pokemon.stats.special
-        modifier = self._calc_modifier(attacking_pokemon.species, defending_pokemon.species, move_used)
-        return math.floor(((((2 * effective_lvl / 5) + 2) * move_used.power * ad_ratio / 50) + 2) * modifier)
+        return (((2 * effective_lvl / 5) + 2) * move_used.power * ad_ratio / 50) + 2
+
+    def _side(self, pokemon: Pokemon) -> Optional[int]:
+        for trainer_ind, trainer in enumerate(self.trainers):
+            if trainer.pokemon is pokemon:
+                return trainer_ind
+        return None
+
+    def _dmg_entry(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon, move_used: MoveInfo,
+                   crit: bool) -> tuple[float, float]:
+        attacker_ind, defender_ind = self._side(attacking_pokemon), self._side(defending_pokemon)
+        if attacker_ind is None or defender_ind is None:
+            # Not this battle's Pokemon, so there's nothing to key the table on
+            return (self._calc_base_dmg(attacking_pokemon, defending_pokemon, move_used, crit),
+                    self._calc_modifier(attacking_pokemon.species, defending_pokemon.species, move_used))
+        key = (attacker_ind, defender_ind, move_used, crit)
+        entry = self._dmg_table.get(key)
+        if entry is None:
+            entry = (self._calc_base_dmg(attacking_pokemon, defending_pokemon, move_used, crit),
+                     self._calc_modifier(attacking_pokemon.species, defending_pokemon.species, move_used))
+            self._dmg_table[key] = entry
+        return entry
+
+    def calc_dmg(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon, move_used: MoveInfo, hit_num=0) -> int:
+        crit = self.is_crit(attacking_pokemon.species, move_used) and hit_num == 0
+        if crit and self.instrumentation is not None:
+            self.instrumentation.count("crits")
+        if crit and self.sink is not None:
+            self.sink.emit(BattleEvent(EventKind.CRIT, self, attacking_pokemon))
+        base_dmg, modifier = self._dmg_entry(attacking_pokemon, defending_pokemon, move_used, crit)
+        return math.floor(base_dmg * (self.rng.uniform(0.85, 1.0) * modifier))
 
     def apply_move_rules(self, attacking_pokemon: Pokemon, move_used: Move, trainer_ind: int) -> bool:
         if move_used.info.hit_info.has_invulnerable_phase:
             if not attacking_pokemon.has_status(PokemonStatus.INVULNERABLE):
-                self.print_battle_text(
-                    f"{attacking_pokemon.nickname} gains invulnerability for the turn"
-                )
+                if self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.INVULNERABLE, self, attacking_pokemon))
                 attacking_pokemon.statuses.add(PokemonStatus.INVULNERABLE)
             else:
                 # Remove the status here since we can assume that each move that makes
@@ -93,11 +148,12 @@ class Battle:
 
         if move_used.info.hit_info.requires_charge:
             if not attacking_pokemon.has_status(PokemonStatus.CHARGING):
-                self.print_battle_text(
-                    f"{attacking_pokemon.nickname} charges up {move_used.display_name}"
-                )
+                if self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.CHARGING, self, attacking_pokemon, move=move_used))
                 attacking_pokemon.statuses.add(PokemonStatus.CHARGING)
                 self.move_queue[trainer_ind] = move_used
+                if self.instrumentation is not None:
+                    self.instrumentation.count("charging_turns")
                 return True
             else:
                 # Reset whether the move is charged
@@ -109,104 +165,116 @@ class Battle:
 
         if move_used.info.hit_info.self_destructing:
             # Self Destruction occurs on hit or miss
-            self.print_battle_text(f"{attacking_pokemon.nickname} self-destructed")
+            if self.sink is not None:
+                self.sink.emit(BattleEvent(EventKind.SELF_DESTRUCT, self, attacking_pokemon))
             attacking_pokemon.hp = 0
 
         return False
 
     def apply_ailment(self, move_used: Move, defending_pokemon: Pokemon):
+        applied_status = self._apply_ailment(move_used, defending_pokemon)
+        if applied_status in self.STAT_STATUSES:
+            self._dmg_table.clear()
+        if applied_status is not None and self.instrumentation is not None:
+            self.instrumentation.count("status_applications")
+            self.instrumentation.count(f"status_applications.{applied_status.name.lower()}")
+        if applied_status is not None and self.sink is not None:
+            self.sink.emit(BattleEvent(EventKind.AILMENT_APPLIED, self, defending_pokemon, move=move_used,
+                                       status=applied_status))
+
+    def _apply_ailment(self, move_used: Move, defending_pokemon: Pokemon) -> Optional[PokemonStatus]:
+        """Returns the status that was applied, if any."""
         ailment = move_used.info.ailment
         if (
             any(status.non_volatile for status in defending_pokemon.statuses)
             and ailment.non_volatile
         ):
             # A Pokémon cannot gain a non-volatile status if it's already afflicted by another one.
-            return
+            return None
 
         if ailment == Ailment.UNKNOWN:
             # Tri Attack was used
             # We don't support freeze, so return if it (i.e. unknown) is selected randomly
-            ailment = random.choice([Ailment.UNKNOWN, Ailment.BURN, Ailment.PARALYSIS])
+            ailment = self.rng.choice([Ailment.UNKNOWN, Ailment.BURN, Ailment.PARALYSIS])
             if ailment == Ailment.UNKNOWN:
-                return
+                return None
         # Fire-type Pokemon cannot be burned by a Fire-type move
         if ailment == Ailment.BURN and (
             Type.FIRE not in defending_pokemon.species.types or move_used.info.type != Type.FIRE
         ):
-            self.print_battle_text(f"{defending_pokemon.nickname} is burned by the attack!")
             defending_pokemon.statuses.add(PokemonStatus.BURNED)
             # TODO: Halve its Attack
+            return PokemonStatus.BURNED
         # Ground-type Pokemon cannot be paralyzed by an Electric-type move
         elif ailment == Ailment.PARALYSIS and (
             Type.GROUND not in defending_pokemon.species.types
             or move_used.info.type != Type.ELECTRIC
         ):
-            self.print_battle_text(f"{defending_pokemon.nickname} is paralyzed by the attack!")
             defending_pokemon.statuses.add(PokemonStatus.PARALYZED)
             # TODO: Decrease Speed by 75%
+            return PokemonStatus.PARALYZED
         # Poison-type Pokemon cannot be poisoned
         elif ailment == Ailment.POISON and Type.POISON not in defending_pokemon.species.types:
             if move_used.info.api_id == 92:
                 # The "Toxic" move was used
-                self.print_battle_text(
-                    f"{defending_pokemon.nickname} is badly poisoned by the attack!"
-                )
                 defending_pokemon.statuses.add(PokemonStatus.BADLY_POISONED)
-            else:
-                self.print_battle_text(f"{defending_pokemon.nickname} is poisoned by the attack!")
-                defending_pokemon.statuses.add(PokemonStatus.POISONED)
+                return PokemonStatus.BADLY_POISONED
+            defending_pokemon.statuses.add(PokemonStatus.POISONED)
+            return PokemonStatus.POISONED
         elif ailment == Ailment.CONFUSION:
-            self.print_battle_text(f"{defending_pokemon.nickname} is confused by the attack!")
             defending_pokemon.statuses.add(PokemonStatus.CONFUSED)
-            defending_pokemon.confusion_turns = random.randint(1, 5)
+            defending_pokemon.confusion_turns = self.rng.randint(1, 5)
+            return PokemonStatus.CONFUSED
         # Pokemon can only be bound by one binding move at a time
         elif ailment == Ailment.TRAP and PokemonStatus.BOUND not in defending_pokemon.statuses:
-            self.print_battle_text(f"{defending_pokemon.nickname} is trapped by the attack!")
             defending_pokemon.statuses.add(PokemonStatus.BOUND)
-            defending_pokemon.bound_turns = random.choices(
+            defending_pokemon.bound_turns = self.rng.choices(
                 [2, 3, 4, 5], [0.375, 0.375, 0.125, 0.125]
             )[0]
+            return PokemonStatus.BOUND
+        return None
 
     def use_move(self, attacking_pokemon: Pokemon, defending_pokemon: Pokemon,
                  move_to_use: Move, trainer_ind: int):
         # Decrements pp or end up struggling
         move_used = move_to_use.use()
+        if move_used is not move_to_use and self.instrumentation is not None:
+            self.instrumentation.count("struggles")
 
         skip_move = self.apply_move_rules(attacking_pokemon, move_used, trainer_ind)
         if skip_move:
             move_used.pp += 1  # Don't decrement pp if skipped due to charging
             return
 
-        if attacking_pokemon.has_status(PokemonStatus.PARALYZED) and random.random() < 0.25:
-            self.print_battle_text(
-                f"{attacking_pokemon.nickname} is fully paralyzed! It can't move!"
-            )
+        if attacking_pokemon.has_status(PokemonStatus.PARALYZED) and self.rng.random() < 0.25:
+            if self.sink is not None:
+                self.sink.emit(BattleEvent(EventKind.FULLY_PARALYZED, self, attacking_pokemon))
             # Clean up move states if the move was skipped due to paralysis
             skip_move = True
 
         if attacking_pokemon.has_status(PokemonStatus.BOUND):
             if attacking_pokemon.bound_turns == 0:
-                self.print_battle_text(
-                    f"{attacking_pokemon.nickname} broke free! It is no longer trapped!"
-                )
+                if self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.BROKE_FREE, self, attacking_pokemon))
                 attacking_pokemon.statuses.remove(PokemonStatus.BOUND)
             else:
-                self.print_battle_text(f"{attacking_pokemon.nickname} is trapped! It can't move!")
+                if self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.TRAPPED, self, attacking_pokemon))
                 status_dmg, status_msg = attacking_pokemon.get_status_damage()
                 attacking_pokemon.apply_health_effect(-status_dmg // self.LENGTH_MODIFIER)
-                if status_msg:
-                    self.print_battle_text(f"{attacking_pokemon.nickname} {status_msg}")
+                if status_msg and self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.STATUS_DAMAGE, self, attacking_pokemon,
+                                               amount=status_dmg // self.LENGTH_MODIFIER, message=status_msg))
                 attacking_pokemon.bound_turns -= 1
                 skip_move = True
 
         if attacking_pokemon.has_status(PokemonStatus.CONFUSED):
             attacking_pokemon.confusion_turns -= 1
             if attacking_pokemon.confusion_turns == 0:
-                self.print_battle_text(
-                    f"{attacking_pokemon.nickname} snapped out of its confusion!"
-                )
+                if self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.CONFUSION_ENDED, self, attacking_pokemon))
                 attacking_pokemon.statuses.remove(PokemonStatus.CONFUSED)
-            elif random.random() < 0.5:
+            elif self.rng.random() < 0.5:
                 # The Pokemon will attack itself
                 # These variables are changed so the damage can still be calculated the same way
                 move_used = Move.attack_self()
@@ -216,14 +284,15 @@ class Battle:
             return
 
         if not self.is_hit(attacking_pokemon, defending_pokemon, move_to_use.info):
-            self.print_battle_text(
-                f"{attacking_pokemon.nickname}'s move ({move_used.display_name}) missed!"
-            )
+            if self.instrumentation is not None:
+                self.instrumentation.count("misses")
+            if self.sink is not None:
+                self.sink.emit(BattleEvent(EventKind.MISS, self, attacking_pokemon, move=move_used))
             return
 
         # Calculate damage of each hit (Gen 1: only 1st can crit and none are accuracy-dependent)
         hit_damages = []
-        for ind in range(move_to_use.info.hit_info.num_hits()):
+        for ind in range(move_to_use.info.hit_info.num_hits(self.rng)):
             raw_dmg = self.calc_dmg(attacking_pokemon, defending_pokemon, move_used.info)
             dmg_dealt = max(1, raw_dmg)
             hit_damages.append(dmg_dealt)
@@ -236,27 +305,12 @@ class Battle:
             total_dmg_dealt > defending_pokemon.hp
         )
         attacker_health_delta -= status_dmg
-        if status_msg:
-            self.print_battle_text(f"{attacking_pokemon.nickname} {status_msg}")
-
-        if move_used.info.name == ATTACK_SELF:
-            self.print_battle_text(
-                f"{attacking_pokemon.nickname} is confused! It hurt itself in its confusion!"
-            )
-
-        self.print_battle_text(
-            f"{attacking_pokemon.nickname} dealt {total_dmg_dealt // self.LENGTH_MODIFIER} damage"
-            f"{' in total' if len(hit_damages) > 1 else ''}."
-        )
-        if attacker_health_delta > 0:
-            self.print_battle_text(
-                f"{attacking_pokemon.nickname} healed itself for {attacker_health_delta // self.LENGTH_MODIFIER}"
-            )
-        elif attacker_health_delta < 0 and recoil:
-            self.print_battle_text(f"{attacking_pokemon.nickname} was hit with {attacker_health_delta // self.LENGTH_MODIFIER} recoil damage")
+        if self.sink is not None:
+            self._emit_move_results(attacking_pokemon, move_used, hit_damages, status_dmg, status_msg,
+                                    attacker_health_delta, recoil)
 
         if move_used.info.ailment:
-            if random.random() < move_used.info.ailment_chance:
+            if self.rng.random() < move_used.info.ailment_chance:
                 self.apply_ailment(move_used, defending_pokemon)
 
         defender_health_delta = -total_dmg_dealt
@@ -264,6 +318,27 @@ class Battle:
         attacking_pokemon.apply_health_effect(attacker_health_delta // self.LENGTH_MODIFIER)
         defending_pokemon.apply_health_effect(defender_health_delta // self.LENGTH_MODIFIER)
 
+    def _emit_move_results(self, attacking_pokemon: Pokemon, move_used: Move, hit_damages: list[int],
+                           status_dmg: int, status_msg: str, attacker_health_delta: int, recoil: bool):
+        if status_msg:
+            self.sink.emit(BattleEvent(EventKind.STATUS_DAMAGE, self, attacking_pokemon,
+                                       amount=status_dmg // self.LENGTH_MODIFIER, message=status_msg))
+        if move_used.info.name == ATTACK_SELF:
+            self.sink.emit(BattleEvent(EventKind.HURT_ITSELF, self, attacking_pokemon))
+        self.sink.emit(BattleEvent(EventKind.DAMAGE, self, attacking_pokemon, move=move_used,
+                                   amount=sum(hit_damages) // self.LENGTH_MODIFIER, hits=len(hit_damages)))
+        if attacker_health_delta > 0:
+            self.sink.emit(BattleEvent(EventKind.HEAL, self, attacking_pokemon,
+                                       amount=attacker_health_delta // self.LENGTH_MODIFIER))
+        elif attacker_health_delta < 0 and recoil:
+            self.sink.emit(BattleEvent(EventKind.RECOIL, self, attacking_pokemon,
+                                       amount=attacker_health_delta // self.LENGTH_MODIFIER))
+
+    def awaiting_decision(self, trainer_ind: int) -> bool:
+        """Whether the trainer's strategy picks its move next turn, instead of it charging or recharging."""
+        pokemon = self.trainers[trainer_ind].pokemon
+        return not (pokemon.has_status(PokemonStatus.CHARGING) or pokemon.has_status(PokemonStatus.RECHARGING))
+
     def choose_moves(self) -> list[tuple[int, Move]]:
         chosen_moves = []
 
@@ -275,47 +350,84 @@ class Battle:
                 self.move_queue[trainer_ind] = None
             elif trainer.pokemon.has_status(PokemonStatus.RECHARGING):
                 chosen_move = None
-                self.print_battle_text(f"{trainer.name}'s {trainer.pokemon.nickname} must recharge")
+                if self.sink is not None:
+                    self.sink.emit(BattleEvent(EventKind.MUST_RECHARGE, self, trainer.pokemon, trainer))
                 trainer.pokemon.statuses.remove(PokemonStatus.RECHARGING)
+                if self.instrumentation is not None:
+                    self.instrumentation.count("recharging_turns")
             else:
                 chosen_move = trainer.pick_move(
                     self.trainers[(trainer_ind + 1) % len(self.trainers)].pokemon
                 )
+                slot = next((slot for slot, move in enumerate(trainer.pokemon.move_set) if move is chosen_move), None)
+                if slot is None:
+                    move_name = getattr(chosen_move, "display_name", repr(chosen_move))
+                    raise ValueError(f"{type(trainer.battle_strategy).__name__} of {trainer.name} picked {move_name}, "
+                                     f"which isn't in {trainer.pokemon.nickname}'s move set")
+                self.decisions.append((trainer_ind, slot))
             if chosen_move is not None:
                 chosen_moves.append((trainer_ind, chosen_move))
         return chosen_moves
 
     def play_turn(self):
         if self.turn_count > 100:
-            logging.error("THIS GAME IS GOING ON FOR WAY TOO LONG")
+            logging.error("THIS GAME IS GOING ON FOR WAY TOO LONG (seed %d)", self.seed)
         self.turn_count += 1
-        chosen_moves = self.choose_moves()
+        stats = self.instrumentation
+        if stats is None:
+            chosen_moves = self.choose_moves()
+        else:
+            stats.count("turns")
+            start = time.perf_counter()
+            chosen_moves = self.choose_moves()
+            stats.add_time("choose_moves", time.perf_counter() - start)
         for trainer_ind, move_to_use in sorted(chosen_moves, key=self._calc_move_order_sort, reverse=True):
             attacking_trainer = self.trainers[trainer_ind]
             defending_trainer = self.trainers[(trainer_ind + 1) % len(self.trainers)]
             if self.finished:
                 # If a pokemon faints in the middle of a turn, end the match
                 break
-            self.print_battle_text(f"{attacking_trainer.name}'s {attacking_trainer.pokemon.nickname} tried to use: {move_to_use.display_name}")
-            self.use_move(attacking_trainer.pokemon, defending_trainer.pokemon, move_to_use, trainer_ind)
+            if self.sink is not None:
+                self.sink.emit(BattleEvent(EventKind.MOVE_USED, self, attacking_trainer.pokemon, attacking_trainer,
+                                           move=move_to_use))
+            if stats is None:
+                self.use_move(attacking_trainer.pokemon, defending_trainer.pokemon, move_to_use, trainer_ind)
+            else:
+                start = time.perf_counter()
+                self.use_move(attacking_trainer.pokemon, defending_trainer.pokemon, move_to_use, trainer_ind)
+                stats.add_time("use_move", time.perf_counter() - start)
+            if self.sink is not None and self.finished:
+                for trainer in self.trainers:
+                    if trainer.cannot_continue:
+                        self.sink.emit(BattleEvent(EventKind.FAINT, self, trainer.pokemon, trainer))
 
     def run(self) -> int:
+        self.begin()
+        while not self.finished:
+            self.step()
+        return self.end()
+
+    def begin(self):
+        """run is begin, step until finished, then end. Callers that interleave battles call them directly."""
         self.turn_count = 0
+        if self.sink is not None:
+            self.sink.emit(BattleEvent(EventKind.BATTLE_START, self))
+
+    def step(self):
+        if self.sink is not None:
+            self.sink.emit(BattleEvent(EventKind.TURN_START, self))
+        self.play_turn()
+
+    def end(self) -> int:
+        """Returns the index of the winning trainer."""
         trainer_a, trainer_b = self.trainers
-        self.print_battle_text(
-            f"{trainer_a.name} with {trainer_a.pokemon.nickname} ({trainer_a.pokemon.species.display_name})", "VS",
-            f"{trainer_b.name} with {trainer_b.pokemon.nickname} ({trainer_b.pokemon.species.display_name})")
-        while not self.finished:
-            self.print_battle_text(f"----- Turn {self.turn_count} -----")
-            self.print_battle_text(
-                f"{trainer_a.pokemon.nickname}: {trainer_a.pokemon.hp}/{trainer_a.pokemon.stats.total_hp}")
-            self.print_battle_text(
-                f"{trainer_b.pokemon.nickname}: {trainer_b.pokemon.hp}/{trainer_b.pokemon.stats.total_hp}\n")
-            self.play_turn()
-        self.print_battle_text(f"\n----- Battle Finished in {self.turn_count} turns. -----")
+        if self.sink is not None:
+            self.sink.emit(BattleEvent(EventKind.BATTLE_END, self))
         if trainer_a.cannot_continue:
-            self.print_battle_text(f"{trainer_b.name} Wins!")
+            if self.sink is not None:
+                self.sink.emit(BattleEvent(EventKind.WINNER, self, trainer_b.pokemon, trainer_b))
             return 1
         elif trainer_b.cannot_continue:
-            self.print_battle_text(f"{trainer_a.name} Wins!")
+            if self.sink is not None:
+                self.sink.emit(BattleEvent(EventKind.WINNER, self, trainer_a.pokemon, trainer_a))
             return 0
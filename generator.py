@@ -1,10 +1,13 @@
 import dataclasses
-import itertools
 import math
 import random
+from dataclasses import dataclass
 from enum import Enum
+from typing import Callable, Optional, Sequence
 
-from models import PokemonStats, PokemonSpecies, Pokemon, Move, Type
+from dex_index import DexIndex
+from models import MoveInfo, PokemonStats, PokemonSpecies, Pokemon, Move, Type
+from rng_streams import new_stream
 
 
 class Matchup(Enum):
@@ -13,11 +16,90 @@ class Matchup(Enum):
     ADVANTAGEOUS = 1
 
 
+class AliasSampler:
+    """Samples indices from a fixed discrete distribution in O(1) (Vose's alias method)."""
+    def __init__(self, weights: Sequence[float]):
+        total = sum(weights)
+        if not weights or total <= 0:
+            raise ValueError("Can't sample from weights that don't sum to a positive value")
+        num_weights = len(weights)
+        scaled = [weight * num_weights / total for weight in weights]
+        self._prob = [1.0] * num_weights
+        self._alias = list(range(num_weights))
+
+        small = [ind for ind, weight in enumerate(scaled) if weight < 1]
+        large = [ind for ind, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            small_ind, large_ind = small.pop(), large.pop()
+            self._prob[small_ind] = scaled[small_ind]
+            self._alias[small_ind] = large_ind
+            scaled[large_ind] -= 1 - scaled[small_ind]
+            (small if scaled[large_ind] < 1 else large).append(large_ind)
+        # Anything left over is (up to float error) exactly 1 and always keeps its own column
+
+    def __len__(self) -> int:
+        return len(self._prob)
+
+    def sample(self, rng: Optional[random.Random] = None) -> int:
+        rng = rng or random
+        ind = rng.randrange(len(self._prob))
+        return ind if rng.random() < self._prob[ind] else self._alias[ind]
+
+
+@dataclass(frozen=True)
+class SpeciesTemplate:
+    """Everything about a generated Pokemon that only depends on its species and level, computed once."""
+    species: PokemonSpecies
+    level: int
+    stats: PokemonStats
+    # Sorted by api_id
+    learn_set: tuple[MoveInfo, ...]
+
+    def new_pokemon(self, move_infos: Sequence[MoveInfo], nickname: str) -> Pokemon:
+        # noinspection PyTypeChecker
+        move_set = tuple(Move(move_info, pp=move_info.total_pp) for move_info in move_infos)
+        return Pokemon(self.species, stats=self.stats, hp=self.stats.total_hp, move_set=move_set,
+                       nickname=nickname, level=self.level)
+
+    def reset(self, pokemon: Pokemon, move_infos: Sequence[MoveInfo], nickname: str):
+        """Turns a used Pokemon into a fresh one of this species, reusing its Move objects where it can."""
+        pokemon.species = self.species
+        pokemon.stats = self.stats
+        pokemon.hp = self.stats.total_hp
+        pokemon.nickname = nickname
+        pokemon.level = self.level
+        pokemon.dmg_multiplier = 1
+        pokemon.confusion_turns = 0
+        pokemon.bound_turns = 0
+        pokemon.statuses.clear()
+        if len(pokemon.move_set) == len(move_infos):
+            for move, move_info in zip(pokemon.move_set, move_infos):
+                move.info = move_info
+                move.pp = move_info.total_pp
+        else:
+            # noinspection PyTypeChecker
+            pokemon.move_set = tuple(Move(move_info, pp=move_info.total_pp) for move_info in move_infos)
+
+
 class PokemonGenerator:
-    def __init__(self, all_pokemon: list[PokemonSpecies]):
+    def __init__(self, all_pokemon: Sequence[PokemonSpecies],
+                 species_weights: Optional[Callable[[PokemonSpecies], float]] = None,
+                 rng: Optional[random.Random] = None):
+        self.rng = new_stream(rng)
         # Makes it more interesting than generating pokemon with empty learnsets or only 1 possible move
         self.all_pokemon = [pokemon for pokemon in all_pokemon if len(pokemon.learn_set) > 1]
         self.names = ["Bob", "Bill", "John", "Mary", "Susan"]
+        self.index = DexIndex(all_pokemon=self.all_pokemon)
+        # For each species (by index into all_pokemon), the indices of the opponents that give it each matchup
+        self._matchup_index: list[dict[Matchup, tuple[int, ...]]] = self._build_matchup_index()
+        self._species_weights: Optional[Callable[[PokemonSpecies], float]] = None
+        self._species_sampler: Optional[AliasSampler] = None
+        self._opponent_samplers: dict[tuple[int, Matchup], Optional[AliasSampler]] = {}
+        self._templates: dict[tuple[int, int], SpeciesTemplate] = {}
+        self._pool: list[Pokemon] = []
+        # ids of the Pokemon in the pool, so none is in it twice (and handed to both trainers of a battle)
+        self._pooled_ids: set[int] = set()
+        self.set_species_weights(species_weights)
 
     def _calc_stat(self, base_stat_val: int, level: int, is_hp: bool = False) -> int:
         return ((2 * base_stat_val * level) // 100) + level + (10 if is_hp else 5)
@@ -27,25 +109,49 @@ class PokemonGenerator:
                                      for f in dataclasses.fields(PokemonStats)})
         return full_stats
 
-    def _random_moves(self, poke_species: PokemonSpecies) -> tuple[Move, Move, Move, Move]:
-        if len(poke_species.learn_set) == 0:
-            raise ValueError("Can't pick random moves from an empty learn set")
-        move_infos = random.sample(poke_species.learn_set, min(len(poke_species.learn_set), 4))
-        # noinspection PyTypeChecker
-        return tuple(Move(move_info, pp=move_info.total_pp) for move_info in move_infos)
+    def template(self, poke_species: PokemonSpecies, level: int = 100) -> SpeciesTemplate:
+        key = (poke_species.api_id, level)
+        template = self._templates.get(key)
+        if template is None:
+            if len(poke_species.learn_set) == 0:
+                raise ValueError("Can't pick random moves from an empty learn set")
+            # Sorted so move sampling only depends on the rng, not on set iteration order
+            template = SpeciesTemplate(poke_species, level, self.calc_all_stats(poke_species.base_stats, level),
+                                       tuple(sorted(poke_species.learn_set, key=lambda move_info: move_info.api_id)))
+            self._templates[key] = template
+        return template
+
+    def _random_moves(self, template: SpeciesTemplate) -> list[MoveInfo]:
+        return self.rng.sample(template.learn_set, min(len(template.learn_set), 4))
 
     def _random_name(self) -> str:
-        return random.choice([name for name in self.names])
+        return self.rng.choice(self.names)
 
     def _pokemon_from_species(self, poke_species: PokemonSpecies, level: int = 100) -> Pokemon:
-        full_stats = self.calc_all_stats(poke_species.base_stats, level)
-        move_set = self._random_moves(poke_species)
+        template = self.template(poke_species, level)
+        move_infos = self._random_moves(template)
         nickname = self._random_name()
-        return Pokemon(poke_species, hp=full_stats.total_hp,
-                       stats=full_stats, move_set=move_set, nickname=nickname)
+        if self._pool:
+            pokemon = self._pool.pop()
+            self._pooled_ids.remove(id(pokemon))
+            template.reset(pokemon, move_infos, nickname)
+            return pokemon
+        return template.new_pokemon(move_infos, nickname)
+
+    def release(self, *pokemon: Pokemon):
+        """
+        Hands Pokemon that are done battling back to the generator, which resets and reuses them instead of
+        allocating new ones. They mustn't be used (or still be in a battle) afterwards, and releasing one twice is a
+        ValueError.
+        """
+        for released in pokemon:
+            if id(released) in self._pooled_ids:
+                raise ValueError(f"{released.nickname} was already released")
+            self._pooled_ids.add(id(released))
+            self._pool.append(released)
 
     def _types_advantage(self, pokemon_a: PokemonSpecies, pokemon_b: PokemonSpecies) -> Matchup:
-        weight = math.prod(Type.dmg_modifier(at, dt) for at, dt in itertools.product(pokemon_a.types, pokemon_b.types))
+        weight = math.prod(Type.effectiveness(at, pokemon_b.types) for at in pokemon_a.types)
         if weight > 1:
             return Matchup.ADVANTAGEOUS
         elif weight < 1:
@@ -53,27 +159,62 @@ class PokemonGenerator:
         else:
             return Matchup.NEUTRAL
 
+    def _build_matchup_index(self) -> list[dict[Matchup, tuple[int, ...]]]:
+        # Matchups only depend on typing, so work with the species grouped by typing
+        species_by_typing = self.index.species_inds_by_typing()
+        matchup_index = []
+        for species in self.all_pokemon:
+            buckets = {matchup: [] for matchup in Matchup}
+            for opponent_inds in species_by_typing.values():
+                matchup = self._types_advantage(species, self.all_pokemon[opponent_inds[0]])
+                buckets[matchup].extend(opponent_inds)
+            matchup_index.append({matchup: tuple(sorted(inds)) for matchup, inds in buckets.items()})
+        return matchup_index
+
+    def matchup_opponents(self, species_ind: int, matchup: Matchup) -> tuple[int, ...]:
+        """Indices of species that give all_pokemon[species_ind] the given matchup (falling back to neutral)."""
+        opponents = self._matchup_index[species_ind][matchup]
+        if not opponents:
+            opponents = self._matchup_index[species_ind][Matchup.NEUTRAL]
+        return opponents
+
+    def set_species_weights(self, species_weights: Optional[Callable[[PokemonSpecies], float]]):
+        """
+        Biases which species get generated (e.g. for a training curriculum).
+        Weights are relative and don't need to be normalized. Pass None to sample uniformly again.
+        """
+        self._species_weights = species_weights
+        self._opponent_samplers = {}
+        if species_weights is None:
+            self._species_sampler = None
+        else:
+            self._species_sampler = AliasSampler([species_weights(species) for species in self.all_pokemon])
+
+    def _sample_species(self) -> int:
+        if self._species_sampler is None:
+            return self.rng.randrange(len(self.all_pokemon))
+        return self._species_sampler.sample(self.rng)
+
+    def _sample_opponent(self, species_ind: int, matchup: Matchup) -> int:
+        opponents = self.matchup_opponents(species_ind, matchup)
+        if self._species_weights is not None:
+            key = (species_ind, matchup)
+            if key not in self._opponent_samplers:
+                # Built lazily since most (species, matchup) pairs won't come up in a given curriculum stage
+                weights = [self._species_weights(self.all_pokemon[ind]) for ind in opponents]
+                self._opponent_samplers[key] = AliasSampler(weights) if sum(weights) > 0 else None
+            sampler = self._opponent_samplers[key]
+            if sampler is not None:
+                return opponents[sampler.sample(self.rng)]
+        return self.rng.choice(opponents)
+
     def generate(self, n: int = 1, matchup: Matchup = Matchup.NEUTRAL) -> list[Pokemon]:
-        pokemon_species = []
         if matchup is Matchup.NEUTRAL or n != 2:
-            pokemon_species = random.choices(self.all_pokemon, k=n)
-        # Add support for generating 1v1's with a particular matchup
-        elif n == 2 and matchup is Matchup.ADVANTAGEOUS:
-            pokemon_species = [random.choice(self.all_pokemon)]
-            disadvantaged_pokemon = [pokemon for pokemon in self.all_pokemon
-                                     if self._types_advantage(pokemon_species[0], pokemon) is Matchup.ADVANTAGEOUS]
-            if not disadvantaged_pokemon:
-                disadvantaged_pokemon = [pokemon for pokemon in self.all_pokemon
-                                         if self._types_advantage(pokemon_species[0], pokemon) is Matchup.NEUTRAL]
-            pokemon_species.append(random.choice(disadvantaged_pokemon))
-        elif n == 2 and matchup is Matchup.DISADVANTAGEOUS:
-            pokemon_species = [random.choice(self.all_pokemon)]
-            advantaged_pokemon = [pokemon for pokemon in self.all_pokemon
-                                  if self._types_advantage(pokemon_species[0], pokemon) is Matchup.DISADVANTAGEOUS]
-            if not advantaged_pokemon:
-                advantaged_pokemon = [pokemon for pokemon in self.all_pokemon
-                                      if self._types_advantage(pokemon_species[0], pokemon) is Matchup.NEUTRAL]
-            pokemon_species.append(random.choice(advantaged_pokemon))
-
-        generated_pokemon = [self._pokemon_from_species(species) for species in pokemon_species]
+            species_inds = [self._sample_species() for _ in range(n)]
+        else:
+            # Add support for generating 1v1's with a particular matchup
+            first_ind = self._sample_species()
+            species_inds = [first_ind, self._sample_opponent(first_ind, matchup)]
+
+        generated_pokemon = [self._pokemon_from_species(self.all_pokemon[ind]) for ind in species_inds]
         return generated_pokemon
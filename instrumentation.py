@@ -0,0 +1,101 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class PhaseTimer:
+    calls: int = 0
+    seconds: float = 0.0
+
+
+class Instrumentation:
+    """
+    Per-phase timers and event counters for battles and strategies. Phases nest (e.g. use_move is part of
+    play_turn), so each timer includes the time of the phases inside it.
+    """
+    def __init__(self):
+        self.counters: Counter[str] = Counter()
+        self.timers: dict[str, PhaseTimer] = {}
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def add_time(self, phase: str, seconds: float, calls: int = 1):
+        timer = self.timers.get(phase)
+        if timer is None:
+            timer = self.timers[phase] = PhaseTimer()
+        timer.calls += calls
+        timer.seconds += seconds
+
+    @contextmanager
+    def timed(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def merge(self, snapshot: dict):
+        """Adds the counts and times of a snapshot (e.g. one taken in a worker process)."""
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported instrumentation snapshot version: {snapshot.get('version')}")
+        self.counters.update(snapshot["counters"])
+        for phase, timer in snapshot["timers"].items():
+            self.add_time(phase, timer["seconds"], timer["calls"])
+
+    def snapshot(self) -> dict:
+        """Everything recorded so far as JSON-serializable values."""
+        decisions = self.counters["decisions"]
+        return {
+            "version": SNAPSHOT_VERSION,
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {
+                phase: {"calls": timer.calls, "seconds": timer.seconds,
+                        "mean_us": timer.seconds / timer.calls * 1e6 if timer.calls else 0.0}
+                for phase, timer in sorted(self.timers.items())
+            },
+            # Q-values computed per move the policy picked
+            "policy_evaluations_per_decision":
+                self.counters["policy_evaluations"] / decisions if decisions else 0.0,
+        }
+
+    def write(self, path: Union[str, Path]):
+        Path(path).write_text(json.dumps(self.snapshot(), indent=2))
+
+
+# What battles and strategies record to. None (the default) turns every instrumentation point into a
+# single check, so it costs next to nothing when disabled. Battles look it up once when they're created.
+active: Optional[Instrumentation] = None
+
+
+def enable(instrumentation: Optional[Instrumentation] = None) -> Instrumentation:
+    global active
+    active = instrumentation if instrumentation is not None else Instrumentation()
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+@contextmanager
+def instrumented(instrumentation: Optional[Instrumentation] = None) -> Iterator[Instrumentation]:
+    """Records to the given (or a new) Instrumentation within the block."""
+    global active
+    previous = active
+    try:
+        yield enable(instrumentation)
+    finally:
+        active = previous
@@ -1,13 +1,54 @@
+import dataclasses
 import json
 import math
 import random
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional, TYPE_CHECKING
+from pathlib import Path
+from typing import Optional, Sequence, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from battle_strategies import BattleStrategy
 
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+
+def _slotted(cls):
+    """
+    Pickles a slotted dataclass as a tuple of its field values. Also accepts the __dict__ state of
+    instances pickled before the models had __slots__, so existing dex caches still load.
+    """
+    field_names = tuple(f.name for f in dataclasses.fields(cls))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in field_names)
+
+    def __setstate__(self, state):
+        for name, value in (state.items() if isinstance(state, dict) else zip(field_names, state)):
+            object.__setattr__(self, name, value)
+
+    cls.__getstate__ = __getstate__
+    cls.__setstate__ = __setstate__
+    if issubclass(cls, _CachedHash):
+        # Replaces the field-tuple hash that dataclass generates
+        cls.__hash__ = _CachedHash.__hash__
+    return cls
+
+
+class _CachedHash:
+    """Computes the hash of a frozen model once and keeps it in a slot (it's never pickled)."""
+    __slots__ = ("_hash",)
+
+    def _hash_key(self) -> tuple:
+        return tuple(getattr(self, f.name) for f in dataclasses.fields(self))
+
+    def __hash__(self) -> int:
+        try:
+            return self._hash
+        except AttributeError:
+            object.__setattr__(self, "_hash", hash(self._hash_key()))
+            return self._hash
+
 
 class DamageClass(Enum):
     PHYSICAL = "PHYSICAL"
@@ -49,27 +90,67 @@ class Type(Enum):
     ICE = "ICE"
     DRAGON = "DRAGON"
 
+    @property
+    def index(self) -> int:
+        return _TYPE_INDICES[self]
+
     @classmethod
     def dmg_modifier(cls, attacking_type: 'Type', defending_type: 'Type') -> float:
-        if not hasattr(cls, "_dmg_map"):
-            with open("./data/dmg_map.json", "r") as f:
-                data = json.load(f)
-            cls._dmg_map = {Type(k.upper()): {m: [Type(t.upper()) for t in t_list]
-                                              for m, t_list in v.items()}
-                            for k, v in data.items()}
-        type_dmg_map = cls._dmg_map[attacking_type]
-        if defending_type in type_dmg_map["double_damage_to"]:
-            return 2
-        elif defending_type in type_dmg_map["half_damage_to"]:
-            return 0.5
-        elif defending_type in type_dmg_map["no_damage_to"]:
-            return 0
-        else:
-            return 1
+        return _TYPE_CHART[_TYPE_INDICES[attacking_type]][_TYPE_INDICES[defending_type]]
 
+    @classmethod
+    def combo_index(cls, types: Sequence['Type']) -> int:
+        """Index of a (possibly dual) defending typing in the combined type chart."""
+        if len(types) == 1:
+            return _TYPE_INDICES[types[0]] * _NUM_TYPE_SLOTS
+        return _TYPE_INDICES[types[0]] * _NUM_TYPE_SLOTS + _TYPE_INDICES[types[1]] + 1
 
-@dataclass(frozen=True)
-class HitInfo:
+    @classmethod
+    def effectiveness(cls, attacking_type: 'Type', defending_types: Sequence['Type']) -> float:
+        """Combined damage modifier of an attacking type against all of a Pokemon's types."""
+        combo_ind = _TYPE_INDICES[defending_types[0]] * _NUM_TYPE_SLOTS
+        if len(defending_types) > 1:
+            combo_ind += _TYPE_INDICES[defending_types[1]] + 1
+        return _DUAL_TYPE_CHART[_TYPE_INDICES[attacking_type]][combo_ind]
+
+
+_TYPE_INDICES: dict[Type, int] = {t: ind for ind, t in enumerate(Type)}
+# One slot per type plus an empty slot for single-typed Pokemon
+_NUM_TYPE_SLOTS = len(Type) + 1
+
+
+def _load_type_chart(path: Path = DATA_DIR / "dmg_map.json") -> tuple[tuple[float, ...], ...]:
+    """Dense attacker x defender matrix of damage modifiers, indexed by Type.index."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    chart = [[1] * len(Type) for _ in Type]
+    for attacking_name, relations in data.items():
+        row = chart[_TYPE_INDICES[Type(attacking_name.upper())]]
+        # Applied from weakest to strongest precedence
+        for relation, modifier in (("no_damage_to", 0), ("half_damage_to", 0.5), ("double_damage_to", 2)):
+            for defending_name in relations[relation]:
+                row[_TYPE_INDICES[Type(defending_name.upper())]] = modifier
+    return tuple(tuple(row) for row in chart)
+
+
+def _build_dual_type_chart(chart: tuple[tuple[float, ...], ...]) -> tuple[tuple[float, ...], ...]:
+    """Attacker x (primary type, secondary type or none) matrix, indexed by Type.index and Type.combo_index."""
+    return tuple(
+        tuple(row[first] * (row[second - 1] if second else 1)
+              for first in range(len(Type)) for second in range(_NUM_TYPE_SLOTS))
+        for row in chart
+    )
+
+
+_TYPE_CHART = _load_type_chart()
+_DUAL_TYPE_CHART = _build_dual_type_chart(_TYPE_CHART)
+# Weights of the possible hit counts of multi-hit moves, from min_hits up
+MULTI_HIT_WEIGHTS = (0.375, 0.375, 0.125, 0.125)
+
+
+@_slotted
+@dataclass(frozen=True, slots=True)
+class HitInfo(_CachedHash):
     min_hits: int
     max_hits: int
     has_invulnerable_phase: bool = False
@@ -81,17 +162,17 @@ class HitInfo:
     def definite_hit_count(self) -> Optional[int]:
         return self.min_hits if self.min_hits == self.max_hits else None
 
-    def num_hits(self) -> int:
+    def num_hits(self, rng: Optional[random.Random] = None) -> int:
         if self.definite_hit_count is not None:
             return self.definite_hit_count
 
-        num_hits = random.choices(range(self.min_hits, self.max_hits + 1),
-                                  [0.375, 0.375, 0.125, 0.125], k=1)
+        num_hits = (rng or random).choices(range(self.min_hits, self.max_hits + 1), MULTI_HIT_WEIGHTS, k=1)
         return num_hits[0]
 
 
-@dataclass(frozen=True)
-class MoveInfo:
+@_slotted
+@dataclass(frozen=True, slots=True)
+class MoveInfo(_CachedHash):
     # ID for pokeapi.co
     api_id: int
     name: str
@@ -121,28 +202,32 @@ class MoveInfo:
         return self.name.replace("-", " ").capitalize()
 
 
-@dataclass
+# Shared by every Move.struggle() and Move.attack_self(), so their hashes are only computed once
+_STRUGGLE = MoveInfo(api_id=165, name='struggle',
+                     type=Type.NORMAL, power=50, total_pp=10, damage_class=DamageClass.PHYSICAL, healing=0,
+                     drain=-0.5, high_crit_ratio=False, hit_info=HitInfo(min_hits=1, max_hits=1),
+                     accuracy=1.0, priority=0)
+_ATTACK_SELF = MoveInfo(
+    api_id=-1, name='attack_self', type=Type.NORMAL, power=40, total_pp=10,
+    damage_class=DamageClass.PHYSICAL, healing=0, drain=0, high_crit_ratio=False,
+    hit_info=HitInfo(min_hits=1, max_hits=1), accuracy=None, priority=0
+)
+
+
+@_slotted
+@dataclass(slots=True)
 class Move:
     info: MoveInfo
     pp: int
 
     @classmethod
     def struggle(cls) -> 'Move':
-        move_info = MoveInfo(api_id=165, name='struggle',
-                             type=Type.NORMAL, power=50, total_pp=10, damage_class=DamageClass.PHYSICAL, healing=0,
-                             drain=-0.5, high_crit_ratio=False, hit_info=HitInfo(min_hits=1, max_hits=1),
-                             accuracy=1.0, priority=0)
-        return Move(move_info, pp=move_info.total_pp)  # This pp will never decrement
+        return Move(_STRUGGLE, pp=_STRUGGLE.total_pp)  # This pp will never decrement
 
     @classmethod
     def attack_self(cls) -> 'Move':
         """For when a Pokemon is confused."""
-        move_info = MoveInfo(
-            api_id=-1, name='attack_self', type=Type.NORMAL, power=40, total_pp=10,
-            damage_class=DamageClass.PHYSICAL, healing=0, drain=0, high_crit_ratio=False,
-            hit_info=HitInfo(min_hits=1, max_hits=1), accuracy=None, priority=0
-        )
-        return Move(move_info, pp=move_info.total_pp)
+        return Move(_ATTACK_SELF, pp=_ATTACK_SELF.total_pp)
 
     def use(self) -> 'Move':
         if self.pp == 0:
@@ -156,14 +241,16 @@ class Move:
         return self.info.display_name
 
 
-@dataclass(frozen=True)
-class Sprite:
+@_slotted
+@dataclass(frozen=True, slots=True)
+class Sprite(_CachedHash):
     front: str
     back: str
 
 
-@dataclass(frozen=True)
-class PokemonStats:
+@_slotted
+@dataclass(frozen=True, slots=True)
+class PokemonStats(_CachedHash):
     total_hp: int
     attack: int
     defense: int
@@ -171,8 +258,9 @@ class PokemonStats:
     speed: int
 
 
-@dataclass(frozen=True)
-class PokemonSpecies:
+@_slotted
+@dataclass(frozen=True, slots=True)
+class PokemonSpecies(_CachedHash):
     # ID for pokeapi.co
     api_id: int
     name: str
@@ -181,6 +269,10 @@ class PokemonSpecies:
     base_stats: PokemonStats
     learn_set: set[MoveInfo]
 
+    def _hash_key(self) -> tuple:
+        # Types and learn sets aren't hashable, and the ID already identifies a species
+        return self.api_id, self.name
+
     @property
     def display_name(self) -> str:
         return self.name.replace("-", " ").capitalize()
@@ -207,7 +299,26 @@ class PokemonStatus(Enum):
         }
 
 
-@dataclass
+@_slotted
+@dataclass(frozen=True, slots=True)
+class PokemonSnapshot:
+    """Immutable copy of the parts of a Pokemon's battle state that strategies look at."""
+    hp: int
+    stats: PokemonStats
+    types: tuple[Type, ...]
+    statuses: frozenset[PokemonStatus]
+    move_infos: tuple[MoveInfo, ...]
+
+    @property
+    def fainted(self) -> bool:
+        return self.hp == 0
+
+    def has_status(self, status: PokemonStatus) -> bool:
+        return status in self.statuses
+
+
+@_slotted
+@dataclass(slots=True)
 class Pokemon:
     species: PokemonSpecies
     # These are calculated without considering IV's and EV's
@@ -229,6 +340,19 @@ class Pokemon:
     def fainted(self) -> bool:
         return self.hp == 0
 
+    @property
+    def types(self) -> list[Type]:
+        return self.species.types
+
+    @property
+    def move_infos(self) -> tuple[MoveInfo, ...]:
+        return tuple(move.info for move in self.move_set)
+
+    def snapshot(self) -> PokemonSnapshot:
+        # Stats and move infos are immutable, so they can be shared instead of copied
+        return PokemonSnapshot(hp=self.hp, stats=self.stats, types=tuple(self.species.types),
+                               statuses=frozenset(self.statuses), move_infos=self.move_infos)
+
     def apply_health_effect(self, health_delta: int):
         self.hp = min(max(self.hp + health_delta, 0), self.stats.total_hp)
 
@@ -255,7 +379,8 @@ class Pokemon:
         return 0, ""
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, slots=True)
 class Trainer:
     name: str
     pokemon: Pokemon
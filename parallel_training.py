@@ -0,0 +1,134 @@
+import multiprocessing
+import queue
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from battle_strategies import ApproxQLearningStrategy
+from generator import PokemonGenerator
+from models import PokemonSpecies
+from rng_streams import spawn
+
+# (state-action features, reward, feature matrix of the next state or None if it's terminal)
+Transition = tuple[np.ndarray, float, Optional[np.ndarray]]
+
+
+@dataclass(frozen=True)
+class ParallelTrainingStats:
+    episodes: int
+    transitions: int
+    # Episodes thrown away because they were played with weights older than max_staleness allows
+    dropped_episodes: int
+    weight_versions: int
+    max_staleness_seen: int
+    elapsed: float
+
+    @property
+    def episodes_per_sec(self) -> float:
+        return self.episodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _actor_loop(strategy: ApproxQLearningStrategy, all_pokemon: list[PokemonSpecies], seed: int,
+                episodes_left, shared_weights, weights_version, transition_queue):
+    # The strategy arrives as a copy of the learner's, so give it a stream of its own
+    rng = random.Random(seed)
+    strategy.rng = spawn(rng)
+    generator = PokemonGenerator(all_pokemon, rng=spawn(rng))
+    strategy.training = True
+    local_version = -1
+    while True:
+        with episodes_left.get_lock():
+            if episodes_left.value <= 0:
+                break
+            episodes_left.value -= 1
+
+        # Only copy the weights when the learner has broadcast new ones
+        if weights_version.value != local_version:
+            with shared_weights.get_lock():
+                local_version = weights_version.value
+                strategy.weights[:] = shared_weights[:]
+
+        transitions: list[Transition] = []
+        for reward, action, state, next_state in strategy._play_episode(generator):
+            next_features = None if next_state[0].fainted else strategy._get_feature_matrix(next_state)
+            transitions.append((strategy._get_features(state, action), reward, next_features))
+        transition_queue.put((local_version, transitions))
+    # Tell the learner this actor is done
+    transition_queue.put(None)
+
+
+def train_parallel(strategy: ApproxQLearningStrategy, pokemon_generator: PokemonGenerator, num_episodes: int,
+                   num_actors: int = 4, broadcast_interval: int = 50, max_staleness: Optional[int] = 4,
+                   seed: int = 0) -> ParallelTrainingStats:
+    """
+    Trains the strategy with several actor processes playing episodes against a snapshot of its weights while
+    this process learns from the transitions they stream back.
+    New weights are broadcast every broadcast_interval learned episodes. An episode played with weights more
+    than max_staleness broadcasts old is dropped (None disables the bound). Dropped episodes still count
+    towards num_episodes.
+    """
+    ctx = multiprocessing.get_context()
+    episodes_left = ctx.Value("i", num_episodes)
+    shared_weights = ctx.Array("d", strategy.weights.tolist())
+    weights_version = ctx.Value("i", 0)
+    transition_queue = ctx.Queue()
+
+    actor_seeds = np.random.SeedSequence(seed).generate_state(num_actors, dtype=np.uint64)
+    actors = [
+        ctx.Process(target=_actor_loop, daemon=True,
+                    args=(strategy, pokemon_generator.all_pokemon, int(actor_seed),
+                          episodes_left, shared_weights, weights_version, transition_queue))
+        for actor_seed in actor_seeds
+    ]
+
+    start = time.time()
+    for actor in actors:
+        actor.start()
+
+    version = 0
+    num_learned = num_transitions = num_dropped = max_staleness_seen = 0
+    num_running = num_actors
+    strategy.training = True
+    try:
+        while num_running:
+            try:
+                message = transition_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(actor.is_alive() for actor in actors):
+                    raise RuntimeError("All actors exited without finishing")
+                continue
+            if message is None:
+                num_running -= 1
+                continue
+
+            actor_version, transitions = message
+            staleness = version - actor_version
+            if max_staleness is not None and staleness > max_staleness:
+                num_dropped += 1
+                continue
+            max_staleness_seen = max(max_staleness_seen, staleness)
+
+            for features, reward, next_features in transitions:
+                strategy._update_from_features(features, reward, next_features)
+            num_transitions += len(transitions)
+            num_learned += 1
+            strategy.episodes_trained += 1
+
+            if num_learned % broadcast_interval == 0:
+                with shared_weights.get_lock():
+                    shared_weights[:] = strategy.weights.tolist()
+                    version += 1
+                    weights_version.value = version
+    finally:
+        strategy.training = False
+        for actor in actors:
+            actor.join(timeout=1)
+            if actor.is_alive():
+                actor.terminate()
+
+    return ParallelTrainingStats(episodes=num_learned, transitions=num_transitions, dropped_episodes=num_dropped,
+                                 weight_versions=version, max_staleness_seen=max_staleness_seen,
+                                 elapsed=time.time() - start)
@@ -0,0 +1,144 @@
+import math
+from pathlib import Path
+from typing import Sequence, Union
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class MixedRadixEncoder:
+    """Packs tuples of small bounded integers (digit i in [0, radices[i])) into a single int and back."""
+    def __init__(self, radices: Sequence[int]):
+        if not radices or any(radix < 1 for radix in radices):
+            raise ValueError(f"Invalid radices: {radices}")
+        self.radices: tuple[int, ...] = tuple(radices)
+        self.size = math.prod(self.radices)
+        # The last digit varies fastest
+        strides = [1] * len(self.radices)
+        for ind in range(len(self.radices) - 2, -1, -1):
+            strides[ind] = strides[ind + 1] * self.radices[ind + 1]
+        self.strides: tuple[int, ...] = tuple(strides)
+        self._stride_array = np.array(self.strides, dtype=np.int64)
+
+    def encode(self, digits: Sequence[int]) -> int:
+        code = 0
+        for digit, radix in zip(digits, self.radices):
+            if not 0 <= digit < radix:
+                raise ValueError(f"Digit {digit} out of range for radix {radix} in {tuple(digits)}")
+            code = code * radix + digit
+        return code
+
+    def encode_many(self, digits: np.ndarray) -> np.ndarray:
+        """Encodes along the last axis."""
+        digits = np.asarray(digits, dtype=np.int64)
+        if ((digits < 0) | (digits >= np.array(self.radices))).any():
+            raise ValueError("Digits out of range")
+        return digits @ self._stride_array
+
+    def decode(self, code: int) -> tuple[int, ...]:
+        if not 0 <= code < self.size:
+            raise ValueError(f"Code {code} out of range")
+        digits = []
+        for radix in reversed(self.radices):
+            code, digit = divmod(code, radix)
+            digits.append(digit)
+        return tuple(reversed(digits))
+
+
+class QTable:
+    """
+    Q-values indexed by encoded state and action. Every state gets a dense row with a value for each action,
+    allocated the first time one of its values is written, and unwritten values read as 0.
+    Rows are only allocated for visited states since the full state space rarely fits in memory.
+    """
+    def __init__(self, state_radices: Sequence[int], action_radices: Sequence[int], initial_capacity: int = 1024):
+        self.states = MixedRadixEncoder(state_radices)
+        self.actions = MixedRadixEncoder(action_radices)
+        self._rows: dict[int, int] = {}
+        self._state_codes = np.zeros(initial_capacity, dtype=np.int64)
+        self._values = np.zeros((initial_capacity, self.actions.size))
+
+    def __len__(self) -> int:
+        """Number of states with a row."""
+        return len(self._rows)
+
+    @property
+    def values(self) -> np.ndarray:
+        """(num states, num actions) view of the rows, in the order states were first written."""
+        return self._values[:len(self._rows)]
+
+    @property
+    def state_codes(self) -> np.ndarray:
+        return self._state_codes[:len(self._rows)]
+
+    def _row(self, state_code: int) -> int:
+        row = self._rows.get(state_code)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._values):
+                self._values = np.concatenate([self._values, np.zeros_like(self._values)])
+                self._state_codes = np.concatenate([self._state_codes, np.zeros_like(self._state_codes)])
+            self._state_codes[row] = state_code
+            self._rows[state_code] = row
+        return row
+
+    def get(self, state_code: int, action_code: int) -> float:
+        row = self._rows.get(state_code)
+        return 0.0 if row is None else float(self._values[row, action_code])
+
+    def get_many(self, state_code: int, action_codes: np.ndarray) -> np.ndarray:
+        row = self._rows.get(state_code)
+        if row is None:
+            return np.zeros(len(action_codes))
+        return self._values[row, action_codes]
+
+    def get_batch(self, state_codes: np.ndarray, action_codes: np.ndarray) -> np.ndarray:
+        """Values of action_codes[i, j] in state_codes[i], as a (num states, num actions) array."""
+        rows = np.array([self._rows.get(code, -1) for code in state_codes.tolist()], dtype=np.int64)
+        values = self._values[np.maximum(rows, 0)[:, None], action_codes]
+        values[rows < 0] = 0
+        return values
+
+    def set(self, state_code: int, action_code: int, value: float):
+        row = self._row(state_code)
+        self._values[row, action_code] = value
+
+    def max(self, state_code: int, action_codes: np.ndarray) -> float:
+        """Highest value among the given actions."""
+        return float(self.get_many(state_code, action_codes).max())
+
+    def argmax(self, state_code: int, action_codes: np.ndarray) -> np.ndarray:
+        """Positions (in action_codes) of every action tied for the highest value."""
+        q_vals = self.get_many(state_code, action_codes)
+        return np.flatnonzero(q_vals == q_vals.max())
+
+    def save(self, path: Union[str, Path]):
+        with open(path, "wb") as f:
+            # Rows are mostly zeros, so they compress very well
+            np.savez_compressed(f, version=np.array(FORMAT_VERSION), **self.to_arrays())
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'QTable':
+        with np.load(path) as data:
+            if int(data["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported Q-table version: {int(data['version'])}")
+            return cls.from_arrays(data["state_radices"], data["action_radices"], data["state_codes"],
+                                   data["values"])
+
+    @classmethod
+    def from_arrays(cls, state_radices: np.ndarray, action_radices: np.ndarray, state_codes: np.ndarray,
+                    values: np.ndarray) -> 'QTable':
+        table = cls(state_radices.tolist(), action_radices.tolist(), initial_capacity=max(len(state_codes), 1))
+        if values.shape != (len(state_codes), table.actions.size):
+            raise ValueError(f"Q-table values have shape {values.shape}, expected "
+                             f"{(len(state_codes), table.actions.size)}")
+        table._values[:len(state_codes)] = values
+        table._state_codes[:len(state_codes)] = state_codes
+        table._rows = {int(state_code): row for row, state_code in enumerate(state_codes.tolist())}
+        return table
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """The arrays from_arrays takes, by argument name."""
+        return {"state_radices": np.array(self.states.radices), "action_radices": np.array(self.actions.radices),
+                "state_codes": self.state_codes, "values": self.values}
@@ -0,0 +1,143 @@
+import struct
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from battle_events import EventSink
+from battle_strategies import BattleStrategy
+from dex_index import DexIndex
+from gameplay import Battle
+from models import Move, Pokemon, PokemonStats, Trainer
+
+# Layout (little-endian):
+#   header:    magic, version, flags (bit 0: buffered RNG), seed
+#   per side:  trainer name, nickname, species api_id, level, hp, the 5 stats, move count,
+#              then (move api_id, pp) per move. Strings are a u8 length followed by UTF-8.
+#   decisions: u32 count, then one byte per decision: trainer index << 2 | move set slot
+MAGIC = b"PBRP"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBQ")
+_POKEMON = struct.Struct("<HBH5HB")
+_MOVE = struct.Struct("<HB")
+_COUNT = struct.Struct("<I")
+_BUFFERED_FLAG = 1
+
+
+@dataclass(frozen=True)
+class PokemonSpec:
+    """What's needed to rebuild a Pokemon as it was at the start of a battle."""
+    trainer_name: str
+    nickname: str
+    species_id: int
+    level: int
+    hp: int
+    stats: PokemonStats
+    # (move api_id, pp) per move set slot
+    moves: tuple[tuple[int, int], ...]
+
+    @classmethod
+    def from_trainer(cls, trainer: Trainer) -> 'PokemonSpec':
+        pokemon = trainer.pokemon
+        return cls(trainer_name=trainer.name, nickname=pokemon.nickname, species_id=pokemon.species.api_id,
+                   level=pokemon.level, hp=pokemon.hp, stats=pokemon.stats,
+                   moves=tuple((move.info.api_id, move.pp) for move in pokemon.move_set))
+
+    def build(self, index: DexIndex) -> Pokemon:
+        species = index.species_by_id(self.species_id)
+        if species is None:
+            raise ValueError(f"Unknown species: {self.species_id}")
+        move_set = tuple(Move(index.move_by_id(api_id), pp=pp) for api_id, pp in self.moves)
+        # noinspection PyTypeChecker
+        return Pokemon(species, stats=self.stats, hp=self.hp, move_set=move_set, nickname=self.nickname,
+                       level=self.level)
+
+
+class ReplayStrategy(BattleStrategy):
+    """Picks the recorded moves of one trainer, in order."""
+    def __init__(self, slots: list[int]):
+        self.slots = deque(slots)
+
+    def pick_move(self, curr_pokemon: Pokemon, opposing_pokemon: Pokemon) -> Move:
+        if not self.slots:
+            raise ValueError("Replay ran out of recorded decisions")
+        return curr_pokemon.move_set[self.slots.popleft()]
+
+
+@dataclass
+class BattleReplay:
+    seed: int
+    buffered: bool
+    sides: tuple[PokemonSpec, ...]
+    decisions: list[tuple[int, int]]
+
+    @classmethod
+    def capture(cls, battle: Battle) -> 'BattleReplay':
+        """
+        Call before the battle is run. The replay shares the battle's decision list, so it's complete
+        once the battle finishes.
+        """
+        if battle.turn_count:
+            raise ValueError("Can only capture a battle that hasn't started")
+        return cls(seed=battle.seed, buffered=battle.buffered,
+                   sides=tuple(PokemonSpec.from_trainer(trainer) for trainer in battle.trainers),
+                   decisions=battle.decisions)
+
+    def to_battle(self, index: DexIndex, sink: Optional[EventSink] = None) -> Battle:
+        """Rebuilds the battle with strategies that replay the recorded decisions. It's silent unless given a sink."""
+        trainers = [
+            Trainer(spec.trainer_name, spec.build(index),
+                    ReplayStrategy([slot for trainer_ind, slot in self.decisions if trainer_ind == side]))
+            for side, spec in enumerate(self.sides)
+        ]
+        return Battle(*trainers, training_mode=sink is None, sink=sink, seed=self.seed, buffered=self.buffered)
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(MAGIC, VERSION, _BUFFERED_FLAG if self.buffered else 0, self.seed)]
+        for spec in self.sides:
+            parts.append(_pack_str(spec.trainer_name))
+            parts.append(_pack_str(spec.nickname))
+            stats = spec.stats
+            parts.append(_POKEMON.pack(spec.species_id, spec.level, spec.hp, stats.total_hp, stats.attack,
+                                       stats.defense, stats.special, stats.speed, len(spec.moves)))
+            parts.extend(_MOVE.pack(api_id, pp) for api_id, pp in spec.moves)
+        parts.append(_COUNT.pack(len(self.decisions)))
+        parts.append(bytes(trainer_ind << 2 | slot for trainer_ind, slot in self.decisions))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BattleReplay':
+        magic, version, flags, seed = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a battle replay")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version: {version}")
+        offset = _HEADER.size
+        sides = []
+        for _ in range(2):
+            trainer_name, offset = _unpack_str(data, offset)
+            nickname, offset = _unpack_str(data, offset)
+            species_id, level, hp, *stat_vals, num_moves = _POKEMON.unpack_from(data, offset)
+            offset += _POKEMON.size
+            moves = []
+            for _ in range(num_moves):
+                moves.append(_MOVE.unpack_from(data, offset))
+                offset += _MOVE.size
+            sides.append(PokemonSpec(trainer_name=trainer_name, nickname=nickname, species_id=species_id,
+                                     level=level, hp=hp, stats=PokemonStats(*stat_vals), moves=tuple(moves)))
+        num_decisions, = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        decisions = [(packed >> 2, packed & 3) for packed in data[offset:offset + num_decisions]]
+        if len(decisions) != num_decisions:
+            raise ValueError("Truncated battle replay")
+        return cls(seed=seed, buffered=bool(flags & _BUFFERED_FLAG), sides=tuple(sides), decisions=decisions)
+
+
+def _pack_str(value: str) -> bytes:
+    encoded = value.encode()
+    return struct.pack("<B", len(encoded)) + encoded
+
+
+def _unpack_str(data: bytes, offset: int) -> tuple[str, int]:
+    length = data[offset]
+    offset += 1
+    return data[offset:offset + length].decode(), offset + length
@@ -0,0 +1,74 @@
+import operator
+import random
+from typing import Iterator, Optional
+
+import numpy as np
+
+
+def new_stream(rng: Optional[random.Random] = None) -> random.Random:
+    """
+    The given stream, or a new one seeded from the global random module. Deriving the seed keeps
+    random.seed() reproducible for callers that don't pass streams around explicitly.
+    """
+    return rng if rng is not None else random.Random(random.getrandbits(64))
+
+
+def spawn(rng: random.Random) -> random.Random:
+    """An independent child stream, e.g. one per battle."""
+    return random.Random(rng.getrandbits(64))
+
+
+class BufferedRandom(random.Random):
+    """
+    random.Random whose random() is served from chunks of floats pre-drawn with NumPy, with randint and
+    choice built directly on it (random.Random's versions go through the much slower randrange).
+    Everything else built on random() (choices, uniform...) gets the buffered floats too.
+    The sequence only depends on the seed, not on the buffer size, but it's a different sequence than
+    random.Random(seed) produces.
+    """
+    def __init__(self, seed: int, buffer_size: int = 1024):
+        self._buffer_size = buffer_size
+        super().__init__(seed)
+
+    def seed(self, a=None, version=2):
+        super().seed(a, version)
+        self._np_rng = np.random.default_rng(a)
+        self._start_chunks(0)
+
+    def _start_chunks(self, skip: int):
+        self._chunk_state = self._np_rng.bit_generator.state
+        self._chunk = self._np_rng.random(self._buffer_size).tolist()
+        self._chunk_iter = iter(self._chunk)
+        for _ in range(skip):
+            next(self._chunk_iter)
+        # A generator's __next__ is much cheaper to call than a Python method
+        self.random = self._floats().__next__
+
+    def _floats(self) -> Iterator[float]:
+        while True:
+            yield from self._chunk_iter
+            self._chunk_state = self._np_rng.bit_generator.state
+            self._chunk = self._np_rng.random(self._buffer_size).tolist()
+            self._chunk_iter = iter(self._chunk)
+
+    def randint(self, a: int, b: int) -> int:
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def getstate(self):
+        pos = len(self._chunk) - operator.length_hint(self._chunk_iter)
+        return super().getstate(), self._chunk_state, pos
+
+    def setstate(self, state):
+        mt_state, chunk_state, pos = state
+        super().setstate(mt_state)
+        self._np_rng.bit_generator.state = chunk_state
+        self._start_chunks(pos)
+
+    def __reduce__(self):
+        return self.__class__, (0, self._buffer_size), self.getstate()
+
+    def __setstate__(self, state):
+        self.setstate(state)
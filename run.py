@@ -1,23 +1,42 @@
 import time
-from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+import instrumentation
 from battle_strategies import FullyRandomStrategy, ApproxQLearningStrategy, InteractiveBattleStrategy, QLearningStrategy
+from checkpoint import CHECKPOINT_PATH
 from data_store import DataStore
+from evaluation import evaluate
 from gameplay import Battle
 from generator import PokemonGenerator, Matchup
 from models import Trainer
 
+NUM_EPISODES = 10000
+# Records hot-path timers and counters (see instrumentation.py) and writes them to these files
+INSTRUMENT = False
+TRAINING_STATS_PATH = "./data/training_stats.json"
+EVALUATION_STATS_PATH = "./data/evaluation_stats.json"
+
 
 if __name__ == '__main__':
     data_store = DataStore()
     generator = PokemonGenerator(data_store.all_pokemon)
+    stats = instrumentation.enable() if INSTRUMENT else None
 
     start = time.time()
-    q_strat = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, softmax=True)
-
-    q_strat.train(generator, num_episodes=10000)
+    # Picks up where the last run stopped (or finished) instead of training from scratch
+    if Path(CHECKPOINT_PATH).exists():
+        q_strat = ApproxQLearningStrategy.load_checkpoint(CHECKPOINT_PATH, generator)
+        print(f"Loaded checkpoint trained for {q_strat.episodes_trained} episodes")
+    else:
+        q_strat = ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, softmax=True)
+
+    q_strat.train(generator, num_episodes=max(NUM_EPISODES - q_strat.episodes_trained, 0),
+                  checkpoint_path=CHECKPOINT_PATH)
     end = time.time()
     print(f"Training Time: {end - start}")
+    if stats is not None:
+        stats.write(TRAINING_STATS_PATH)
+        stats.reset()
 
     num_test_runs = 1000
 
@@ -26,25 +45,17 @@ if __name__ == '__main__':
     #                 Trainer("You", pokemon_b, InteractiveBattleStrategy()))
     # battle.run()
 
-    def test_run(ind, matchup_type):
-        pokemon_a, pokemon_b = generator.generate(2, matchup_type)
-        battle = Battle(Trainer("Trainer A", pokemon_a, q_strat),
-                        Trainer("Trainer B", pokemon_b, FullyRandomStrategy()),
-                        training_mode=True)
-        winner_ind = battle.run()
-        return int(winner_ind == 0)
-
     import pprint; pprint.pprint(q_strat.weights)
 
     start = time.time()
-    with ThreadPoolExecutor() as executor:
-        results = executor.map(lambda ind: test_run(ind, Matchup.ADVANTAGEOUS), range(num_test_runs // 2))
-        num_advantaged_wins = sum(results)
-        results = executor.map(lambda ind: test_run(ind, Matchup.DISADVANTAGEOUS), range(num_test_runs // 2))
-        num_disadvantaged_wins = sum(results)
-
+    results = evaluate(q_strat, data_store.all_pokemon, {Matchup.ADVANTAGEOUS: num_test_runs // 2,
+                                                         Matchup.DISADVANTAGEOUS: num_test_runs // 2})
+    num_advantaged_wins = results.wins[Matchup.ADVANTAGEOUS]
+    num_disadvantaged_wins = results.wins[Matchup.DISADVANTAGEOUS]
     end = time.time()
     print(f"Testing Time: {end - start}")
+    if stats is not None:
+        stats.write(EVALUATION_STATS_PATH)
 
     print(f"Strategy Total Win Rate: {(num_advantaged_wins + num_disadvantaged_wins) / num_test_runs * 100}%")
     print(f"Strategy Advantaged Win Rate: {num_advantaged_wins / (num_test_runs / 2) * 100}%")
@@ -1,2 +1,5 @@
+from .fetcher import AsyncFetcher, Fetcher, ResponseCache
 from .move_scraper import MoveScraper
 from .pokemon_scraper import PokemonScraper
+from .pipeline import GEN1_URL, scrape_dex, scrape_dex_async
+from .snapshot import RawSnapshot, RefreshStats
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _atomic_write(path: Path, data: bytes):
+    # Unique per thread, so concurrent writers of the same entry don't clobber each other's temp file
+    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+
+class ResponseCache:
+    """
+    On-disk cache of response bodies. Bodies are stored under the hash of their content (so identical documents
+    are only stored once), and each URL maps to the hash of its latest body.
+    """
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self._urls_dir = self.directory / "urls"
+        self._objects_dir = self.directory / "objects"
+        self._urls_dir.mkdir(parents=True, exist_ok=True)
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+
+    def _url_path(self, url: str) -> Path:
+        return self._urls_dir / hashlib.sha256(url.encode()).hexdigest()
+
+    def digest(self, url: str) -> Optional[str]:
+        """Content hash of the cached body for the URL, if any."""
+        try:
+            return self._url_path(url).read_text()
+        except FileNotFoundError:
+            return None
+
+    def get(self, url: str) -> Optional[bytes]:
+        digest = self.digest(url)
+        if digest is None:
+            return None
+        try:
+            return (self._objects_dir / digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, url: str, body: bytes) -> str:
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._objects_dir / digest
+        if not object_path.exists():
+            _atomic_write(object_path, body)
+        _atomic_write(self._url_path(url), digest.encode())
+        return digest
+
+
+class _RateLimiter:
+    """Spaces requests out to at most requests_per_sec, across threads and coroutines."""
+    def __init__(self, requests_per_sec: Optional[float]):
+        self.interval = 1 / requests_per_sec if requests_per_sec else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def reserve(self) -> float:
+        """Reserves the next slot and returns how many seconds to wait for it."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+
+class Fetcher:
+    """
+    Thread-safe HTTP GETs over one pooled session, with at most max_connections requests in flight,
+    an optional rate limit, retries with exponential backoff (honoring Retry-After) and an optional
+    response cache. Cached URLs never hit the network.
+    """
+    def __init__(self, max_connections: int = 8, requests_per_sec: Optional[float] = None, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 30, cache: Optional[ResponseCache] = None):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._rate_limiter = _RateLimiter(requests_per_sec)
+        self._stats_lock = threading.Lock()
+        self.num_requests = 0
+        self.num_cache_hits = 0
+
+    def __enter__(self) -> 'Fetcher':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _cached(self, url: str) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+        body = self.cache.get(url)
+        if body is not None:
+            with self._stats_lock:
+                self.num_cache_hits += 1
+        return body
+
+    def _send(self, url: str) -> bytes:
+        """Sends the request and caches the body. Doesn't take a slot or wait for the rate limit."""
+        with self._stats_lock:
+            self.num_requests += 1
+        resp = self.session.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        if self.cache is not None:
+            self.cache.put(url, resp.content)
+        return resp.content
+
+    def get_bytes(self, url: str) -> bytes:
+        body = self._cached(url)
+        if body is not None:
+            return body
+        with self._slots:
+            time.sleep(self._rate_limiter.reserve())
+            return self._send(url)
+
+    def get_json(self, url: str) -> Any:
+        return json.loads(self.get_bytes(url))
+
+    def get_if_changed(self, url: str, etag: Optional[str] = None) -> tuple[Optional[bytes], Optional[str]]:
+        """
+        Conditional GET that bypasses the response cache. Returns the body and its ETag,
+        or None and the given ETag if the server says the document hasn't changed.
+        """
+        with self._slots:
+            time.sleep(self._rate_limiter.reserve())
+            with self._stats_lock:
+                self.num_requests += 1
+            resp = self.session.get(url, headers={"If-None-Match": etag} if etag else None, timeout=self.timeout)
+        if resp.status_code == 304:
+            return None, etag
+        resp.raise_for_status()
+        return resp.content, resp.headers.get("ETag")
+
+    def map_json(self, urls: Iterable[str]) -> list[Any]:
+        """Fetches the URLs concurrently. Results are in the same order as the URLs."""
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            return list(executor.map(self.get_json, urls))
+
+
+@contextmanager
+def fetcher_or_new(fetcher: Optional[Fetcher] = None) -> Iterator[Fetcher]:
+    """The given fetcher, or a new one that's closed afterwards."""
+    if fetcher is not None:
+        yield fetcher
+    else:
+        with Fetcher() as new_fetcher:
+            yield new_fetcher
+
+
+class AsyncFetcher:
+    """
+    asyncio front end for a Fetcher. It shares the Fetcher's pool, cache, rate limit and retries,
+    and runs the blocking requests on its own threads, bounded by the same max_connections.
+    """
+    def __init__(self, fetcher: Optional[Fetcher] = None):
+        self._owns_fetcher = fetcher is None
+        self.fetcher = fetcher if fetcher is not None else Fetcher()
+        # The default executor can have fewer threads than max_connections
+        self._executor = ThreadPoolExecutor(max_workers=self.fetcher.max_connections)
+        # Created lazily, since it has to belong to the running event loop
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def get_bytes(self, url: str) -> bytes:
+        body = self.fetcher._cached(url)
+        if body is not None:
+            return body
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.fetcher.max_connections)
+        async with self._slots:
+            # Waiting for the rate limit here (rather than in the thread) doesn't tie up a thread
+            await asyncio.sleep(self.fetcher._rate_limiter.reserve())
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.fetcher._send, url)
+
+    async def get_json(self, url: str) -> Any:
+        return json.loads(await self.get_bytes(url))
+
+    async def gather_json(self, urls: Iterable[str]) -> list[Any]:
+        return await asyncio.gather(*(self.get_json(url) for url in urls))
+
+    def close(self):
+        """Shuts down the threads. A Fetcher that was passed in is left open."""
+        self._executor.shutdown()
+        if self._owns_fetcher:
+            self.fetcher.close()
@@ -1,17 +1,19 @@
+import hashlib
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-import requests
-
 from models import DamageClass, HitInfo, Type, MoveInfo, Ailment
+from .fetcher import Fetcher, fetcher_or_new
 
 logger = logging.getLogger(__name__)
 
 
 class MoveScraper:
-    def __init__(self):
+    def __init__(self, fetcher: Optional[Fetcher] = None):
         """
+        Without a fetcher, scraping opens (and closes) one of its own, and parsing doesn't need one.
+
         ~~~ Blacklist ~~~
         Counter Moves: Bide, Counter
         Multi-turn Effect Moves: Bind, Leech Seed
@@ -28,9 +30,22 @@ class MoveScraper:
         self.high_crit_ratio_moves: set[str] = {"crabhammer", "karate-chop", "razor-leaf", "slash"}
         # Ignored ailments
         self.ailment_blacklist: set[str] = {"freeze", "none"}
+        self.fetcher = fetcher
+
+    def config_hash(self) -> str:
+        """Hash of the rules above, so data derived with different rules can be told apart."""
+        config = {name: sorted(value) for name, value in vars(self).items() if isinstance(value, set)}
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def move_urls(top_level_data: dict) -> list[str]:
+        return [move["url"] for move in top_level_data["moves"]]
+
+    def _scrape_move(self, move_url: str, fetcher: Fetcher) -> Optional[MoveInfo]:
+        """Scrapes one move with the fetcher scrape opened, rather than a new one per move."""
+        return self.parse_move(fetcher.get_json(move_url))
 
-    def _scrape_move(self, move_url: str) -> Optional[MoveInfo]:
-        move_data = requests.get(move_url).json()
+    def parse_move(self, move_data: dict) -> Optional[MoveInfo]:
         if move_data["name"] in self.blacklist:
             return None
 
@@ -84,8 +99,7 @@ class MoveScraper:
             raise e
 
     def scrape(self, top_level_data: dict) -> list[MoveInfo]:
-        move_urls = [move["url"] for move in top_level_data["moves"]]
-        with ThreadPoolExecutor() as executor:
-            results = executor.map(self._scrape_move, move_urls)
-            moves = [x for x in results if x]
+        with fetcher_or_new(self.fetcher) as fetcher:
+            results = map(self.parse_move, fetcher.map_json(self.move_urls(top_level_data)))
+        moves = [x for x in results if x]
         return moves
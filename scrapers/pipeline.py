@@ -0,0 +1,45 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from models import MoveInfo, PokemonSpecies
+from .fetcher import AsyncFetcher, Fetcher, fetcher_or_new
+from .move_scraper import MoveScraper
+from .pokemon_scraper import PokemonScraper
+
+GEN1_URL = "https://pokeapi.co/api/v2/generation/1"
+
+
+def scrape_dex(top_level_data: dict, fetcher: Optional[Fetcher] = None,
+               move_scraper: Optional[MoveScraper] = None) -> tuple[list[MoveInfo], list[PokemonSpecies]]:
+    """
+    Scrapes moves and Pokemon as one pipeline: every document is requested up front, and moves are parsed while
+    the Pokemon documents are still downloading. Pokemon are parsed last since their learn sets need the moves.
+    """
+    move_scraper = move_scraper if move_scraper is not None else MoveScraper()
+    with fetcher_or_new(fetcher) as fetcher, ThreadPoolExecutor(max_workers=fetcher.max_connections) as executor:
+        # Executor.map submits everything immediately and yields results in order
+        move_docs = executor.map(fetcher.get_json, MoveScraper.move_urls(top_level_data))
+        poke_docs = executor.map(fetcher.get_json, PokemonScraper.pokemon_urls(top_level_data))
+        moves = [move for move in map(move_scraper.parse_move, move_docs) if move]
+        poke_scraper = PokemonScraper(moves)
+        pokemon = [poke_scraper.parse_pokemon(poke_data) for poke_data in poke_docs]
+    return moves, pokemon
+
+
+async def scrape_dex_async(top_level_data: dict, fetcher: Optional[Fetcher] = None,
+                           move_scraper: Optional[MoveScraper] = None
+                           ) -> tuple[list[MoveInfo], list[PokemonSpecies]]:
+    """asyncio version of scrape_dex."""
+    async_fetcher = AsyncFetcher(fetcher)
+    move_scraper = move_scraper if move_scraper is not None else MoveScraper()
+    try:
+        # Both tasks start right away, so the two phases overlap
+        move_docs = asyncio.create_task(async_fetcher.gather_json(MoveScraper.move_urls(top_level_data)))
+        poke_docs = asyncio.create_task(async_fetcher.gather_json(PokemonScraper.pokemon_urls(top_level_data)))
+        moves = [move for move in map(move_scraper.parse_move, await move_docs) if move]
+        poke_scraper = PokemonScraper(moves)
+        pokemon = [poke_scraper.parse_pokemon(poke_data) for poke_data in await poke_docs]
+    finally:
+        async_fetcher.close()
+    return moves, pokemon
@@ -1,22 +1,33 @@
 import json
-from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
 
-import requests
-
-from models import Sprite, Type, PokemonStats, PokemonSpecies, MoveInfo
+from dex_index import DexIndex
+from models import DATA_DIR, Sprite, Type, PokemonStats, PokemonSpecies, MoveInfo
+from .fetcher import Fetcher, fetcher_or_new
 
 
 class PokemonScraper:
-    def __init__(self, moves: list[MoveInfo]):
+    def __init__(self, moves: list[MoveInfo], fetcher: Optional[Fetcher] = None,
+                 specials_path: Path = DATA_DIR / "poke_specials.json"):
+        """Without a fetcher, scraping opens (and closes) one of its own, and parsing doesn't need one."""
         self.moves = moves
-
-    def _scrape_pokemon(self, poke_url: str) -> PokemonSpecies:
-        with open("./data/poke_specials.json", "r") as f:
+        self.index = DexIndex(all_moves=moves)
+        self.fetcher = fetcher
+        # Gen 1 special stats, which pokeapi doesn't have
+        with open(specials_path, "r") as f:
             data = json.load(f)
-            special_stat_lookup = {entry["pokedex_id"]: entry["special"] for entry in data}
+            self.special_stat_lookup: dict[int, int] = {entry["pokedex_id"]: entry["special"] for entry in data}
+
+    @staticmethod
+    def pokemon_urls(top_level_data: dict) -> list[str]:
+        return [p["url"].replace("pokemon-species", "pokemon") for p in top_level_data["pokemon_species"]]
 
-        poke_data = requests.get(poke_url).json()
+    def _scrape_pokemon(self, poke_url: str, fetcher: Fetcher) -> PokemonSpecies:
+        """Scrapes one Pokemon with the fetcher scrape opened, rather than a new one per Pokemon."""
+        return self.parse_pokemon(fetcher.get_json(poke_url))
 
+    def parse_pokemon(self, poke_data: dict) -> PokemonSpecies:
         if poke_data["past_types"]:
             # Use past types (Gen 1) if present
             poke_data["types"] = poke_data["past_types"][0]["types"]
@@ -27,7 +38,7 @@ class PokemonScraper:
                        if stat["stat"]["name"] in ["hp", "attack", "defense", "speed"]}
         stat_lookup["total_hp"] = stat_lookup.pop("hp")
 
-        base_stats = PokemonStats(**stat_lookup, special=special_stat_lookup[poke_data["id"]])
+        base_stats = PokemonStats(**stat_lookup, special=self.special_stat_lookup[poke_data["id"]])
 
         raw_learn_set = {entry["move"]["name"] for entry in poke_data["moves"]
                          if entry["version_group_details"]
@@ -39,12 +50,11 @@ class PokemonScraper:
             sprite=Sprite(front=gen1_sprites["front_default"], back=gen1_sprites["back_default"]),
             types=[Type(t["type"]["name"].upper()) for t in sorted(poke_data["types"], key=lambda x: x["slot"])],
             base_stats=base_stats,
-            learn_set={m for m in self.moves if m.name in raw_learn_set}
+            learn_set={move for move in map(self.index.move_by_name, raw_learn_set) if move is not None}
         )
 
     def scrape(self, top_level_data: dict) -> list[PokemonSpecies]:
-        poke_urls = [p["url"].replace("pokemon-species", "pokemon") for p in top_level_data["pokemon_species"]]
-        with ThreadPoolExecutor() as executor:
-            results = executor.map(self._scrape_pokemon, poke_urls)
-            pokemons = [x for x in results if x]
+        with fetcher_or_new(self.fetcher) as fetcher:
+            results = map(self.parse_pokemon, fetcher.map_json(self.pokemon_urls(top_level_data)))
+        pokemons = [x for x in results if x]
         return pokemons
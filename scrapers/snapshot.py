@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+from models import DATA_DIR, MoveInfo, PokemonSpecies
+from .fetcher import Fetcher, fetcher_or_new
+from .move_scraper import MoveScraper
+from .pipeline import GEN1_URL
+from .pokemon_scraper import PokemonScraper
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class RefreshStats:
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class RawSnapshot:
+    """
+    Directory of the raw pokeapi documents the dex is derived from: generation.json, moves/<id>.json and
+    pokemon/<id>.json, plus a manifest with the ETag and content hash of each document.
+    The dex can be rebuilt from it without the network, and refreshing it only downloads documents that
+    are missing or have changed.
+    """
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self._manifest_path = self.directory / "manifest.json"
+        self._manifest: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    @property
+    def exists(self) -> bool:
+        return self._manifest_path.exists()
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            if self.exists:
+                self._manifest = json.loads(self._manifest_path.read_text())
+                if self._manifest.get("version") != MANIFEST_VERSION:
+                    raise ValueError(f"Unsupported snapshot manifest version: {self._manifest.get('version')}")
+            else:
+                self._manifest = {"version": MANIFEST_VERSION, "generation_url": None, "entries": {}}
+        return self._manifest
+
+    def _relative_path(self, url: str, kind: Optional[str]) -> str:
+        if kind is None:
+            return "generation.json"
+        return f"{kind}/{url.rstrip('/').rsplit('/', 1)[-1]}.json"
+
+    def _load(self, url: str) -> dict:
+        return json.loads((self.directory / self.manifest["entries"][url]["path"]).read_bytes())
+
+    def _refresh_entry(self, fetcher: Fetcher, url: str, kind: Optional[str], stats: RefreshStats):
+        entry = self.manifest["entries"].get(url)
+        body, etag = fetcher.get_if_changed(url, entry["etag"] if entry is not None else None)
+        if body is None:
+            # 304 Not Modified
+            status = stats.unchanged
+        else:
+            digest = _sha256(body)
+            if entry is not None and entry["sha256"] == digest:
+                # Servers without ETags send everything again, so compare contents instead
+                status = stats.unchanged
+            else:
+                path = self.directory / self._relative_path(url, kind)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + ".tmp")
+                tmp_path.write_bytes(body)
+                tmp_path.replace(path)
+                status = stats.added if entry is None else stats.updated
+            entry = {"path": self._relative_path(url, kind), "etag": etag, "sha256": digest}
+        with self._lock:
+            self.manifest["entries"][url] = entry
+            status.append(url)
+
+    def refresh(self, fetcher: Optional[Fetcher] = None, generation_url: str = GEN1_URL,
+                check_existing: bool = True) -> RefreshStats:
+        """
+        Downloads missing documents and, if check_existing, re-downloads the ones that changed (using
+        conditional requests). Documents that are no longer part of the generation are dropped.
+        """
+        stats = RefreshStats()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = self.manifest["entries"]
+        with fetcher_or_new(fetcher) as fetcher:
+            if check_existing or generation_url not in entries:
+                self._refresh_entry(fetcher, generation_url, None, stats)
+            self.manifest["generation_url"] = generation_url
+            generation = self._load(generation_url)
+
+            wanted = [(url, "moves") for url in MoveScraper.move_urls(generation)]
+            wanted += [(url, "pokemon") for url in PokemonScraper.pokemon_urls(generation)]
+            to_fetch = [(url, kind) for url, kind in wanted if check_existing or url not in entries]
+            stats.unchanged.extend(url for url, _ in wanted if not check_existing and url in entries)
+            # Moves and Pokemon are downloaded together, like in scrape_dex
+            with ThreadPoolExecutor(max_workers=fetcher.max_connections) as executor:
+                list(executor.map(lambda item: self._refresh_entry(fetcher, *item, stats), to_fetch))
+
+        wanted_urls = {url for url, _ in wanted} | {generation_url}
+        for url in [url for url in entries if url not in wanted_urls]:
+            (self.directory / entries.pop(url)["path"]).unlink(missing_ok=True)
+            stats.removed.append(url)
+
+        tmp_path = self._manifest_path.with_name(self._manifest_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.manifest, indent=1, sort_keys=True))
+        tmp_path.replace(self._manifest_path)
+        logger.info(f"Refreshed snapshot: {len(stats.added)} added, {len(stats.updated)} updated, "
+                    f"{len(stats.unchanged)} unchanged, {len(stats.removed)} removed")
+        return stats
+
+    def content_hash(self) -> str:
+        """Hash of every document in the snapshot. Changes whenever a refresh changes anything."""
+        entries = self.manifest["entries"]
+        return _sha256(json.dumps(sorted((url, entry["sha256"]) for url, entry in entries.items())).encode())
+
+    def build_dex(self, move_scraper: Optional[MoveScraper] = None,
+                  specials_path: Path = DATA_DIR / "poke_specials.json"
+                  ) -> tuple[list[MoveInfo], list[PokemonSpecies]]:
+        """Derives the dex from the snapshot, without touching the network."""
+        if not self.exists:
+            raise ValueError(f"No snapshot in {self.directory}")
+        move_scraper = move_scraper if move_scraper is not None else MoveScraper()
+        generation = self._load(self.manifest["generation_url"])
+        moves = [move for move in (move_scraper.parse_move(self._load(url))
+                                   for url in MoveScraper.move_urls(generation)) if move]
+        poke_scraper = PokemonScraper(moves, specials_path=specials_path)
+        pokemon = [poke_scraper.parse_pokemon(self._load(url)) for url in PokemonScraper.pokemon_urls(generation)]
+        return moves, pokemon
@@ -0,0 +1,306 @@
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+import battle_workers
+from battle_strategies import (
+    ApproxQLearningStrategy, BaseQLearningStrategy, BattleStrategy, FullyRandomStrategy, QLearningStrategy
+)
+from data_store import DataStore
+from gameplay import Battle
+from generator import Matchup, PokemonGenerator
+from models import PokemonSpecies, Trainer
+
+# Elo points per natural log of Bradley-Terry strength
+ELO_PER_NAT = 400 / math.log(10)
+
+
+def elo_to_win_rate(elo_diff: float) -> float:
+    return 1 / (1 + 10 ** (-elo_diff / 400))
+
+
+@dataclass(frozen=True)
+class _Block:
+    """Battles of one pairing in one matchup, with the same entrant as the first trainer."""
+    pairing: int
+    first: int
+    second: int
+    # Matchup of the first trainer's Pokemon. If swapped, the second entrant is the first trainer.
+    matchup: Matchup
+    swapped: bool
+    num_battles: int
+    seed: int
+
+
+@dataclass
+class PairingResult:
+    first: str
+    second: str
+    # Wins of the first entrant
+    wins: int = 0
+    games: int = 0
+    # Games and wins of the first entrant by the matchup of its own Pokemon
+    games_by_matchup: dict[Matchup, int] = field(default_factory=dict)
+    wins_by_matchup: dict[Matchup, int] = field(default_factory=dict)
+    # "first" or "second" once one is shown to be stronger, "even" once they're shown to be within the margin,
+    # None if the game limit ran out first
+    decision: Optional[str] = None
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.5
+
+
+@dataclass(frozen=True)
+class Rating:
+    name: str
+    elo: float
+    # Half-width of the confidence interval
+    margin: float
+
+
+@dataclass(frozen=True)
+class TournamentResult:
+    pairings: list[PairingResult]
+    # Highest first
+    ratings: list[Rating]
+    elapsed: float
+
+    @property
+    def games(self) -> int:
+        return sum(pairing.games for pairing in self.pairings)
+
+    def report(self) -> str:
+        lines = [f"{'':<4}{'strategy':<24}{'Elo':>8}{'CI':>10}"]
+        for rank, rating in enumerate(self.ratings, start=1):
+            lines.append(f"{rank:<4}{rating.name:<24}{rating.elo:>8.0f}{f'±{rating.margin:.0f}':>10}")
+        lines.append("")
+        for pairing in self.pairings:
+            decision = {"first": f"{pairing.first} stronger", "second": f"{pairing.second} stronger",
+                        "even": "even", None: "undecided"}[pairing.decision]
+            lines.append(f"{pairing.first} vs {pairing.second}: {pairing.win_rate:.1%} over {pairing.games} games "
+                         f"({decision})")
+        lines.append(f"\n{self.games} games in {self.elapsed:.1f}s")
+        return "\n".join(lines)
+
+
+class SequentialTest:
+    """
+    Sobel-Wald test of a win rate: two SPRTs of p = 0.5 against the first entrant being elo_margin stronger,
+    and against it being elo_margin weaker. Error rates hold for strategies at least elo_margin apart.
+    """
+    def __init__(self, elo_margin: float = 50, alpha: float = 0.05, beta: float = 0.05):
+        self.p_high = elo_to_win_rate(elo_margin)
+        self.p_low = elo_to_win_rate(-elo_margin)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def _llr(self, p1: float, wins: int, losses: int) -> float:
+        """Log-likelihood ratio of win rate p1 against 0.5."""
+        return wins * math.log(p1 / 0.5) + losses * math.log((1 - p1) / 0.5)
+
+    def decide(self, wins: int, games: int) -> Optional[str]:
+        losses = games - wins
+        stronger, weaker = self._llr(self.p_high, wins, losses), self._llr(self.p_low, wins, losses)
+        if stronger >= self.upper:
+            return "first"
+        if weaker >= self.upper:
+            return "second"
+        if stronger <= self.lower and weaker <= self.lower:
+            return "even"
+        return None
+
+
+def bradley_terry(names: Sequence[str], pairings: Sequence[PairingResult], confidence: float = 0.95,
+                  prior_games: float = 1.0) -> list[Rating]:
+    """
+    Maximum likelihood Bradley-Terry ratings on the Elo scale (averaging 0), with confidence intervals from
+    the Fisher information. Every pairing gets prior_games extra games split evenly, which keeps the ratings
+    finite when one strategy wins every game.
+    """
+    inds = {name: ind for ind, name in enumerate(names)}
+    wins = np.zeros((len(names), len(names)))
+    for pairing in pairings:
+        first, second = inds[pairing.first], inds[pairing.second]
+        wins[first, second] += pairing.wins + prior_games / 2
+        wins[second, first] += pairing.games - pairing.wins + prior_games / 2
+    games = wins + wins.T
+
+    # Minorization-maximization (Hunter 2004)
+    strengths = np.ones(len(names))
+    for _ in range(10000):
+        new_strengths = wins.sum(axis=1) / (games / (strengths[:, None] + strengths[None, :])).sum(axis=1)
+        new_strengths /= np.exp(np.log(new_strengths).mean())
+        converged = np.abs(new_strengths - strengths).max() < 1e-12
+        strengths = new_strengths
+        if converged:
+            break
+    log_strengths = np.log(strengths)
+
+    win_probs = strengths[:, None] / (strengths[:, None] + strengths[None, :])
+    weights = games * win_probs * win_probs.T
+    fisher_info = np.diag(weights.sum(axis=1)) - weights
+    # Ratings are only defined up to a constant, and the pseudo-inverse gives the covariance of the centered ones
+    std_errors = np.sqrt(np.maximum(np.diag(np.linalg.pinv(fisher_info)), 0))
+    z = _normal_quantile((1 + confidence) / 2)
+    ratings = [Rating(name, float(log_strength * ELO_PER_NAT), float(z * std_error * ELO_PER_NAT))
+               for name, log_strength, std_error in zip(names, log_strengths, std_errors)]
+    return sorted(ratings, key=lambda rating: rating.elo, reverse=True)
+
+
+def _normal_quantile(p: float) -> float:
+    lo, hi = -10.0, 10.0
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if (1 + math.erf(mid / math.sqrt(2))) / 2 < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def _play_block(block: _Block) -> int:
+    """Returns the wins of the block's first entrant."""
+    first, second = battle_workers.strategies[block.first], battle_workers.strategies[block.second]
+    generator = battle_workers.generator
+    rng = battle_workers.start_task(block.seed, [first, second])
+    trainer_strategies = (second, first) if block.swapped else (first, second)
+    first_wins = 0
+    for _ in range(block.num_battles):
+        pokemon_a, pokemon_b = generator.generate(2, block.matchup)
+        battle = Battle(Trainer("Trainer A", pokemon_a, trainer_strategies[0]),
+                        Trainer("Trainer B", pokemon_b, trainer_strategies[1]),
+                        training_mode=True, seed=rng.getrandbits(64))
+        winner = battle.run()
+        first_wins += int(winner == (1 if block.swapped else 0))
+        generator.release(pokemon_a, pokemon_b)
+    return first_wins
+
+
+class _PairingRun:
+    """Plays a pairing in rounds (every matchup, from both sides) until its test decides or max_games runs out."""
+    def __init__(self, ind: int, first: int, second: int, result: PairingResult, matchups: Sequence[Matchup],
+                 battles_per_block: int, max_games: int, test: SequentialTest, seed: int):
+        self.ind = ind
+        self.first = first
+        self.second = second
+        self.result = result
+        self.matchups = matchups
+        self.battles_per_block = battles_per_block
+        self.max_games = max_games
+        self.test = test
+        self.seed_sequence = np.random.SeedSequence([seed, ind])
+        self.round_blocks: dict[_Block, Optional[int]] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.result.decision is not None or self.result.games >= self.max_games
+
+    @property
+    def waiting(self) -> bool:
+        return bool(self.round_blocks)
+
+    def next_round(self) -> list[_Block]:
+        blocks = [(matchup, swapped) for matchup in self.matchups for swapped in (False, True)]
+        seeds = self.seed_sequence.spawn(1)[0].generate_state(len(blocks), dtype=np.uint64)
+        self.round_blocks = {
+            _Block(self.ind, self.first, self.second, matchup, swapped, self.battles_per_block, int(seed)): None
+            for (matchup, swapped), seed in zip(blocks, seeds)
+        }
+        return list(self.round_blocks)
+
+    def record(self, block: _Block, first_wins: int):
+        self.round_blocks[block] = first_wins
+        if any(wins is None for wins in self.round_blocks.values()):
+            return
+        # Only whole rounds count, so every matchup and side weighs the same whatever the test decides
+        result = self.result
+        for round_block, block_wins in self.round_blocks.items():
+            # Swapped, the first entrant has the other Pokemon of the matchup
+            matchup = Matchup(-round_block.matchup.value) if round_block.swapped else round_block.matchup
+            result.games_by_matchup[matchup] = result.games_by_matchup.get(matchup, 0) + round_block.num_battles
+            result.wins_by_matchup[matchup] = result.wins_by_matchup.get(matchup, 0) + block_wins
+            result.games += round_block.num_battles
+            result.wins += block_wins
+        self.round_blocks = {}
+        result.decision = self.test.decide(result.wins, result.games)
+
+
+def run_tournament(entrants: dict[str, BattleStrategy], all_pokemon: Sequence[PokemonSpecies],
+                   matchups: Sequence[Matchup] = tuple(Matchup), battles_per_block: int = 10,
+                   max_games: int = 3000, test: Optional[SequentialTest] = None, num_workers: Optional[int] = None,
+                   seed: int = 0) -> TournamentResult:
+    """
+    Plays every entrant against every other. Each pairing plays rounds of battles_per_block battles per matchup
+    and side until the sequential test decides it or it's played max_games, so close pairings get the most
+    games. Entrants must be picklable and done training, as in evaluation.evaluate.
+    Rounds of different pairings run in parallel, and results only depend on the seed, not on num_workers.
+    With num_workers=1, the rounds are played in this process on copies of the entrants, and the global random
+    module isn't reseeded.
+    """
+    if len(entrants) < 2:
+        raise ValueError("A tournament needs at least 2 entrants")
+    if any(getattr(strategy, "training", False) for strategy in entrants.values()):
+        raise ValueError("Can't play a strategy while it's training")
+    test = test or SequentialTest()
+    names = list(entrants)
+    runs = [
+        _PairingRun(ind, first, second, PairingResult(names[first], names[second]), matchups, battles_per_block,
+                    max_games, test, seed)
+        for ind, (first, second) in enumerate((first, second) for first in range(len(names))
+                                              for second in range(first + 1, len(names)))
+    ]
+    num_workers = num_workers or os.cpu_count() or 1
+
+    start = time.time()
+    init_args = (list(entrants.values()), all_pokemon)
+    if num_workers == 1:
+        battle_workers.init_worker(*init_args, in_process=True)
+        for run in runs:
+            while not run.done:
+                for block in run.next_round():
+                    run.record(block, _play_block(block))
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=battle_workers.init_worker,
+                                 initargs=init_args) as executor:
+            in_flight: dict[Future, tuple[_PairingRun, _Block]] = {}
+            while True:
+                # One round per pairing at a time, so no games are played past a decision
+                for run in runs:
+                    if not run.done and not run.waiting:
+                        for block in run.next_round():
+                            in_flight[executor.submit(_play_block, block)] = (run, block)
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    run, block = in_flight.pop(future)
+                    run.record(block, future.result())
+
+    pairings = [run.result for run in runs]
+    return TournamentResult(pairings=pairings, ratings=bradley_terry(names, pairings), elapsed=time.time() - start)
+
+
+# Entrants of the default tournament, trained for this many episodes
+TRAINING_EPISODES = 2000
+
+
+if __name__ == '__main__':
+    data_store = DataStore()
+    generator = PokemonGenerator(data_store.all_pokemon)
+    entrants: dict[str, BattleStrategy] = {"random": FullyRandomStrategy()}
+    for name, strategy in [("q_table", QLearningStrategy(gamma=0.9, alpha=0.1, epsilon=0.1)),
+                           ("approx_q", ApproxQLearningStrategy(gamma=0.9, alpha=0.01, epsilon=0.1, softmax=True))]:
+        strategy.train(generator, TRAINING_EPISODES)
+        entrants[f"{name}_{TRAINING_EPISODES}"] = strategy
+    if Path(CHECKPOINT_PATH).exists():
+        checkpoint_strategy = BaseQLearningStrategy.load_checkpoint(CHECKPOINT_PATH)
+        entrants[f"checkpoint_{checkpoint_strategy.episodes_trained}"] = checkpoint_strategy
+
+    print(run_tournament(entrants, data_store.all_pokemon).report())